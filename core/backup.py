@@ -1,16 +1,235 @@
+import gzip
+import hashlib
+import json
 import os
 import shutil
-from datetime import datetime
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
 
-def backup_preds_daily(backup_dir: str = "data/backups") -> None:
+from core.config import JST, safe_save_json
+
+# ============================================================
+# Backups（予想・ステータスの日次バックアップ）
+#   mode="cas"（既定）… 中身のハッシュで1回だけ保存する
+#     data/backups/objects/ab/<sha256>.json.gz … 中身（gzip、同じ中身は1つだけ）
+#     data/backups/index.json                  … 日付 → {ファイル名: sha256}
+#     変わらない日は index に参照を足すだけ。mtime・サイズが前回と同じなら読みもしない
+#     保持: 直近 KEEP_DAILY 日は毎日、その前は週ごと KEEP_WEEKLY 週、月ごと KEEP_MONTHLY か月
+#     （週・月はその期間の最後の日を残す）。参照されなくなった中身は消す
+#   mode="copy" … 従来どおり filename_YYYY-MM-DD.json にコピー
+#
+#   python -m core.backup            # 今日のぶん（cas）
+#   python -m core.backup list       # 残っている日付とファイル
+#   python -m core.backup restore 2026-10-19 miru_preds.json [dst]
+#   python -m core.backup migrate    # 従来のコピーを取り込んで消す
+# ============================================================
+BACKUP_DIR = "data/backups"
+BACKUP_TARGETS = ("data/miru_preds.json", "data/miru_status.json")
+KEEP_DAILY = 7
+KEEP_WEEKLY = 5
+KEEP_MONTHLY = 12
+
+
+def _index_path(backup_dir: str) -> str:
+    return os.path.join(backup_dir, "index.json")
+
+
+def _object_path(backup_dir: str, digest: str) -> str:
+    return os.path.join(backup_dir, "objects", digest[:2], digest + ".json.gz")
+
+
+def load_backup_index(backup_dir: str = BACKUP_DIR) -> Dict[str, Any]:
+    path = _index_path(backup_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("days"), dict):
+                data.setdefault("seen", {})
+                return data
+        except Exception:
+            pass
+    return {"days": {}, "seen": {}, "updated_at": ""}
+
+
+def save_backup_index(index: Dict[str, Any], backup_dir: str = BACKUP_DIR) -> bool:
+    index = dict(index)
+    index["updated_at"] = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+    return bool(safe_save_json(index, _index_path(backup_dir)))
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _put_object(backup_dir: str, src: str, digest: str) -> bool:
+    """無ければ gzip で書く。書いたら True"""
+    dst = _object_path(backup_dir, digest)
+    if os.path.exists(dst):
+        return False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + ".tmp"
+    with open(src, "rb") as fi, open(tmp, "wb") as fo:
+        with gzip.GzipFile(fileobj=fo, mode="wb", compresslevel=6, mtime=0) as gz:
+            shutil.copyfileobj(fi, gz)
+    os.replace(tmp, dst)
+    return True
+
+
+def _file_digest(index: Dict[str, Any], src: str) -> str:
+    """mtime・サイズが前回と同じならハッシュを使い回す"""
+    st = os.stat(src)
+    stamp = [st.st_mtime_ns, st.st_size]
+    seen = index["seen"].get(src)
+    if seen and seen.get("stamp") == stamp:
+        return seen["sha256"]
+    digest = _sha256_file(src)
+    index["seen"][src] = {"stamp": stamp, "sha256": digest}
+    return digest
+
+
+def retained_days(days: List[str], today: Optional[date] = None) -> List[str]:
+    """保持する日付（直近は毎日、その前は週・月の最後の日）"""
+    today = today or datetime.now(JST).date()
+    keep = set()
+    weekly: Dict[tuple, str] = {}
+    monthly: Dict[tuple, str] = {}
+    for d in sorted(days):
+        try:
+            dd = datetime.strptime(d, "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        age = (today - dd).days
+        if age < KEEP_DAILY:
+            keep.add(d)
+            continue
+        wk = dd.isocalendar()[:2]
+        if dd >= today - timedelta(weeks=KEEP_WEEKLY):
+            weekly[wk] = d
+        months = (today.year - dd.year) * 12 + today.month - dd.month
+        if months < KEEP_MONTHLY:
+            monthly[(dd.year, dd.month)] = d
+    keep.update(weekly.values())
+    keep.update(monthly.values())
+    return sorted(keep)
+
+
+def prune_backups(index: Dict[str, Any], backup_dir: str = BACKUP_DIR, today: Optional[date] = None) -> Dict[str, int]:
+    """保持期間外の日付を index から外し、どこからも参照されない中身を消す"""
+    keep = set(retained_days(list(index["days"]), today))
+    dropped = [d for d in index["days"] if d not in keep]
+    for d in dropped:
+        del index["days"][d]
+    live = {h for files in index["days"].values() for h in files.values()}
+    removed = 0
+    root = os.path.join(backup_dir, "objects")
+    if os.path.isdir(root):
+        for sub in os.listdir(root):
+            subdir = os.path.join(root, sub)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                if name.endswith(".json.gz") and name[:-len(".json.gz")] not in live:
+                    try:
+                        os.remove(os.path.join(subdir, name))
+                        removed += 1
+                    except OSError:
+                        pass
+    return {"days": len(dropped), "objects": removed}
+
+
+def backup_cas(
+    backup_dir: str = BACKUP_DIR,
+    targets=BACKUP_TARGETS,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """
+    今日の日付で targets を記録（同じ中身は保存済みの参照だけ）。
+    戻り値: {day, files: {名前: sha256}, stored: 新しく書いた中身の数, pruned}
+    """
+    today = today or datetime.now(JST).date()
+    day = today.strftime("%Y-%m-%d")
+    index = load_backup_index(backup_dir)
+    before = json.dumps(index, sort_keys=True)
+    files = dict(index["days"].get(day, {}))
+    stored = 0
+    for src in targets:
+        if not os.path.exists(src):
+            continue
+        try:
+            digest = _file_digest(index, src)
+            stored += _put_object(backup_dir, src, digest)
+            files[os.path.basename(src)] = digest
+        except Exception:
+            continue
+    changed = files != index["days"].get(day)
+    index["days"][day] = files
+    pruned = prune_backups(index, backup_dir, today) if changed else {"days": 0, "objects": 0}
+    if json.dumps(index, sort_keys=True) != before:
+        save_backup_index(index, backup_dir)
+    return {"day": day, "files": files, "stored": stored, "pruned": pruned}
+
+
+def restore_backup(day: str, name: str, dst: Optional[str] = None, backup_dir: str = BACKUP_DIR) -> str:
+    """day の name を dst（既定は data/<name>）に書き戻す。書いたパスを返す"""
+    index = load_backup_index(backup_dir)
+    digest = (index["days"].get(day) or {}).get(name)
+    if not digest:
+        raise KeyError(f"no backup of {name} on {day}")
+    dst = dst or os.path.join("data", name)
+    tmp = dst + ".tmp"
+    with gzip.open(_object_path(backup_dir, digest), "rb") as fi, open(tmp, "wb") as fo:
+        shutil.copyfileobj(fi, fo)
+    os.replace(tmp, dst)
+    return dst
+
+
+def migrate_legacy_backups(backup_dir: str = BACKUP_DIR) -> Dict[str, int]:
+    """従来の filename_YYYY-MM-DD.json を中身として取り込み、元のコピーは消す"""
+    index = load_backup_index(backup_dir)
+    moved = 0
+    for name in sorted(os.listdir(backup_dir)) if os.path.isdir(backup_dir) else []:
+        path = os.path.join(backup_dir, name)
+        stem, ext = os.path.splitext(name)
+        if ext != ".json" or name == "index.json" or "_" not in stem:
+            continue
+        base, day = stem.rsplit("_", 1)
+        try:
+            datetime.strptime(day, "%Y-%m-%d")
+        except ValueError:
+            continue
+        digest = _sha256_file(path)
+        _put_object(backup_dir, path, digest)
+        index["days"].setdefault(day, {}).setdefault(base + ".json", digest)
+        os.remove(path)
+        moved += 1
+    pruned = prune_backups(index, backup_dir)
+    save_backup_index(index, backup_dir)
+    return {"migrated": moved, **{"pruned_" + k: v for k, v in pruned.items()}}
+
+
+def backup_preds_daily(backup_dir: str = BACKUP_DIR, mode: str = "cas") -> None:
     """
     Daily backup for prediction AND status store.
     - miru_preds.json (Predictions)
     - miru_status.json (Results/Credits)
-    Copies data -> data/backups/filename_YYYY-MM-DD.json
+    mode="cas": content-addressed (backup_cas)
+    mode="copy": data -> data/backups/filename_YYYY-MM-DD.json
     """
+    if mode == "cas":
+        try:
+            backup_cas(backup_dir)
+        except Exception:
+            pass
+        return
+
     # バックアップ対象のリスト（statusを追加して2つのファイルを監視）
-    targets = ["data/miru_preds.json", "data/miru_status.json"]
+    targets = list(BACKUP_TARGETS)
 
     os.makedirs(backup_dir, exist_ok=True)
     today = datetime.now().strftime("%Y-%m-%d")
@@ -18,7 +237,7 @@ def backup_preds_daily(backup_dir: str = "data/backups") -> None:
     for src in targets:
         if not os.path.exists(src):
             continue
-        
+
         filename = os.path.basename(src).replace(".json", "")
         dst = os.path.join(backup_dir, f"{filename}_{today}.json")
 
@@ -28,3 +247,28 @@ def backup_preds_daily(backup_dir: str = "data/backups") -> None:
                 shutil.copy2(src, dst)
             except Exception:
                 pass
+
+
+def main(argv: List[str] = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    cmd = args[0] if args else "run"
+    if cmd == "run":
+        print(json.dumps(backup_cas(), ensure_ascii=False))
+        return 0
+    if cmd == "list":
+        index = load_backup_index()
+        for d in sorted(index["days"]):
+            print(d, " ".join(f"{n}:{h[:12]}" for n, h in sorted(index["days"][d].items())))
+        return 0
+    if cmd == "restore" and len(args) >= 3:
+        print(restore_backup(args[1], args[2], args[3] if len(args) > 3 else None))
+        return 0
+    if cmd == "migrate":
+        print(json.dumps(migrate_legacy_backups()))
+        return 0
+    print("usage: python -m core.backup [run|list|restore DAY NAME [DST]|migrate]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,582 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.cache import cache_items_by_round, cached_items
+from core.drift import drift_alloc
+from core.mini import nm_drift_unique
+from core import model as _model
+from core.model import VERSION, calc_trends_from_history, distill_predictions, generate_predictions
+from core.seed import seed_hash
+from core.shuffle import clear_shuffle_memo, solve_recompose
+
+
+# ----------------------------
+# helpers
+# ----------------------------
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[i]
+
+
+def _timing_stats(secs: List[float]) -> Dict[str, float]:
+    v = sorted(secs)
+    return {
+        "n": len(v),
+        "mean_ms": round(1000 * sum(v) / len(v), 4) if v else 0.0,
+        "p50_ms": round(1000 * _percentile(v, 0.50), 4),
+        "p90_ms": round(1000 * _percentile(v, 0.90), 4),
+        "p99_ms": round(1000 * _percentile(v, 0.99), 4),
+        "max_ms": round(1000 * (v[-1] if v else 0.0), 4),
+    }
+
+
+def synthetic_pools(n_pools: int, out_n: int = 10, seed: int = 0) -> List[Tuple[str, List[str]]]:
+    """
+    素材プールのコーパス（決定論）。
+    数字の種類数を 2〜10 で振って、解なし・ギリギリ・余裕ありを混ぜる。
+    """
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n_pools):
+        game = rng.choice(["N4", "N3"])
+        digits = 4 if game == "N4" else 3
+        alpha = rng.sample("0123456789", rng.choice([2, 3, 4, 5, 6, 8, 10]))
+        preds = ["".join(rng.choice(alpha) for _ in range(digits)) for _ in range(out_n)]
+        out.append((game, preds))
+    return out
+
+
+# ----------------------------
+# solver
+# ----------------------------
+def bench_solver(
+    n_pools: int = 1000,
+    out_n: int = 10,
+    time_budget: float = 0.05,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    solve_recompose の解時間をコーパス全体で計測。
+    solved / fallback（解なし or 予算切れ → greedy）の内訳も返す。
+    """
+    solved: List[float] = []
+    infeasible: List[float] = []
+    expired: List[float] = []
+    for game, preds in synthetic_pools(n_pools, out_n=out_n, seed=seed):
+        t0 = time.perf_counter()
+        res = solve_recompose(game, preds, out_n=out_n, time_budget=time_budget)
+        dt = time.perf_counter() - t0
+        if res is not None:
+            solved.append(dt)
+        elif dt >= time_budget:
+            expired.append(dt)
+        else:
+            infeasible.append(dt)
+
+    return {
+        "pools": n_pools,
+        "out_n": out_n,
+        "time_budget_s": time_budget,
+        "solved": _timing_stats(solved),
+        "infeasible": _timing_stats(infeasible),
+        "expired": _timing_stats(expired),
+    }
+
+
+# ----------------------------
+# drift allocator
+# ----------------------------
+DRIFT_SPACES = (100, 1000, 10000)
+DRIFT_LOADS = (0.1, 0.5, 0.9, 1.0)
+
+
+def _drift_scan(bases: List[int], space: int) -> List[Optional[int]]:
+    """比較用：使用済み set から外側へ素直に走査する版（+1, -1, +2, -2, ...）"""
+    used = set()
+    out: List[Optional[int]] = []
+    for b in bases:
+        b %= space
+        if len(used) >= space:
+            out.append(None)
+            continue
+        v = b
+        if v in used:
+            for d in range(1, space // 2 + 1):
+                if (b + d) % space not in used:
+                    v = (b + d) % space
+                    break
+                if (b - d) % space not in used:
+                    v = (b - d) % space
+                    break
+        used.add(v)
+        out.append(v)
+    return out
+
+
+def bench_drift(
+    spaces: Tuple[int, ...] = DRIFT_SPACES,
+    loads: Tuple[float, ...] = DRIFT_LOADS,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    空間の load 割まで一括で割り当てる時間を、走査版と core.drift で比べる。
+      uniform   … base が空間全体に一様（走査版がいちばん得意）
+      clustered … base が空間の 1% の幅に集中（重複の drift が実際に起きる形。走査版は O(n^2)）
+    結果が一致しなければ "same": False。
+    """
+    rng = random.Random(seed)
+    out: Dict[str, Any] = {}
+    for space in spaces:
+        for load in loads:
+            n = max(1, int(space * load))
+            width = max(1, space // 100)
+            center = rng.randrange(space)
+            cases = {
+                "uniform": [rng.randrange(space) for _ in range(n)],
+                "clustered": [(center + rng.randrange(width)) % space for _ in range(n)],
+            }
+            for pattern, bases in cases.items():
+                t0 = time.perf_counter()
+                a = _drift_scan(bases, space)
+                t1 = time.perf_counter()
+                b = drift_alloc(bases, space)
+                t2 = time.perf_counter()
+                out[f"{space}@{load:g}/{pattern}"] = {
+                    "n": n,
+                    "same": a == b,
+                    "scan_ms": round(1000 * (t1 - t0), 3),
+                    "alloc_ms": round(1000 * (t2 - t1), 3),
+                    "speedup": round((t1 - t0) / max(t2 - t1, 1e-9), 2),
+                }
+    return out
+
+
+# ----------------------------
+# seed（_stable_seed の区切りキャッシュ）
+# ----------------------------
+SEED_CALLS = (1000, 20000, 200000)
+
+
+def _seed_plain(game: str, last_val: str, trends: dict) -> int:
+    """比較用：キャッシュなしで連結文字列を1文字ずつ回す版（_stable_seed の fallback と同じ）"""
+    t_items = sorted((str(k), str(v)) for k, v in (trends or {}).items())
+    return seed_hash((VERSION + "|" + game + "|", str(last_val) + "|", str(t_items)))
+
+
+def bench_seed(calls: Tuple[int, ...] = SEED_CALLS, seed: int = 0) -> Dict[str, Any]:
+    """
+    generate_predictions と同じ形の入力（N3/N4、trends は各桁 -5..5）で _stable_seed を回す。
+      cold … キャッシュを空にしてから1周目（表を埋めるぶん、少数回では素直な版より遅い）
+      warm … 同じ入力で2周目
+    結果が一致しなければ "same": False。
+    """
+    rng = random.Random(seed)
+    out: Dict[str, Any] = {}
+    for n in calls:
+        args = []
+        for _ in range(n):
+            game = rng.choice(["N4", "N3"])
+            cols = ["n1", "n2", "n3", "n4"] if game == "N4" else ["n1", "n2", "n3"]
+            last = "".join(rng.choice("0123456789") for _ in cols)
+            args.append((game, last, {c: rng.randint(-5, 5) for c in cols}))
+        _model.clear_seed_cache()
+        t0 = time.perf_counter()
+        a = [_seed_plain(*x) for x in args]
+        t1 = time.perf_counter()
+        b = [_model._stable_seed(*x) for x in args]
+        t2 = time.perf_counter()
+        c = [_model._stable_seed(*x) for x in args]
+        t3 = time.perf_counter()
+        out[str(n)] = {
+            "same": a == b == c,
+            "plain_ms": round(1000 * (t1 - t0), 3),
+            "cold_ms": round(1000 * (t2 - t1), 3),
+            "warm_ms": round(1000 * (t3 - t2), 3),
+            "cold_speedup": round((t1 - t0) / max(t2 - t1, 1e-9), 2),
+            "warm_speedup": round((t1 - t0) / max(t3 - t2, 1e-9), 2),
+        }
+    return out
+
+
+# ----------------------------
+# cold start（app.py のキャッシュだけの起動経路）
+# ----------------------------
+COLD_START_LOG = "data/bench/cold_start.jsonl"
+COLD_START_TOLERANCE = 1.25
+COLD_START_WINDOW = 10
+
+# 新しいインタプリタで app.py と同じ順に読み込み・描画する（streamlit 自体は除く）
+_COLD_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from core.snapshot import load_snapshot, snapshot_is_fresh
+t1 = time.perf_counter()
+snap = load_snapshot()
+hit = snapshot_is_fresh(snap)
+if not hit:
+    from core.build import build_snapshot
+    snap, _ = build_snapshot(offline=True)
+html = snap["html_text"]
+t2 = time.perf_counter()
+if not hit:
+    # offline ビルドは取得の試行を残さないので、取れなかった時と同じ記録を付けておく
+    # （無いと次の hit が fetch_schedule.json の時刻しだいで再ビルドになる。計測の外）
+    from core.cache import load_results_cache
+    from core.schedule import note_fetch
+    for g in ("N4", "N3"):
+        note_fetch(load_results_cache(), g, 0)
+print(json.dumps({
+    "import_s": t1 - t0,
+    "render_s": t2 - t1,
+    "hit": hit,
+    "html_bytes": len(html),
+    "scraping_loaded": sorted(m for m in ("requests", "bs4") if m in sys.modules),
+}))
+"""
+
+
+def _run_probe(workdir: str, root: str) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    out = subprocess.run(
+        [sys.executable, "-c", _COLD_PROBE],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_cold_start(runs: int = 5, data_dir: str = "data") -> Dict[str, Any]:
+    """
+    起動から最初の HTML までを別プロセスで計測（キャッシュだけ・取得なし）。
+      rebuild … スナップショット無し → offline ビルド
+      hit     … 直前のスナップショットをそのまま読む
+    data_dir は一時ディレクトリに写してから使う（本物の data/ は書き換えない）。
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples: Dict[str, Dict[str, List[float]]] = {"rebuild": {"import_s": [], "render_s": []}, "hit": {"import_s": [], "render_s": []}}
+    scraping = set()
+    html_bytes = 0
+    for _ in range(max(1, runs)):
+        with tempfile.TemporaryDirectory() as tmp:
+            if os.path.isdir(data_dir):
+                shutil.copytree(data_dir, os.path.join(tmp, "data"), ignore=shutil.ignore_patterns("snapshots", "bench"))
+            for kind in ("rebuild", "hit"):
+                r = _run_probe(tmp, root)
+                samples[kind]["import_s"].append(r["import_s"])
+                samples[kind]["render_s"].append(r["render_s"])
+                scraping.update(r["scraping_loaded"])
+                html_bytes = r["html_bytes"]
+
+    out: Dict[str, Any] = {"runs": max(1, runs), "html_bytes": html_bytes, "scraping_loaded": sorted(scraping)}
+    for kind, vals in samples.items():
+        for k, v in vals.items():
+            out[f"{kind}_{k.replace('_s', '_ms')}"] = round(1000 * _percentile(sorted(v), 0.50), 3)
+    return out
+
+
+def load_cold_start_history(path: str = COLD_START_LOG) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    rows = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+    except Exception:
+        pass
+    return rows
+
+
+def record_cold_start(result: Dict[str, Any], path: str = COLD_START_LOG) -> None:
+    """計測結果を1行JSONで追記（時刻付き）"""
+    row = dict(result)
+    row["at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def cold_start_regressions(
+    result: Dict[str, Any],
+    history: List[Dict[str, Any]],
+    tolerance: float = COLD_START_TOLERANCE,
+    window: int = COLD_START_WINDOW,
+) -> List[str]:
+    """
+    直近 window 件の中央値より tolerance 倍以上遅くなった項目。
+    取得モジュールが起動経路で読み込まれていたらそれも退行扱い。
+    """
+    bad = []
+    if result.get("scraping_loaded"):
+        bad.append("scraping_loaded")
+    recent = history[-window:]
+    for k, v in result.items():
+        if not k.endswith("_ms"):
+            continue
+        prev = sorted(r[k] for r in recent if isinstance(r.get(k), (int, float)))
+        if prev and v > tolerance * _percentile(prev, 0.50):
+            bad.append(k)
+    return bad
+
+# ----------------------------
+# suite（ホットパスを合成履歴で計測）
+# ----------------------------
+SUITE_SIZES = (100, 1000, 10000, 100000)
+SUITE_CALLS = 200          # generate / distill / nm_drift の呼び出し数（サイズごと）
+SUITE_PARSE_MAX = 1000     # parse_month_html に通す回数の上限（1ページ20回）
+SUITE_PAGES = 50           # build_numbers_pages の表示回数（core.build.N4_PAGES と同じ）
+SUITE_TOLERANCE = 1.25
+
+
+def synthetic_history(n_rounds: int, digits: int = 4, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    fetch_last_n_results と同じ形の合成履歴（回号降順・決定論）。
+    払戻は STR/BOX（N3 は MINI も）を適当な円で入れる。
+    """
+    rng = random.Random(f"{seed}:{digits}:{n_rounds}")
+    start = date(2000, 1, 3)
+    out = []
+    for r in range(n_rounds, 0, -1):
+        d = start + timedelta(days=r)
+        payout = {
+            "STR": {"yen": f"{rng.randint(50, 1500) * 100:,}"},
+            "BOX": {"yen": f"{rng.randint(5, 400) * 100:,}"},
+        }
+        if digits == 3:
+            payout["MINI"] = {"yen": f"{rng.randint(40, 160) * 100:,}"}
+        out.append({
+            "round": r,
+            "date": d.strftime("%Y/%m/%d"),
+            "num": "".join(rng.choice("0123456789") for _ in range(digits)),
+            "payout": payout,
+        })
+    return out
+
+
+def synthetic_month_html(items: List[Dict[str, Any]]) -> str:
+    """楽天のバックナンバーと同じ並び（第N回 → 日付 → 当せん番号 → ラベル/口数/円）の HTML"""
+    labels = {"STR": "ストレート", "BOX": "ボックス", "MINI": "ミニ"}
+    rows = []
+    for it in items:
+        y, m, d = it["date"].split("/")
+        rows.append(f"<table><tr><th>回号</th><td>第{it['round']}回</td></tr>")
+        rows.append(f"<tr><th>抽せん日</th><td>{int(y)}/{int(m)}/{int(d)}</td></tr>")
+        rows.append(f"<tr><th>当せん番号</th><td>{it['num']}</td></tr>")
+        for k, v in it["payout"].items():
+            rows.append(f"<tr><th>{labels[k]}</th><td>12口</td><td>{v['yen']}円</td></tr>")
+        rows.append("</table>")
+    return "<html><body>" + "\n".join(rows) + "</body></html>"
+
+
+def _load_fixtures(fixtures_dir: str) -> List[Tuple[str, int]]:
+    """保存した月ページ HTML（*.html）。ファイル名に n3 / numbers3 を含めば3桁"""
+    out = []
+    for name in sorted(os.listdir(fixtures_dir)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(fixtures_dir, name), "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        digits = 3 if ("n3" in name.lower() or "numbers3" in name.lower()) else 4
+        out.append((html, digits))
+    return out
+
+
+@contextmanager
+def _in_tempdir():
+    """data/ への保存（ensure_preds など）を一時ディレクトリに逃がす"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+def _time_calls(fn: Callable[[Any], Any], args: List[Any]) -> Dict[str, float]:
+    secs = []
+    for a in args:
+        t0 = time.perf_counter()
+        fn(a)
+        secs.append(time.perf_counter() - t0)
+    return _timing_stats(secs)
+
+
+def _time_repeat(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    return _time_calls(lambda _: fn(), list(range(max(1, repeat))))
+
+
+def bench_suite(
+    sizes: Tuple[int, ...] = SUITE_SIZES,
+    repeat: int = 5,
+    seed: int = 0,
+    fixtures_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    合成履歴（sizes 回ぶん）でホットパスを計測して、比較できる JSON を返す。
+      results[bench][str(size)] = _timing_stats（1回あたり）
+    """
+    from core.fetch import parse_month_html
+    from core.pages import build_numbers_pages
+
+    fixtures = _load_fixtures(fixtures_dir) if fixtures_dir else []
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def put(bench: str, size: int, stats: Dict[str, Any]) -> None:
+        results.setdefault(bench, {})[str(size)] = stats
+
+    with _in_tempdir():
+        for n in sizes:
+            hist = synthetic_history(n, 4, seed)
+            hist3 = synthetic_history(n, 3, seed)
+            nums = [[int(c) for c in it["num"]] for it in hist]
+            cols = ["n1", "n2", "n3", "n4"]
+
+            put("calc_trends_from_history", n, _time_repeat(lambda: calc_trends_from_history(nums, cols), repeat))
+
+            k = min(n, SUITE_CALLS)
+            trends = [calc_trends_from_history(nums[i:i + SUITE_PAGES], cols) for i in range(k)]
+            args = [(hist[i + 1]["num"] if i + 1 < n else hist[i]["num"], trends[i]) for i in range(k)]
+            put("generate_predictions", n, _time_calls(lambda a: generate_predictions("N4", a[0], a[1]), args))
+
+            raws = [generate_predictions("N4", a[0], a[1]) for a in args]
+            clear_shuffle_memo()
+            put("distill_predictions", n, _time_calls(lambda r: distill_predictions("N4", r), raws))
+            put("distill_predictions_memo", n, _time_calls(lambda r: distill_predictions("N4", r), raws))
+
+            mini = [[s[-2:] for s in distill_predictions("N4", r)] for r in raws]
+            put("nm_drift_unique", n, _time_calls(nm_drift_unique, mini))
+
+            def fill():
+                cache = {"N4": {}, "N3": {}, "NM": {}}
+                cache_items_by_round(cache, "N4", hist)
+                return cache
+            put("cache_items_by_round", n, _time_repeat(fill, repeat))
+            cache = fill()
+            put("cached_items", n, _time_repeat(lambda: cached_items(cache, "N4", limit=n), repeat))
+
+            if fixtures:
+                pages = fixtures
+            else:
+                m = min(n, SUITE_PARSE_MAX)
+                pages = [(synthetic_month_html(hist3[i:i + 20]), 3) for i in range(0, m, 20)]
+            put("parse_month_html", n, _time_calls(lambda p: parse_month_html(p[0], p[1]), pages))
+
+            # end to end：表示窓ぶんのページを空の pred store から作る（保存込み・メモなし）
+            window = cached_items(cache, "N4", limit=SUITE_PAGES)
+            def e2e():
+                clear_shuffle_memo()
+                return build_numbers_pages({"games": {}}, "N4", window)
+            put("build_numbers_pages", n, _time_repeat(e2e, max(1, repeat // 2)))
+
+    clear_shuffle_memo()
+    return {
+        "meta": {
+            "version": VERSION,
+            "python": sys.version.split()[0],
+            "seed": seed,
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "fixtures": len(fixtures),
+            "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare_bench(
+    base: Dict[str, Any],
+    new: Dict[str, Any],
+    tolerance: float = SUITE_TOLERANCE,
+    metric: str = "p50_ms",
+) -> List[Dict[str, Any]]:
+    """両方にある (bench, size) の metric を比べて、tolerance 倍より遅いものを返す"""
+    out = []
+    b_res = base.get("results", {})
+    for bench, by_size in new.get("results", {}).items():
+        for size, stats in by_size.items():
+            old = b_res.get(bench, {}).get(size)
+            if not old or not old.get(metric):
+                continue
+            ratio = stats.get(metric, 0.0) / old[metric]
+            if ratio > tolerance:
+                out.append({"bench": bench, "size": int(size), "base": old[metric], "new": stats.get(metric), "ratio": round(ratio, 3)})
+    return out
+
+
+def _main_suite(args: List[str]) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m core.bench suite")
+    ap.add_argument("--sizes", default=",".join(str(n) for n in SUITE_SIZES), help="comma-separated history sizes")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--fixtures", default=None, help="directory of recorded month-page HTML (*.html)")
+    ap.add_argument("--out", default=None, help="write the JSON result here")
+    ap.add_argument("--compare", default=None, help="baseline JSON; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=SUITE_TOLERANCE)
+    a = ap.parse_args(args)
+
+    sizes = tuple(int(x) for x in a.sizes.split(",") if x.strip())
+    result = bench_suite(sizes, repeat=a.repeat, seed=a.seed, fixtures_dir=a.fixtures)
+    regressions = []
+    if a.compare:
+        with open(a.compare, "r", encoding="utf-8") as f:
+            regressions = compare_bench(json.load(f), result, a.tolerance)
+        result["regressions"] = regressions
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if a.out:
+        os.makedirs(os.path.dirname(a.out) or ".", exist_ok=True)
+        with open(a.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 1 if regressions else 0
+
+
+def _main_cold_start(args: List[str]) -> int:
+    runs = int(args[0]) if args else 5
+    history = load_cold_start_history()
+    result = bench_cold_start(runs)
+    result["regressions"] = cold_start_regressions(result, history)
+    record_cold_start({k: v for k, v in result.items() if k != "regressions"})
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 1 if result["regressions"] else 0
+
+
+if __name__ == "__main__":
+    # python -m core.bench [n_pools] [out_n] [time_budget]
+    # python -m core.bench cold-start [runs]
+    # python -m core.bench drift
+    # python -m core.bench seed
+    # python -m core.bench suite [--sizes 100,1000] [--out a.json] [--compare base.json]
+    args = sys.argv[1:]
+    if args and args[0] == "cold-start":
+        sys.exit(_main_cold_start(args[1:]))
+    if args and args[0] == "suite":
+        sys.exit(_main_suite(args[1:]))
+    if args and args[0] == "drift":
+        res = bench_drift()
+        print(json.dumps(res, indent=2, ensure_ascii=False))
+        sys.exit(0 if all(r["same"] for r in res.values()) else 1)
+    if args and args[0] == "seed":
+        res = bench_seed()
+        print(json.dumps(res, indent=2, ensure_ascii=False))
+        sys.exit(0 if all(r["same"] for r in res.values()) else 1)
+    n_pools = int(args[0]) if len(args) > 0 else 1000
+    out_n = int(args[1]) if len(args) > 1 else 10
+    budget = float(args[2]) if len(args) > 2 else 0.05
+    print(json.dumps(bench_solver(n_pools, out_n, budget), indent=2, ensure_ascii=False))
@@ -0,0 +1,319 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+from core.cache import RESULTS_CACHE_FILE, KC_CACHE_FILE
+from core.cache import save_results_cache, cached_items, cache_items_by_round
+from core.cache import save_kc_cache, kc_get, kc_put
+from core.ledger import LEDGER_FILE, load_ledger, save_ledger, sync_ledger
+from core.metrics import metrics_report
+from core.net import http_cycle
+from core.config import PRED_FILE
+from core.pages import refresh_numbers_pages, build_nm_pages, build_kc_pages, kc_target_dates
+from core.pages import PAGE_MODEL_FILE, load_page_model, save_page_model
+from core.render import compact_payload
+from core.schedule import load_schedule_state, fetch_due, note_fetch, try_allowed, note_try
+from core.seedpack import import_seed_pack
+from core.stats import STATS_FILE, load_stats_index, save_stats_index, sync_stats
+from core.snapshot import export_snapshot, load_snapshot, snapshot_is_fresh
+from core.cache import load_results_cache, load_kc_cache
+from core.model import load_pred_store
+from core.store import BUILD_LOCK_FILE, file_lock, publish, shared_checkout
+
+# ============================================================
+# Headless build: fetch → cache → pages（Streamlit なし）
+#   python -m core.build            # app と同じ判定（core.schedule の抽せん日カレンダー）で取得
+#   python -m core.build --force    # 判定に関係なく取得（cron の事前ウォーム用）
+#   python -m core.build --snapshot # data/snapshots に描画済みページも書き出す
+#   python -m core.build --offline  # 取得しない（キャッシュだけで作る）
+#   python -m core.build --metrics  # 関数ごとの計測（core.metrics）も出す
+# ============================================================
+
+# 取得本数（回号ぶん）と表示ページ数
+N4_FETCH = 200
+N3_FETCH = 120
+N4_PAGES = 50
+N3_PAGES = 40
+KC_MAX_SCAN = 200
+KC_MAX_TRIES = 3   # 同じ不足日付での KC 総なめは3回まで（無い日を毎回探さない）
+
+
+@contextmanager
+def _stage(report: List[Dict[str, Any]], name: str):
+    t0 = time.perf_counter()
+    row: Dict[str, Any] = {"stage": name}
+    try:
+        yield row
+    finally:
+        row["sec"] = round(time.perf_counter() - t0, 4)
+        report.append(row)
+
+
+def build_all(force_fetch: bool = False, offline: bool = False) -> Tuple[Dict[str, list], List[Dict[str, Any]]]:
+    """
+    app.py の表示データ（data_for_js の実データ部分）を作る。
+    予想の保存は ensure_preds が新規作成のたびに行う（pages_* の時間に含まれる）。
+    offline=True なら取得は一切せずキャッシュだけで作る。
+    取得モジュール（requests / bs4）は取得するときだけ import する。
+    キャッシュ類はプロセス共有（core.store）で、全体を BUILD_LOCK_FILE の中で回す。
+    戻り値: (pages_by_game, ステージごとの計測)
+    """
+    report: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with file_lock(BUILD_LOCK_FILE):
+        report.append({"stage": "lock", "sec": round(time.perf_counter() - t0, 4)})
+        with http_cycle("build") as http:
+            pages = _build_locked(report, force_fetch, offline)
+        if http["requests"]:
+            report.append({"stage": "http", "sec": 0.0, "requests": http["requests"], "bytes": http["bytes"], "warn": http["warn"]})
+    return pages, report
+
+
+def _build_locked(report: List[Dict[str, Any]], force_fetch: bool, offline: bool) -> Dict[str, list]:
+    # 共有データの複製を直して、保存できたものだけ最後に差し替える
+    # （ビルド中も他のセッションは前の共有データをそのまま読める）
+    with _stage(report, "load"):
+        work = {
+            path: shared_checkout(path, loader)
+            for path, loader in (
+                (RESULTS_CACHE_FILE, load_results_cache),
+                (KC_CACHE_FILE, load_kc_cache),
+                (PRED_FILE, load_pred_store),
+                (PAGE_MODEL_FILE, load_page_model),
+                (STATS_FILE, load_stats_index),
+                (LEDGER_FILE, load_ledger),
+            )
+        }
+        results_cache = work[RESULTS_CACHE_FILE][0]
+        kc_cache = work[KC_CACHE_FILE][0]
+        pred_store = work[PRED_FILE][0]
+        page_model = work[PAGE_MODEL_FILE][0]
+        stats_index = work[STATS_FILE][0]
+        ledger = work[LEDGER_FILE][0]
+        sched = load_schedule_state()
+
+    # 同梱の seed pack（data/seed_pack.json.gz）があれば、未取り込みの分だけ足す
+    with _stage(report, "seed") as row:
+        row["imported"] = import_seed_pack(results_cache, kc_cache)
+        if row["imported"]:
+            save_results_cache(results_cache)
+            if row["imported"].get("KC"):
+                save_kc_cache(kc_cache)
+
+    # N4 / N3 (CACHE FIRST)：抽せん日カレンダーで「あるはずの回」が無いときだけ取得
+    for game, need in (("N4", N4_FETCH), ("N3", N3_FETCH)):
+        with _stage(report, f"fetch_{game}") as row:
+            row["fetched"] = 0
+            due, row["due"] = (True, "force") if force_fetch else fetch_due(results_cache, game, state=sched)
+            if not offline and due:
+                from core.fetch import fetch_last_n_results
+
+                # 取れなくてもキャッシュで描画を続ける（次の試行はバックオフ後）
+                try:
+                    fresh, _ = fetch_last_n_results(game, need=need)
+                    cache_items_by_round(results_cache, game, fresh, stats=stats_index)
+                    save_results_cache(results_cache)
+                    row["fetched"] = len(fresh)
+                except Exception as e:
+                    row["error"] = f"{type(e).__name__}: {e}"
+                finally:
+                    note_fetch(results_cache, game, row["fetched"], state=sched)
+
+    # 統計 index：取得分は O(1) で足してある。食い違い（seed 取り込み・古い回の差し込み）だけ作り直す
+    with _stage(report, "stats") as row:
+        row["rebuilt"] = sync_stats(stats_index, results_cache)
+        if row["rebuilt"] or any(r.get("fetched") for r in report):
+            save_stats_index(stats_index)
+
+    n4_items = cached_items(results_cache, "N4", limit=N4_PAGES)
+    n3_items = cached_items(results_cache, "N3", limit=N3_PAGES)
+
+    with _stage(report, "pages_N4") as row:
+        n4_pages, row["built"] = refresh_numbers_pages(pred_store, page_model, "N4", n4_items, N4_PAGES)
+        row["pages"] = len(n4_pages)
+    with _stage(report, "pages_N3") as row:
+        n3_pages, row["built"] = refresh_numbers_pages(pred_store, page_model, "N3", n3_items, N3_PAGES)
+        row["pages"] = len(n3_pages)
+    if any(r.get("built") for r in report):
+        save_page_model(page_model)
+    with _stage(report, "pages_NM") as row:
+        nm_pages = build_nm_pages(n3_pages)
+        row["pages"] = len(nm_pages)
+
+    # KC: キャッシュから埋めて、不足日付だけ取得
+    with _stage(report, "fetch_KC") as row:
+        target_dates = kc_target_dates(n4_pages)
+        kc_by_date = {}
+        for d in target_dates:
+            v = kc_get(kc_cache, d)
+            if v:
+                kc_by_date[d] = v
+        missing_dates = set(d for d in target_dates if d not in kc_by_date)
+        row["missing"] = len(missing_dates)
+        # 不足のうち一番新しい日付を目印に、バックオフ＋回数上限で総なめを間引く
+        kc_target = max(missing_dates) if missing_dates else None
+        kc_due = False
+        if missing_dates:
+            if force_fetch or len(kc_cache.get("by_date", {})) == 0:
+                kc_due, row["due"] = True, "force" if force_fetch else "warm"
+            else:
+                kc_due, row["due"] = try_allowed(sched, "KC", kc_target, max_tries=KC_MAX_TRIES)
+        if not offline and kc_due:
+            from core.moneyplan import moneyplan_build_date_map
+
+            got_map = {}
+            try:
+                got_map = moneyplan_build_date_map(missing_dates, max_scan=KC_MAX_SCAN)
+                for dt, it in got_map.items():
+                    if not it:
+                        continue
+                    res = it.get("result", "")
+                    pay = it.get("payout", {}) or {}
+                    if dt and res:
+                        kc_put(kc_cache, dt, res, pay)
+                        kc_by_date[dt] = {"result": res, "payout": pay}
+                if got_map:
+                    save_kc_cache(kc_cache)
+                row["fetched"] = len(got_map)
+            finally:
+                note_try(sched, "KC", kc_target, kc_target in got_map)
+    with _stage(report, "pages_KC") as row:
+        kc_pages = build_kc_pages(n4_pages, kc_by_date)
+        row["pages"] = len(kc_pages)
+
+    # 当たり判定の台帳：結果が入った回・予想が作り直された回だけ足す
+    with _stage(report, "ledger") as row:
+        row["added"] = {g: n for g, n in sync_ledger(ledger, pred_store, results_cache, kc_cache).items() if n}
+        if row["added"]:
+            save_ledger(ledger)
+
+    # 書いたのは自分だけ（ロック中）。保存できたファイルだけ、直した複製を共有にする
+    for path, (data, stamp) in work.items():
+        publish(path, data, stamp)
+    return {"N4": n4_pages, "N3": n3_pages, "NM": nm_pages, "KC": kc_pages}
+
+
+def build_snapshot(force_fetch: bool = False, offline: bool = False) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """build_all → compact payload → HTML 描画・スナップショット書き出し。戻り値: (manifest, 計測)"""
+    with file_lock(BUILD_LOCK_FILE):
+        pages, report = build_all(force_fetch=force_fetch, offline=offline)
+        with _stage(report, "compact"):
+            payload = compact_payload(pages)
+        with _stage(report, "snapshot") as row:
+            manifest = export_snapshot(payload)
+            row["hash"] = manifest["hash"]
+    return manifest, report
+
+
+def ensure_snapshot(force_fetch: bool = False, background: bool = False) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    ロックを取ってからもう一度 fresh を確かめ、古いときだけ build_snapshot。
+    同時に来た複数セッション（別プロセス含む）でもビルドは1回で済む。
+
+    background=True（app 用）：
+      - スナップショットが無い（初回起動）なら、取得なし（seed pack＋キャッシュ）で
+        すぐ作って返し、取得込みのビルドは裏のスレッドで回す
+      - 誰かがビルド中（ロックが取れない）なら、待たずに前のスナップショットを返す
+    """
+    if background:
+        manifest = load_snapshot()
+        if manifest is not None and warm_status()["running"]:
+            return manifest, []
+        if manifest is None:
+            with file_lock(BUILD_LOCK_FILE):
+                manifest = load_snapshot()
+                report: List[Dict[str, Any]] = []
+                if manifest is None:
+                    manifest, report = build_snapshot(offline=True)
+            start_background_build(force_fetch)
+            return manifest, report
+        with file_lock(BUILD_LOCK_FILE, blocking=False) as got:
+            if not got:
+                return manifest, []
+            return ensure_snapshot(force_fetch)
+
+    with file_lock(BUILD_LOCK_FILE):
+        manifest = load_snapshot()
+        if not force_fetch and snapshot_is_fresh(manifest):
+            return manifest, []
+        return build_snapshot(force_fetch=force_fetch)
+
+
+# ---------- background warm-up（初回起動の取得を描画の後ろに回す） ----------
+_warm: Dict[str, Any] = {"thread": None, "report": None, "error": None}
+_warm_guard = threading.Lock()
+
+
+def _warm_run(force_fetch: bool) -> None:
+    try:
+        _, _warm["report"] = ensure_snapshot(force_fetch)
+        _warm["error"] = None
+    except Exception as e:
+        _warm["error"] = f"{type(e).__name__}: {e}"
+
+
+def start_background_build(force_fetch: bool = False) -> bool:
+    """取得込みのビルドを裏で1本だけ走らせる（走っていれば何もしない）"""
+    with _warm_guard:
+        t = _warm["thread"]
+        if t is not None and t.is_alive():
+            return False
+        t = threading.Thread(target=_warm_run, args=(force_fetch,), name="miru-warm", daemon=True)
+        _warm["thread"] = t
+        t.start()
+        return True
+
+
+def warm_status() -> Dict[str, Any]:
+    t = _warm["thread"]
+    return {"running": bool(t and t.is_alive()), "report": _warm["report"], "error": _warm["error"]}
+
+
+def format_report(report: List[Dict[str, Any]]) -> str:
+    lines = []
+    total = 0.0
+    for row in report:
+        total += row.get("sec", 0.0)
+        extra = " ".join(f"{k}={v}" for k, v in row.items() if k not in ("stage", "sec"))
+        lines.append(f"{row['stage']:<12} {row.get('sec', 0.0):>8.3f}s  {extra}".rstrip())
+    lines.append(f"{'total':<12} {total:>8.3f}s")
+    return "\n".join(lines)
+
+
+def format_metrics(metrics: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for name, row in metrics.items():
+        extra = " ".join(f"{k}={v}" for k, v in row.items() if k not in ("calls", "total_ms"))
+        lines.append(f"{name:<18} {row['calls']:>6}x {row.get('total_ms', 0.0):>10.3f}ms  {extra}".rstrip())
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m core.build", description="MIRU-PAD headless build")
+    ap.add_argument("--force", action="store_true", help="fetch regardless of the draw-calendar schedule (core.schedule)")
+    ap.add_argument("--json", action="store_true", help="print the timing report as JSON")
+    ap.add_argument("--snapshot", action="store_true", help="also export the rendered pages to data/snapshots")
+    ap.add_argument("--offline", action="store_true", help="never fetch; build from the caches only")
+    ap.add_argument("--metrics", action="store_true", help="also print per-function counters (core.metrics)")
+    args = ap.parse_args(argv)
+
+    if args.snapshot:
+        _, report = build_snapshot(force_fetch=args.force, offline=args.offline)
+    else:
+        _, report = build_all(force_fetch=args.force, offline=args.offline)
+    if args.json:
+        out = {"stages": report, "metrics": metrics_report()} if args.metrics else report
+        print(json.dumps(out, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+        if args.metrics:
+            print(format_metrics(metrics_report()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from core.config import JST, safe_save_json
+from core.metrics import span
 
 RESULTS_CACHE_FILE = "data/results_cache.json"
 KC_CACHE_FILE = "data/kc_cache.json"
@@ -27,13 +28,16 @@ def hour_now() -> int:
 
 def _load_json(path: str, default: Dict[str, Any]) -> Dict[str, Any]:
     if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, dict):
-                return data
-        except Exception:
-            pass
+        with span("cache.load") as m:
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+                m["bytes_in"] += len(raw)
+                data = json.loads(raw.decode("utf-8"))
+                if isinstance(data, dict):
+                    return data
+            except Exception:
+                pass
     return dict(default)
 
 
@@ -43,6 +47,18 @@ def _save_json(path: str, data: Dict[str, Any]) -> bool:
     return bool(safe_save_json(d, path))
 
 
+def cache_rev(cache: Optional[Dict[str, Any]]) -> int:
+    """書き込みごとに上がる番号（件数が変わらない払戻の後入れも拾う。メモの無効化用）"""
+    try:
+        return int((cache or {}).get("rev", 0))
+    except Exception:
+        return 0
+
+
+def _bump_rev(cache: Dict[str, Any]) -> None:
+    cache["rev"] = cache_rev(cache) + 1
+
+
 def _norm_date(s: str) -> str:
     # accept "2026/1/5" etc and normalize
     if not s:
@@ -75,18 +91,28 @@ def save_results_cache(cache: Dict[str, Any]) -> bool:
     return _save_json(RESULTS_CACHE_FILE, cache)
 
 
-def cache_items_by_round(cache: Dict[str, Any], game: str, items: List[Dict[str, Any]]) -> None:
+def cache_items_by_round(
+    cache: Dict[str, Any],
+    game: str,
+    items: List[Dict[str, Any]],
+    stats: Optional[Dict[str, Any]] = None,
+) -> List[int]:
     """
     Store results by round, do NOT overwrite existing (past results immutable).
     Exception: if existing payout is empty and incoming has payout, we allow upgrade.
+    stats: core.stats の index。新しく入った回を古い順に O(1) で足す。
+    何か変えたら cache["rev"] を上げる。
+    Returns the newly inserted rounds.
     """
     if game not in ("N4", "N3"):
-        return
+        return []
     g = cache.setdefault(game, {})
     if not isinstance(g, dict):
         g = {}
         cache[game] = g
 
+    added = []
+    upgraded = False
     for it in items or []:
         try:
             rno = int(it.get("round"))
@@ -100,18 +126,31 @@ def cache_items_by_round(cache: Dict[str, Any], game: str, items: List[Dict[str,
 
         if key not in g:
             g[key] = {"round": rno, "date": date, "num": num, "payout": payout}
+            added.append(rno)
         else:
             # upgrade payout if previously empty
             old = g.get(key, {}) if isinstance(g.get(key), dict) else {}
             old_pay = old.get("payout", {}) if isinstance(old.get("payout", {}), dict) else {}
             if (not old_pay) and payout:
                 old["payout"] = payout
+                upgraded = True
             if (not old.get("date")) and date:
                 old["date"] = date
+                upgraded = True
             if (not old.get("num")) and num:
                 old["num"] = num
+                upgraded = True
             g[key] = old
 
+    if added or upgraded:
+        _bump_rev(cache)
+    if stats is not None and added:
+        from core.stats import stats_insert
+
+        for rno in sorted(added):
+            stats_insert(stats, game, rno, g[str(rno)]["num"])
+    return added
+
 
 def cached_items(cache: Dict[str, Any], game: str, limit: int = 120) -> List[Dict[str, Any]]:
     """
@@ -147,21 +186,6 @@ def cache_has_today(cache: Dict[str, Any], game: str, today: str) -> bool:
     return False
 
 
-def should_fetch_after_20(cache: Dict[str, Any], game: str) -> bool:
-    """
-    Rule:
-      - after 20:00 JST: fetch only if today's result not in cache
-      - before 20:00: do NOT fetch (use cache), unless cache is empty (first warm)
-    """
-    h = hour_now()
-    today = today_ymd()
-    if h < 20:
-        # allow warm-up only if empty
-        return len(cached_items(cache, game, limit=1)) == 0
-    # after 20: fetch only if missing today
-    return not cache_has_today(cache, game, today)
-
-
 # ----------------------------
 # KC cache (by date)
 # ----------------------------
@@ -186,6 +210,7 @@ def kc_get(cache: Dict[str, Any], date: str) -> Optional[Dict[str, Any]]:
 
 
 def kc_put(cache: Dict[str, Any], date: str, result: str, payout: Dict[str, Any]) -> None:
+    """無い日付は追加、ある日付は空の払戻・結果だけ埋める（変えたら cache["rev"] を上げる）"""
     date = _norm_date(date)
     by_date = cache.setdefault("by_date", {})
     if not isinstance(by_date, dict):
@@ -193,12 +218,18 @@ def kc_put(cache: Dict[str, Any], date: str, result: str, payout: Dict[str, Any]
         cache["by_date"] = by_date
     if date and date not in by_date:
         by_date[date] = {"result": result, "payout": payout or {}}
+        _bump_rev(cache)
     elif date:
         # upgrade payout if empty
         cur = by_date.get(date, {}) if isinstance(by_date.get(date), dict) else {}
         cur_pay = cur.get("payout", {}) if isinstance(cur.get("payout", {}), dict) else {}
+        changed = False
         if (not cur_pay) and payout:
             cur["payout"] = payout
+            changed = True
         if (not cur.get("result")) and result:
             cur["result"] = result
+            changed = True
         by_date[date] = cur
+        if changed:
+            _bump_rev(cache)
@@ -3,6 +3,8 @@ import os
 import tempfile
 from datetime import timedelta, timezone
 
+from core.metrics import span
+
 # 予想固定（preds）
 PRED_FILE = "data/miru_preds.json"
 
@@ -44,15 +46,41 @@ def safe_save_json(data, filepath):
     if dir_name and not os.path.exists(dir_name):
         os.makedirs(dir_name, exist_ok=True)
 
-    fd, temp_path = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
-    try:
-        with os.fdopen(fd, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(temp_path, filepath)
-        return True
-    except Exception:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    with span("io.save_json") as m:
+        fd, temp_path = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+                m["bytes_out"] += f.tell()
+            os.replace(temp_path, filepath)
+            return True
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+def safe_save_text(text: str, filepath: str) -> bool:
+    """safe_save_json のテキスト版（空なら保存しない／一時ファイル → os.replace）"""
+    if not text:
         return False
+
+    dir_name = os.path.dirname(filepath)
+    if dir_name and not os.path.exists(dir_name):
+        os.makedirs(dir_name, exist_ok=True)
+
+    with span("io.save_text") as m:
+        fd, temp_path = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+                m["bytes_out"] += f.tell()
+            os.replace(temp_path, filepath)
+            return True
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
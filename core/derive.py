@@ -0,0 +1,108 @@
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from core.mini import nm_drift_unique
+from core.model import KC_FRUIT_MAP, kc_from_n4_preds
+
+# ============================================================
+# Derived preds（元ゲームの予想行列からまとめて作る）
+#   NM … N3 予想の下2桁を drift で重複解消（core.mini.nm_drift_unique と同じ結果）
+#   KC … N4 予想の各桁をフルーツに（core.model.kc_from_n4_preds と同じ結果）
+#   全ページの予想を (ページ数, 口数, 桁) の配列にして、列ごとに一括で処理する。
+#   桁数・口数がそろわない行と、行数が _BATCH_MIN_ROWS 未満のときは元の関数で1行ずつ（結果は同じ）。
+#   numpy の呼び出しは固定費が大きく、10口×数行だと1行ずつの方が速い（16行で並ぶ）
+#   他の派生ゲームは register_derived で足す（fn は予想行のリスト → 派生行のリスト）
+# ============================================================
+NM_SPACE = 100
+_BATCH_MIN_ROWS = 16
+
+# drift の探索順（0, +1, -1, +2, -2, ... , +50）。同距離は + が先（core.drift と同じ）
+_NM_OFFS = np.array([0] + [d for k in range(1, NM_SPACE // 2) for d in (k, -k)] + [NM_SPACE // 2], dtype=np.int64)
+_NM_NAMES = [f"{v:02d}" for v in range(NM_SPACE)]
+
+
+def _digit_cube(rows: List[List[str]], digits: int):
+    """全行が同じ口数・全部 digits 桁の数字なら (行, 口, 桁) uint8。そろわなければ None"""
+    if not rows:
+        return None
+    width = len(rows[0])
+    if not width or any(len(r) != width for r in rows):
+        return None
+    flat = "".join(str(x) for r in rows for x in r)
+    if len(flat) != len(rows) * width * digits or not flat.isascii() or not flat.isdigit():
+        return None
+    return (np.frombuffer(flat.encode("ascii"), dtype=np.uint8) - 48).reshape(len(rows), width, digits)
+
+
+def drift_columns(bases: np.ndarray) -> np.ndarray:
+    """
+    (行, 口) の base（0..99）を行ごとに先頭の口から drift_take したのと同じ値。
+    口（列）ごとに全行まとめて「探索順で最初の空き」を取る。
+    base が空いている行がほとんどなので、探索は埋まっていた行だけ。
+    """
+    m, width = bases.shape
+    taken = np.zeros((m, NM_SPACE), dtype=bool)
+    out = bases.astype(np.int64, copy=True)
+    rows = np.arange(m)
+    for j in range(width):
+        v = out[:, j]
+        hit = np.nonzero(taken[rows, v])[0]
+        if len(hit):
+            cand = (v[hit, None] + _NM_OFFS[None, :]) % NM_SPACE
+            free = ~taken[hit[:, None], cand]
+            first = free.argmax(axis=1)
+            # 空きが無い行（100 口を超えた行）は base のまま（nm_drift_unique と同じ）
+            ok = free[np.arange(len(hit)), first]
+            v[hit[ok]] = cand[ok, first[ok]]
+        taken[rows, v] = True
+    return out
+
+
+def derive_nm_preds(n3_rows: List[List[str]]) -> List[List[str]]:
+    """N3 の予想行（ページ順）→ NM の予想行"""
+    cube = _digit_cube(n3_rows, 3) if len(n3_rows) >= _BATCH_MIN_ROWS else None
+    if cube is None:
+        return [nm_drift_unique([str(x)[-2:] for x in (r or [])]) for r in n3_rows]
+    bases = cube[:, :, 1].astype(np.int64) * 10 + cube[:, :, 2]
+    return [[_NM_NAMES[v] for v in row] for row in drift_columns(bases).tolist()]
+
+
+# 数字 → フルーツ番号（0..4）。4 桁ぶんの番号を 5 進で1つの値にして 625 通りの表を引く
+_KC_FRUITS = sorted(set(KC_FRUIT_MAP.values()), key=list(KC_FRUIT_MAP.values()).index)
+_KC_DIGIT = np.array([_KC_FRUITS.index(KC_FRUIT_MAP[str(d)]) for d in range(10)], dtype=np.int64)
+_KC_TABLE: List[str] = []
+
+
+def _kc_table() -> List[str]:
+    if not _KC_TABLE:
+        n = len(_KC_FRUITS)
+        for v in range(n ** 4):
+            _KC_TABLE.append("".join(_KC_FRUITS[(v // n ** (3 - i)) % n] for i in range(4)))
+    return _KC_TABLE
+
+
+def derive_kc_preds(n4_rows: List[List[str]], out_n: int = 10) -> List[List[str]]:
+    """N4 の予想行 → KC の予想行（out_n 口にそろえる）"""
+    cube = _digit_cube(n4_rows, 4) if len(n4_rows) >= _BATCH_MIN_ROWS else None
+    if cube is None or cube.shape[1] < out_n:
+        return [kc_from_n4_preds(r, out_n) for r in n4_rows]
+    n = len(_KC_FRUITS)
+    codes = _KC_DIGIT[cube[:, :out_n]] @ np.array([n ** 3, n ** 2, n, 1], dtype=np.int64)
+    table = _kc_table()
+    return [[table[v] for v in row] for row in codes.tolist()]
+
+
+DERIVED: Dict[str, Dict[str, Any]] = {
+    "NM": {"src": "N3", "fn": derive_nm_preds},
+    "KC": {"src": "N4", "fn": derive_kc_preds},
+}
+
+
+def register_derived(game: str, src: str, fn: Callable[[List[List[str]]], List[List[str]]]) -> None:
+    """派生ゲームを足す（src の予想行をまとめて受け取り、同じ順で返す）"""
+    DERIVED[game] = {"src": src, "fn": fn}
+
+
+def derive_preds(game: str, src_rows: List[List[str]]) -> List[List[str]]:
+    return DERIVED[game]["fn"](src_rows)
@@ -0,0 +1,70 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+# ============================================================
+# Unique-drift allocator（巡回空間で「いちばん近い空き値」を割り当てる）
+#   - 探索順は +1, -1, +2, -2, ...（同距離なら + を優先）
+#   - 使用済みの値だけ「右隣／左隣へのジャンプ」を持つ（経路圧縮つき union-find）。
+#     空き値は表に載らないので、たどった先が base から見て右／左の最寄りの空き。
+#     1回あたり償却ほぼ O(1)（素直な走査は、重複が同じあたりに集まるほど1回 O(space) になる）
+#   - base が散らばった少数の割り当てでは、set の走査の方が定数倍（2〜3倍）速い
+#   - 表は dict なので、10^4 空間に数本だけ取る場合も空間ぶんの確保はしない
+#   - NM(00-99) / N3(000-999) / N4(0000-9999) などの 10^k 空間で共通に使う
+#   計測：python -m core.bench drift（走査版との一致と速度比）
+# ============================================================
+
+
+def new_drift_space(space: int, taken: Iterable[int] = ()) -> Dict[str, Any]:
+    st: Dict[str, Any] = {"space": max(1, int(space)), "right": {}, "left": {}}
+    for v in taken:
+        _mark(st, int(v) % st["space"])
+    return st
+
+
+def _mark(st: Dict[str, Any], v: int) -> None:
+    if v in st["right"]:
+        return
+    space = st["space"]
+    st["right"][v] = (v + 1) % space
+    st["left"][v] = (v - 1) % space
+
+
+def _find(jump: Dict[int, int], v: int) -> int:
+    # v から jump をたどった最初の空き値（途中の使用済みは行き先を直接その空きへ）
+    root = v
+    while root in jump:
+        root = jump[root]
+    while v != root:
+        jump[v], v = root, jump[v]
+    return root
+
+
+def drift_used(st: Dict[str, Any]) -> int:
+    return len(st["right"])
+
+
+def drift_take(st: Dict[str, Any], base: int) -> Optional[int]:
+    """
+    base が空いていれば base、使用済みなら最も近い空き値を確保して返す。
+    空間が埋まっていれば None。
+    """
+    space = st["space"]
+    right = st["right"]
+    base = int(base) % space
+    if base in right:
+        if len(right) >= space:
+            return None
+        r = _find(right, base)
+        l = _find(st["left"], base)
+        v = r if (r - base) % space <= (base - l) % space else l
+    else:
+        v = base
+    right[v] = (v + 1) % space
+    st["left"][v] = (v - 1) % space
+    return v
+
+
+def drift_alloc(bases: Iterable[int], space: int, taken: Iterable[int] = ()) -> List[Optional[int]]:
+    """bases を先頭から順に drift_take した結果（一括版）"""
+    st = new_drift_space(space, taken)
+    take = drift_take
+    return [take(st, b) for b in bases]
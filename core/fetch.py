@@ -1,9 +1,11 @@
-import requests
 import re
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
 from core.config import HEADERS
+from core.metrics import span, timed
+from core.net import http_get
+
+# bs4 は実際に取得するときだけ読み込む（キャッシュだけの起動を軽くする）
 
 ROUND_RE = re.compile(r"(?:回号\s*)?第(\d+)回")
 DATE_RE  = re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})")
@@ -16,11 +18,18 @@ def _strip_pua(s: str) -> str:
     # 私用領域（Termius等で混ざる “” 系）を除去
     return re.sub(r"[\uf000-\uf8ff]", "", s)
 
-def get_month_urls(past_url: str) -> list[str]:
-    r = requests.get(past_url, headers=HEADERS, timeout=20)
+def _get_soup(url: str):
+    """GET → BeautifulSoup（通信は core.net が host 別に記録）"""
+    from bs4 import BeautifulSoup
+
+    r = http_get(url, headers=HEADERS, timeout=20, retries=1)
     r.raise_for_status()
-    r.encoding = r.apparent_encoding
-    soup = BeautifulSoup(r.text, "html.parser")
+    with span("fetch.parse"):
+        r.encoding = r.apparent_encoding
+        return BeautifulSoup(r.text, "html.parser")
+
+def get_month_urls(past_url: str) -> list[str]:
+    soup = _get_soup(past_url)
 
     urls = []
     for a in soup.find_all("a"):
@@ -90,11 +99,17 @@ def _scan_payout_lines(lines: list[str], digits: int) -> dict:
     return payout
 
 def parse_month_page(url: str, digits: int) -> list[dict]:
-    r = requests.get(url, headers=HEADERS, timeout=20)
-    r.raise_for_status()
-    r.encoding = r.apparent_encoding
-    soup = BeautifulSoup(r.text, "html.parser")
+    return parse_month_soup(_get_soup(url), digits)
+
+def parse_month_html(html: str, digits: int) -> list[dict]:
+    """保存済み HTML（ベンチ用フィクスチャなど）から parse_month_page と同じ結果を作る"""
+    from bs4 import BeautifulSoup
+
+    with span("fetch.parse"):
+        soup = BeautifulSoup(html, "html.parser")
+    return parse_month_soup(soup, digits)
 
+def parse_month_soup(soup, digits: int) -> list[dict]:
     text = soup.get_text("\n", strip=True)
     text = _strip_pua(text)
 
@@ -142,6 +157,7 @@ def parse_month_page(url: str, digits: int) -> list[dict]:
     items.sort(key=lambda x: x.get("round", 0), reverse=True)
     return items
 
+@timed("fetch.results")
 def fetch_last_n_results(game: str, need: int = 20):
     if game == "N4":
         past_url = "https://takarakuji.rakuten.co.jp/backnumber/numbers4/"
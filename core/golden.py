@@ -0,0 +1,364 @@
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core import reference
+from core.config import safe_save_json
+from core.derive import derive_nm_preds
+from core.mini import nm_drift_unique
+from core.model import VERSION, calc_trends_from_history, distill_predictions, generate_predictions
+from core.pages import _pad_to_n
+from core.shuffle import _recompose, clear_shuffle_memo, recompose_violations, shuffle_recompose
+
+# ============================================================
+# Golden-output harness（高速化した別実装が、基準実装と完全一致するか）
+#   python -m core.golden record [--n 1000]   # 基準実装の出力を data/golden/ に記録
+#   python -m core.golden check  [--target X] # 全エンジンを記録と突き合わせ＋速度比
+#   python -m core.golden constraints         # shuffle_recompose の大量本数（100–800）の制約検査
+#   - 入力コーパスは seed から決定論で作る（記録にはダイジェストだけ持つ）
+#   - "reference" は core.reference（変更前 v2026-01-22a の実装の写し）、"current" は今の本番実装。
+#     記録は reference から取るので、check が通れば保存済み予想が変わっていないことになる
+#   - 記録と VERSION が同じなのに出力が違えば check は失敗。record も上書きを拒む
+#     （予想を変えるなら VERSION を上げ、同じコミットで記録し直す）
+#   - 新しい実装は register_engine(target, name, fn) で足す
+# ============================================================
+GOLDEN_DIR = "data/golden"
+GOLDEN_N = 1000
+GOLDEN_SEED = 20260101
+CONSTRAINT_SIZES = (100, 200, 300, 400, 500, 600, 700, 800)
+CONSTRAINT_POOLS = 10
+
+
+# ----------------------------
+# corpus（target ごとの入力。各要素は fn(*args) の args）
+# ----------------------------
+def _corpus_trends(rng: random.Random, n: int) -> List[tuple]:
+    out = []
+    for _ in range(n):
+        digits = rng.choice([3, 4])
+        cols = ["n1", "n2", "n3", "n4"][:digits]
+        rows = rng.choice([0, 1, 2, 5, 20, 50, 200])
+        nums = [[rng.randint(0, 9) for _ in range(digits)] for _ in range(rows)]
+        out.append((nums, cols))
+    return out
+
+
+def _corpus_generate(rng: random.Random, n: int) -> List[tuple]:
+    out = []
+    for _ in range(n):
+        game = rng.choice(["N4", "N3"])
+        digits = 4 if game == "N4" else 3
+        cols = ["n1", "n2", "n3", "n4"][:digits]
+        r = rng.random()
+        if r < 0.05:
+            last = ""
+        elif r < 0.10:
+            last = "".join(rng.choice("0123456789x") for _ in range(digits))
+        else:
+            last = "".join(rng.choice("0123456789") for _ in range(digits))
+        trends = {c: rng.randint(-5, 5) for c in cols}
+        out.append((game, last, trends))
+    return out
+
+
+def _corpus_shuffle(rng: random.Random, n: int) -> List[tuple]:
+    out = []
+    for _ in range(n):
+        game = rng.choice(["N4", "N3"])
+        digits = 4 if game == "N4" else 3
+        # 基準実装は10本固定（大量本数は constraints で見る）
+        alpha = rng.sample("0123456789", rng.choice([1, 2, 3, 4, 5, 6, 8, 10]))
+        preds = ["".join(rng.choice(alpha) for _ in range(digits)) for _ in range(rng.randint(1, 10))]
+        out.append((game, preds))
+    return out
+
+
+def _corpus_distill(rng: random.Random, n: int) -> List[tuple]:
+    """generate_predictions の素材（7割）と、数字の少ない崩れた素材（3割）"""
+    out = []
+    for game, last, trends in _corpus_generate(rng, n):
+        if rng.random() < 0.7:
+            raw = reference.generate_predictions(game, last, trends)
+        else:
+            digits = 4 if game == "N4" else 3
+            alpha = rng.sample("0123456789", rng.choice([1, 2, 3]))
+            raw = ["".join(rng.choice(alpha) for _ in range(digits)) for _ in range(rng.randint(0, 10))]
+        out.append((game, raw))
+    return out
+
+
+def _corpus_pad(rng: random.Random, n: int) -> List[tuple]:
+    out = []
+    for _ in range(n):
+        digits = rng.choice([3, 4])
+        preds = ["".join(rng.choice("0123456789") for _ in range(digits)) for _ in range(rng.randint(0, 12))]
+        if rng.random() < 0.2 and preds:
+            preds[rng.randrange(len(preds))] = rng.choice(["", "x", "12", "12345"])
+        out.append((preds, digits))
+    return out
+
+
+def _corpus_nm(rng: random.Random, n: int) -> List[tuple]:
+    out = []
+    for _ in range(n):
+        k = rng.choice([10, 10, 20, 50, 100])
+        spread = rng.choice([3, 10, 100])
+        base = rng.randint(0, 99)
+        preds = [f"{(base + rng.randint(0, spread - 1)) % 100:02d}" for _ in range(k)]
+        if rng.random() < 0.1:
+            preds[rng.randrange(k)] = rng.choice(["", "x", " 7", "123"])
+        out.append((preds,))
+    return out
+
+
+# ----------------------------
+# engines（"reference" は core.reference、"current" は本番。引数は同じ）
+# ----------------------------
+def _nm_drift_batched(preds_2d: List[str]) -> List[str]:
+    """core.derive の一括版（N3 予想の形にして1行だけ渡す）"""
+    return derive_nm_preds([["0" + str(s) for s in preds_2d]])[0]
+
+
+TARGETS: Dict[str, Dict[str, Any]] = {
+    "calc_trends_from_history": {
+        "corpus": _corpus_trends,
+        "engines": {"reference": reference.calc_trends_from_history, "current": calc_trends_from_history},
+    },
+    "generate_predictions": {
+        "corpus": _corpus_generate,
+        "engines": {"reference": reference.generate_predictions, "current": generate_predictions},
+    },
+    "shuffle_recompose": {
+        "corpus": _corpus_shuffle,
+        "engines": {
+            "reference": reference.shuffle_recompose,
+            "current": lambda game, preds: _recompose(game, preds, out_n=10),
+            "memo": lambda game, preds: shuffle_recompose(game, preds, out_n=10),
+        },
+        "reset": clear_shuffle_memo,
+    },
+    "distill_predictions": {
+        "corpus": _corpus_distill,
+        "engines": {
+            "reference": lambda game, raw: reference.distill_predictions(game, raw, 10),
+            "current": lambda game, raw: distill_predictions(game, raw, 10),
+        },
+        "reset": clear_shuffle_memo,
+    },
+    "nm_drift_unique": {
+        "corpus": _corpus_nm,
+        "engines": {"reference": reference.nm_drift_unique, "current": nm_drift_unique, "batched": _nm_drift_batched},
+    },
+    "pad_preds": {
+        "corpus": _corpus_pad,
+        "engines": {"reference": reference._pad_to_10, "current": lambda preds, digits: _pad_to_n(preds, digits, 10)},
+    },
+}
+
+
+def register_engine(target: str, name: str, fn: Callable[..., Any]) -> None:
+    """別実装を足す（fn の引数は reference と同じ）"""
+    if target not in TARGETS:
+        raise KeyError(f"unknown golden target: {target}")
+    TARGETS[target]["engines"][name] = fn
+
+
+# ----------------------------
+# record / check
+# ----------------------------
+def _digest(obj: Any) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def _golden_path(target: str, golden_dir: str) -> str:
+    return os.path.join(golden_dir, f"{target}.json")
+
+
+def build_corpus(target: str, n: int = GOLDEN_N, seed: int = GOLDEN_SEED) -> List[tuple]:
+    return TARGETS[target]["corpus"](random.Random(f"{target}:{seed}"), n)
+
+
+def _run(target: str, engine: str, corpus: List[tuple]) -> Tuple[List[str], float]:
+    spec = TARGETS[target]
+    fn = spec["engines"][engine]
+    if spec.get("reset"):
+        spec["reset"]()
+    digests = []
+    sec = 0.0
+    for args in corpus:
+        t0 = time.perf_counter()
+        out = fn(*args)
+        sec += time.perf_counter() - t0
+        digests.append(_digest(out))
+    return digests, sec
+
+
+def record_engine() -> str:
+    """記録に使うエンジン（VERSION を上げたら、その VERSION の本番実装が新しい基準）"""
+    return "reference" if VERSION == reference.REFERENCE_VERSION else "current"
+
+
+def _load_golden(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_golden(
+    targets: Optional[List[str]] = None,
+    n: int = GOLDEN_N,
+    seed: int = GOLDEN_SEED,
+    golden_dir: str = GOLDEN_DIR,
+) -> Dict[str, str]:
+    """
+    record_engine() の出力ダイジェストを記録。戻り値: {target: 全体ダイジェスト}
+    同じ VERSION・同じ入力の記録があって出力だけ違う target は上書きしない（"refused"）。
+    """
+    engine = record_engine()
+    out = {}
+    for target in targets or list(TARGETS):
+        corpus = build_corpus(target, n, seed)
+        digests, _ = _run(target, engine, corpus)
+        data = {
+            "target": target,
+            "version": VERSION,
+            "engine": engine,
+            "seed": seed,
+            "n": n,
+            "corpus": _digest(corpus),
+            "total": _digest(digests),
+            "digests": digests,
+        }
+        path = _golden_path(target, golden_dir)
+        old = _load_golden(path)
+        if old and old.get("version") == VERSION and old.get("corpus") == data["corpus"] and old.get("total") != data["total"]:
+            out[target] = "refused"
+            continue
+        safe_save_json(data, path)
+        out[target] = data["total"]
+    return out
+
+
+def check_golden(
+    targets: Optional[List[str]] = None,
+    engines: Optional[List[str]] = None,
+    golden_dir: str = GOLDEN_DIR,
+) -> Dict[str, Any]:
+    """
+    記録と同じ入力で各エンジンを回して一致数と速度比（reference 比）を出す。
+    記録が無い target は "missing"、入力が作り直せない（corpus 不一致）なら "corpus_changed"。
+    記録の VERSION が今と違えば "version_changed"（予想を変えた後。record し直す）。
+    VERSION が同じで1件でも違えば "mismatch"。
+    """
+    report: Dict[str, Any] = {}
+    for target in targets or list(TARGETS):
+        golden = _load_golden(_golden_path(target, golden_dir))
+        if golden is None:
+            report[target] = {"status": "missing"}
+            continue
+        corpus = build_corpus(target, golden["n"], golden["seed"])
+        if _digest(corpus) != golden["corpus"]:
+            report[target] = {"status": "corpus_changed"}
+            continue
+
+        base = record_engine()
+        names = [e for e in TARGETS[target]["engines"] if not engines or e in engines or e == base]
+        # VERSION を上げた後の reference（旧 VERSION の写し）は比べない
+        if base != "reference":
+            names = [e for e in names if e != "reference"]
+        rows: Dict[str, Any] = {}
+        base_sec = None
+        for name in names:
+            digests, sec = _run(target, name, corpus)
+            bad = [i for i, (a, b) in enumerate(zip(digests, golden["digests"])) if a != b]
+            rows[name] = {
+                "ok": not bad and len(digests) == len(golden["digests"]),
+                "mismatches": len(bad),
+                "first_mismatch": bad[0] if bad else None,
+                "ms": round(1000 * sec, 3),
+            }
+            if name == base:
+                base_sec = sec
+        for row in rows.values():
+            row["speedup"] = round(base_sec / max(row["ms"] / 1000, 1e-9), 3) if base_sec else None
+        if golden.get("version") != VERSION:
+            status = "version_changed"
+        else:
+            status = "ok" if all(r["ok"] for r in rows.values()) else "mismatch"
+        report[target] = {
+            "status": status,
+            "version": golden.get("version"),
+            "n": golden["n"],
+            "engines": rows,
+        }
+    return report
+
+
+# ----------------------------
+# constraints（記録との一致ではなく、出力が制約を満たすか）
+# ----------------------------
+def check_recompose_constraints(
+    sizes=CONSTRAINT_SIZES,
+    pools: int = CONSTRAINT_POOLS,
+    seed: int = GOLDEN_SEED,
+) -> Dict[str, Any]:
+    """
+    一様ランダムな素材（N3/N4 × sizes 本 × pools 個）で _recompose を回し、
+    recompose_violations（重複・同じ数字3個以上・素材の変化・本数）を数える。
+    """
+    report: Dict[str, Any] = {}
+    for game in ("N3", "N4"):
+        digits = 4 if game == "N4" else 3
+        for out_n in sizes:
+            rng = random.Random(f"constraints:{game}:{out_n}:{seed}")
+            bad: Dict[str, int] = {}
+            sec = 0.0
+            for _ in range(pools):
+                preds = ["".join(rng.choice("0123456789") for _ in range(digits)) for _ in range(out_n)]
+                t0 = time.perf_counter()
+                rows = _recompose(game, preds, out_n=out_n)
+                sec += time.perf_counter() - t0
+                for v in recompose_violations(game, preds, rows, out_n):
+                    bad[v] = bad.get(v, 0) + 1
+            report[f"{game}x{out_n}"] = {
+                "status": "ok" if not bad else "violation",
+                "pools": pools,
+                "violations": bad,
+                "ms_per_pool": round(1000 * sec / max(1, pools), 3),
+            }
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m core.golden", description="golden-output equivalence harness")
+    ap.add_argument("cmd", choices=["record", "check", "constraints"])
+    ap.add_argument("--target", action="append", help="limit to these targets (repeatable)")
+    ap.add_argument("--engine", action="append", help="limit check to these engines (repeatable)")
+    ap.add_argument("--n", type=int, default=GOLDEN_N)
+    ap.add_argument("--seed", type=int, default=GOLDEN_SEED)
+    ap.add_argument("--dir", default=GOLDEN_DIR)
+    ap.add_argument("--pools", type=int, default=CONSTRAINT_POOLS, help="constraints: pools per size")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "record":
+        out = record_golden(args.target, args.n, args.seed, args.dir)
+        print(json.dumps(out, indent=2))
+        # 同じ VERSION のまま出力が変わった記録は上書きしない（VERSION を上げる）
+        return 1 if "refused" in out.values() else 0
+    if args.cmd == "constraints":
+        report = check_recompose_constraints(pools=args.pools, seed=args.seed)
+    else:
+        report = check_golden(args.target, args.engine, args.dir)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if all(r.get("status") in ("ok", "version_changed") for r in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.config import JST, safe_save_json
+from core.payout import stored_preds, hit_matrix, payout_table
+
+# ============================================================
+# Hit ledger（保存済み予想の当たり判定を回ごとに残す）
+#   画面の renderMarkedDigitsSB は毎回ブラウザで判定するだけで残らないので、
+#   保存済み予想（core.predstore）の各回 × N4/N3/NM/KC について 10 口の判定を1文字ずつ持つ。
+#     N4 … S（ストレート）/ B（ボックス）/ -
+#     N3 … S / B / M（ミニのみ：下2桁一致）/ -
+#     NM … M / -
+#     KC … 1 / 2 / 3（等）/ -
+#   セットは S → SET-S、B → SET-B と読む（同じ判定）。
+#   行は {回号: [判定, 予想と結果の crc32]}。crc が同じ回は判定し直さない
+#   （新しい結果が入った回・予想が作り直された回だけ sync_ledger で足す）。
+#   pred store は history_limit で古い回が落ちるが、ledger には LEDGER_KEEP 回まで残す。
+# ============================================================
+LEDGER_FILE = "data/hit_ledger.json"
+LEDGER_VERSION = 1
+LEDGER_KEEP = 5000
+LEDGER_GAMES = ("N4", "N3", "NM", "KC")
+MISS = "-"
+
+
+def new_ledger() -> Dict[str, Any]:
+    return {"v": LEDGER_VERSION, "games": {g: {} for g in LEDGER_GAMES}, "updated_at": ""}
+
+
+def load_ledger(path: str = LEDGER_FILE) -> Dict[str, Any]:
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("v") == LEDGER_VERSION:
+                games = data.setdefault("games", {})
+                for g in LEDGER_GAMES:
+                    games.setdefault(g, {})
+                return data
+        except Exception:
+            pass
+    return new_ledger()
+
+
+def save_ledger(ledger: Dict[str, Any], path: str = LEDGER_FILE) -> bool:
+    ledger = dict(ledger)
+    ledger["updated_at"] = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+    return bool(safe_save_json(ledger, path))
+
+
+def _sig(preds: List[str], result: str) -> str:
+    return format(zlib.crc32(("|".join(preds) + "#" + result).encode("utf-8")), "08x")
+
+
+def classify(game: str, preds: List[List[str]], results: List[str]) -> List[str]:
+    """回ごとの判定文字列（hit_matrix をまとめて1回）"""
+    if not results:
+        return []
+    hm = hit_matrix(game, preds, results)
+    m, width = len(results), len(preds[0])
+    codes = np.full((m, width), MISS, dtype="<U1")
+    if game == "KC":
+        for n, ch in ((2, "3"), (3, "2"), (4, "1")):
+            codes[hm["match"] == n] = ch
+    elif game == "NM":
+        codes[hm["mini"]] = "M"
+    else:
+        if "mini" in hm:
+            codes[hm["mini"]] = "M"
+        codes[hm["box"]] = "B"
+        codes[hm["str"]] = "S"
+    return ["".join(row) for row in codes]
+
+
+def sync_ledger(
+    ledger: Dict[str, Any],
+    pred_store: Dict[str, Any],
+    results_cache: Dict[str, Any],
+    kc_cache: Optional[Dict[str, Any]] = None,
+    games=LEDGER_GAMES,
+) -> Dict[str, int]:
+    """
+    結果のある回のうち、未記録か予想・結果が変わった回だけ判定して足す。
+    戻り値: ゲームごとの更新した回数（0 なら保存不要）
+    """
+    changed = {}
+    for game in games:
+        rows = ledger["games"].setdefault(game, {})
+        table = payout_table(game, results_cache, kc_cache)
+        pos = {int(r): i for i, r in enumerate(table["rounds"])}
+        todo_rounds, todo_preds, todo_results, sigs = [], [], [], []
+        for rno, preds in sorted(stored_preds(pred_store, game).items()):
+            i = pos.get(rno)
+            if i is None:
+                continue
+            res = table["results"][i]
+            sig = _sig(preds, res)
+            old = rows.get(str(rno))
+            if old and old[1] == sig:
+                continue
+            todo_rounds.append(rno)
+            todo_preds.append(preds)
+            todo_results.append(res)
+            sigs.append(sig)
+        if not todo_rounds:
+            changed[game] = 0
+            continue
+        width = max(len(p) for p in todo_preds)
+        padded = [p + [p[-1]] * (width - len(p)) for p in todo_preds]
+        for rno, preds, code, sig in zip(todo_rounds, todo_preds, classify(game, padded, todo_results), sigs):
+            rows[str(rno)] = [code[:len(preds)], sig]
+        if len(rows) > LEDGER_KEEP:
+            for k in sorted(rows, key=int)[:-LEDGER_KEEP]:
+                del rows[k]
+        changed[game] = len(todo_rounds)
+    return changed
+
+
+# ----------------------------
+# queries
+# ----------------------------
+def _is_hit(code: str, kinds: str) -> bool:
+    return any(ch in kinds for ch in code)
+
+
+def hit_history(
+    ledger: Dict[str, Any],
+    game: str,
+    kinds: str = "SB123M",
+    top: int = 10,
+    last: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """新しい回から順に {round, code, hits}（hits は上位 top 口のうち kinds に入る口数）"""
+    rows = ledger["games"].get(game, {})
+    out = []
+    for k in sorted(rows, key=int, reverse=True)[:last]:
+        code = rows[k][0][:top]
+        out.append({"round": int(k), "code": code, "hits": sum(ch in kinds for ch in code)})
+    return out
+
+
+def hit_counts(ledger: Dict[str, Any], game: str, top: int = 10, last: Optional[int] = None) -> Dict[str, int]:
+    """判定文字ごとの口数（直近 last 回、上位 top 口）"""
+    counts: Dict[str, int] = {"rounds": 0}
+    for h in hit_history(ledger, game, top=top, last=last):
+        counts["rounds"] += 1
+        for ch in h["code"]:
+            if ch != MISS:
+                counts[ch] = counts.get(ch, 0) + 1
+    return counts
+
+
+def streaks(ledger: Dict[str, Any], game: str, kinds: str = "SB123M", top: int = 10) -> Dict[str, Any]:
+    """
+    当たり（上位 top 口のどれかが kinds）の連続。回号が飛んでいる所で切る。
+    {current: {"hit": bool, "len": n}, longest_hit, longest_miss}
+    """
+    rows = ledger["games"].get(game, {})
+    cur_hit, cur_len, prev = None, 0, None
+    longest = {True: 0, False: 0}
+    for k in sorted(rows, key=int):
+        rno = int(k)
+        hit = _is_hit(rows[k][0][:top], kinds)
+        if hit == cur_hit and prev is not None and rno == prev + 1:
+            cur_len += 1
+        else:
+            cur_hit, cur_len = hit, 1
+        longest[hit] = max(longest[hit], cur_len)
+        prev = rno
+    return {
+        "current": {"hit": bool(cur_hit), "len": cur_len} if cur_hit is not None else {"hit": False, "len": 0},
+        "longest_hit": longest[True],
+        "longest_miss": longest[False],
+    }
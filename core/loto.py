@@ -0,0 +1,252 @@
+from math import comb
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.metrics import timed
+from core.model import SEED_SCHEME_BY_VERSION, VERSION, save_pred_store
+from core.predstore import ring_get, ring_put, store_game
+from core.seed import seed_hash
+
+# ============================================================
+# LOTO 7 / LOTO 6 / MINI LOTO / BINGO 5（k 個を n 個から選ぶゲームの生成エンジン）
+#   1口 = uint64 のビットマスク（数字 x → bit x-1）。重複除去は np.unique、
+#   当たり判定は popcount(口 & 本数字) と popcount(口 & ボーナス) で一括。
+#   k-of-n は combinadic の順位（0 .. C(n,k)-1）とも相互変換できる（保存・比較用）。
+#   BINGO 5 は 8 マス（中央 FREE）× 各5数字：マス c の数字は 5c+1..5c+5、
+#   当たりはそろったライン数（3行・3列・斜め2）。
+#   乱数は core.model と同じく VERSION|game|直近の結果 から seed を作って固定
+#   （VERSION を上げると全部変わる。再起動では変わらない）。
+#   結果の取得元はまだ無いので、履歴（{round, main, bonus} 新しい順）は呼び出し側が渡す。
+# ============================================================
+LOTO_SPECS: Dict[str, Dict[str, Any]] = {
+    "L7": {"n": 37, "k": 7, "bonus": 2,
+           "tiers": [(7, 0, "1等"), (6, 1, "2等"), (6, 0, "3等"), (5, 0, "4等"), (4, 0, "5等"), (3, 1, "6等")]},
+    "L6": {"n": 43, "k": 6, "bonus": 1,
+           "tiers": [(6, 0, "1等"), (5, 1, "2等"), (5, 0, "3等"), (4, 0, "4等"), (3, 0, "5等")]},
+    "ML": {"n": 31, "k": 5, "bonus": 1,
+           "tiers": [(5, 0, "1等"), (4, 1, "2等"), (4, 0, "3等"), (3, 0, "4等")]},
+    "B5": {"n": 40, "k": 8, "bonus": 0, "cells": 8, "per": 5,
+           "tiers": [(8, 0, "1等"), (6, 0, "2等"), (5, 0, "3等"), (4, 0, "4等"), (3, 0, "5等"), (2, 0, "6等"), (1, 0, "7等")]},
+}
+LOTO_GAMES = tuple(LOTO_SPECS)
+LOTO_WINDOW = 50
+
+# BINGO 5 のライン（3x3 の位置 0..8、4 が FREE）→ 8 マス（FREE を除いた並び）の番号
+_B5_LINES_POS = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6))
+_B5_CELL = {p: (p if p < 4 else p - 1) for p in range(9) if p != 4}
+_B5_LINES = [[_B5_CELL[p] for p in line if p != 4] for line in _B5_LINES_POS]
+
+_BINOM = np.array([[comb(a, b) for b in range(16)] for a in range(64)], dtype=np.int64)
+
+_BYTE_POP = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int64)
+    return _BYTE_POP[x.view(np.uint8).reshape(x.shape + (8,))].sum(axis=-1).astype(np.int64)
+
+
+# ----------------------------
+# masks / ranks
+# ----------------------------
+def nums_to_mask(nums: Sequence[int]) -> int:
+    m = 0
+    for x in nums:
+        m |= 1 << (int(x) - 1)
+    return m
+
+
+def mask_to_nums(mask: int) -> List[int]:
+    mask = int(mask)
+    return [i + 1 for i in range(64) if mask >> i & 1]
+
+
+def format_ticket(mask: int) -> str:
+    """表示用（"03 11 17 22 30 34 37"）。BINGO 5 はマス順"""
+    return " ".join(f"{x:02d}" for x in mask_to_nums(mask))
+
+
+def rank_masks(masks: np.ndarray, n: int) -> np.ndarray:
+    """k-of-n のマスク → combinadic 順位（小さい数字から Σ C(位置, 何個目)）"""
+    masks = np.asarray(masks, dtype=np.uint64)
+    rank = np.zeros(masks.shape, dtype=np.int64)
+    cnt = np.zeros(masks.shape, dtype=np.int64)
+    for pos in range(n):
+        bit = ((masks >> np.uint64(pos)) & np.uint64(1)).astype(np.int64)
+        cnt += bit
+        rank += bit * _BINOM[pos, cnt]
+    return rank
+
+
+def unrank_masks(ranks: np.ndarray, n: int, k: int) -> np.ndarray:
+    """rank_masks の逆（大きい位置から貪欲に）"""
+    r = np.asarray(ranks, dtype=np.int64).copy()
+    left = np.full(r.shape, k, dtype=np.int64)
+    out = np.zeros(r.shape, dtype=np.uint64)
+    for pos in range(n - 1, -1, -1):
+        c = _BINOM[pos, left]
+        take = (left > 0) & (c <= r)
+        r -= np.where(take, c, 0)
+        out |= take.astype(np.uint64) << np.uint64(pos)
+        left -= take
+    return out
+
+
+# ----------------------------
+# sampling
+# ----------------------------
+def loto_seed(game: str, last_result: str, extra: str = "") -> int:
+    """core.model._stable_seed と同じ並び（VERSION|game|直近|…）"""
+    scheme = SEED_SCHEME_BY_VERSION.get(VERSION, "fnv1a")
+    return seed_hash((VERSION + "|" + game + "|", str(last_result) + "|", extra), scheme)
+
+
+def number_weights(game: str, history: List[Dict[str, Any]], window: int = LOTO_WINDOW) -> np.ndarray:
+    """直近 window 回の本数字の出現数 + 1（n,）"""
+    spec = LOTO_SPECS[game]
+    w = np.ones(spec["n"], dtype=np.float64)
+    for it in history[:window]:
+        for x in it.get("main", []) or []:
+            if 1 <= int(x) <= spec["n"]:
+                w[int(x) - 1] += 1
+    return w
+
+
+def _draw(game: str, count: int, rng: np.random.Generator, weights: np.ndarray) -> np.ndarray:
+    spec = LOTO_SPECS[game]
+    if "cells" in spec:
+        # マスごとに 5 つから1つ（重み付き）：累積和に一様乱数を当てる
+        w = weights.reshape(spec["cells"], spec["per"])
+        cdf = np.cumsum(w / w.sum(axis=1, keepdims=True), axis=1)
+        u = rng.random((count, spec["cells"]))
+        pick = np.minimum((u[:, :, None] > cdf[None, :, :]).sum(axis=2), spec["per"] - 1)
+        bits = pick + np.arange(spec["cells"]) * spec["per"]
+    else:
+        # 重み付きの非復元抽出（Gumbel-top-k）
+        keys = np.log(weights)[None, :] - np.log(-np.log(rng.random((count, spec["n"]))))
+        bits = np.argpartition(-keys, spec["k"] - 1, axis=1)[:, :spec["k"]]
+    return np.bitwise_or.reduce(np.uint64(1) << bits.astype(np.uint64), axis=1)
+
+
+def sample_tickets(
+    game: str,
+    count: int,
+    rng: np.random.Generator,
+    weights: Optional[np.ndarray] = None,
+    exclude: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    重複なしの count 口（引いた順）。まとめて多めに引いて np.unique で落とし、足りなければ足す。
+    exclude のマスクは除く。
+    """
+    spec = LOTO_SPECS[game]
+    weights = np.ones(spec["n"]) if weights is None else np.asarray(weights, dtype=np.float64)
+    have = np.zeros(0, dtype=np.uint64)
+    ex = np.asarray(exclude if exclude is not None else [], dtype=np.uint64)
+    for _ in range(20):
+        need = count - len(have)
+        if need <= 0:
+            break
+        batch = np.concatenate([have, _draw(game, need + need // 4 + 8, rng, weights)])
+        _, first = np.unique(batch, return_index=True)
+        keep = np.sort(first)
+        batch = batch[keep]
+        if len(ex):
+            batch = batch[~np.isin(batch, ex)]
+        have = batch[:count]
+    return have
+
+
+# ----------------------------
+# hits
+# ----------------------------
+def hit_tiers(game: str, tickets: np.ndarray, main: Sequence[int], bonus: Sequence[int] = ()) -> np.ndarray:
+    """口ごとの等級（1..、外れは 0）"""
+    spec = LOTO_SPECS[game]
+    tickets = np.asarray(tickets, dtype=np.uint64)
+    mm = np.uint64(nums_to_mask(main))
+    if "cells" in spec:
+        cell_hit = np.stack([(tickets & mm & np.uint64(((1 << spec["per"]) - 1) << (c * spec["per"]))) != 0
+                             for c in range(spec["cells"])], axis=-1)
+        score = np.zeros(tickets.shape, dtype=np.int64)
+        for line in _B5_LINES:
+            score += cell_hit[..., line].all(axis=-1)
+        bscore = np.zeros(tickets.shape, dtype=np.int64)
+    else:
+        score = popcount(tickets & mm)
+        bscore = popcount(tickets & np.uint64(nums_to_mask(bonus)))
+    tier = np.zeros(tickets.shape, dtype=np.int64)
+    for t, (m, b, _) in reversed(list(enumerate(spec["tiers"], start=1))):
+        tier[(score == m) & (bscore >= b)] = t
+    return tier
+
+
+def tier_names(game: str) -> List[str]:
+    return ["-"] + [name for _, _, name in LOTO_SPECS[game]["tiers"]]
+
+
+# ----------------------------
+# generate / backtest
+# ----------------------------
+def _last_key(history: List[Dict[str, Any]]) -> str:
+    if not history:
+        return ""
+    it = history[0]
+    return "-".join(f"{int(x):02d}" for x in it.get("main", []) or []) + "+" + "-".join(f"{int(x):02d}" for x in it.get("bonus", []) or [])
+
+
+@timed("loto.generate")
+def generate_loto(game: str, history: List[Dict[str, Any]], count: int = 10) -> np.ndarray:
+    """history（新しい順）の次の回の count 口。同じ履歴・VERSION なら同じ口"""
+    rng = np.random.default_rng(loto_seed(game, _last_key(history), str(count)))
+    return sample_tickets(game, count, rng, number_weights(game, history))
+
+
+def loto_preds(game: str, history: List[Dict[str, Any]], out_n: int = 10) -> List[str]:
+    """pred store に入れる形（表示文字列 out_n 本）"""
+    return [format_ticket(m) for m in generate_loto(game, history, out_n).tolist()]
+
+
+@timed("loto.backtest")
+def backtest_loto(game: str, history: List[Dict[str, Any]], tickets: int = 1000, rounds: int = 50) -> Dict[str, Any]:
+    """
+    直近 rounds 回それぞれを、その回より前の履歴だけで tickets 口作って判定。
+    {rounds, tickets, tiers: {等級: 口数}, by_round: [{round, best, counts}]}
+    """
+    names = tier_names(game)
+    total = np.zeros(len(names), dtype=np.int64)
+    by_round = []
+    for i in range(min(rounds, len(history))):
+        it = history[i]
+        t = generate_loto(game, history[i + 1:], tickets)
+        tiers = hit_tiers(game, t, it.get("main", []), it.get("bonus", []))
+        counts = np.bincount(tiers, minlength=len(names))
+        total += counts
+        won = np.nonzero(counts[1:])[0]
+        by_round.append({
+            "round": int(it.get("round", 0)),
+            "best": names[int(won[0]) + 1] if len(won) else "-",
+            "counts": {names[j]: int(c) for j, c in enumerate(counts) if j and c},
+        })
+    return {
+        "game": game,
+        "rounds": len(by_round),
+        "tickets": tickets,
+        "tiers": {names[j]: int(c) for j, c in enumerate(total) if j},
+        "by_round": by_round,
+    }
+
+
+def ensure_loto_preds(pred_store: dict, game: str, round_no: int, history: List[Dict[str, Any]], out_n: int = 10) -> List[str]:
+    """core.pages.ensure_preds と同じ規則（保存済みならそのまま、新しい回だけ作る）"""
+    ring = store_game(pred_store, game)
+    have = ring_get(ring, round_no)
+    if have:
+        return have
+    preds = loto_preds(game, history, out_n)
+    ring_put(ring, round_no, preds)
+    save_pred_store(pred_store)
+    return preds
@@ -0,0 +1,108 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# ============================================================
+# Instrumentation（プロセス内の軽い計測）
+#   name ごとに 回数・合計/最大時間・読み書きバイト数・ヒット/ミス を足していく
+#     with span("fetch.http") as m: ...; m["bytes_in"] += len(body)
+#     @timed("model.generate")
+#     count("shuffle.memo", hits=1)
+#   時間は入れ子を含む（model.distill は shuffle.recompose を含む）
+#   依存なし（core.config からも import するので他の core を読まない）
+# ============================================================
+_enabled = True
+_lock = threading.Lock()
+_rows: Dict[str, Dict[str, float]] = {}
+
+_COUNTERS = ("bytes_in", "bytes_out", "hits", "misses")
+
+
+def _row(name: str) -> Dict[str, float]:
+    r = _rows.get(name)
+    if r is None:
+        r = {"calls": 0, "sec": 0.0, "max_sec": 0.0}
+        _rows[name] = r
+    return r
+
+
+def set_metrics_enabled(flag: bool) -> None:
+    global _enabled
+    _enabled = bool(flag)
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _rows.clear()
+
+
+def count(name: str, **incs: float) -> None:
+    """回数を伴わないカウンタ加算（hits=1, bytes_out=123 など）"""
+    if not _enabled:
+        return
+    with _lock:
+        r = _row(name)
+        for k, v in incs.items():
+            r[k] = r.get(k, 0) + v
+
+
+@contextmanager
+def span(name: str):
+    """区間の時間を計る。yield した dict に bytes_in などを足すと一緒に記録する"""
+    if not _enabled:
+        yield {k: 0 for k in _COUNTERS}
+        return
+    extra = {k: 0 for k in _COUNTERS}
+    t0 = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        dt = time.perf_counter() - t0
+        with _lock:
+            r = _row(name)
+            r["calls"] += 1
+            r["sec"] += dt
+            if dt > r["max_sec"]:
+                r["max_sec"] = dt
+            for k, v in extra.items():
+                if v:
+                    r[k] = r.get(k, 0) + v
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """関数まるごとの span（name 省略時は module.関数名）"""
+    def deco(fn: Callable) -> Callable:
+        label = name or f"{fn.__module__.split('.')[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def metrics_report() -> Dict[str, Dict[str, Any]]:
+    """JSON にそのまま出せる形（合計時間の長い順）"""
+    with _lock:
+        rows = {k: dict(v) for k, v in _rows.items()}
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, r in sorted(rows.items(), key=lambda kv: -kv[1]["sec"]):
+        calls = int(r["calls"])
+        row: Dict[str, Any] = {"calls": calls}
+        if calls:
+            row["total_ms"] = round(1000 * r["sec"], 3)
+            row["mean_ms"] = round(1000 * r["sec"] / calls, 4)
+            row["max_ms"] = round(1000 * r["max_sec"], 3)
+        for k in _COUNTERS:
+            if r.get(k):
+                row[k] = int(r[k])
+        looked = r.get("hits", 0) + r.get("misses", 0)
+        if looked:
+            row["hit_rate"] = round(r.get("hits", 0) / looked, 4)
+        out[name] = row
+    return out
@@ -1,5 +1,7 @@
 from typing import List
 
+from core.drift import new_drift_space, drift_take
+
 def nm_drift_unique(preds_2d: List[str]) -> List[str]:
     """
     Numbers mini (NM) duplicate resolver.
@@ -7,7 +9,7 @@ def nm_drift_unique(preds_2d: List[str]) -> List[str]:
       base = N3 last2
       if duplicate -> +1, -1, +2, -2, ... (00-99 wrap)
     """
-    seen = set()
+    st = new_drift_space(100)
     out: List[str] = []
 
     for s in preds_2d:
@@ -17,28 +19,9 @@ def nm_drift_unique(preds_2d: List[str]) -> List[str]:
         except Exception:
             base = 0
 
-        cand = f"{base:02d}"
-        if cand not in seen:
-            seen.add(cand)
-            out.append(cand)
-            continue
-
-        chosen = None
-        # drift search: +1, -1, +2, -2, ...
-        for k in range(1, 100):
-            for delta in (k, -k):
-                v = (base + delta) % 100
-                c = f"{v:02d}"
-                if c not in seen:
-                    chosen = c
-                    break
-            if chosen is not None:
-                break
-
-        if chosen is None:
-            chosen = cand  # theoretically unreachable for <=10 outputs
-
-        seen.add(chosen)
-        out.append(chosen)
+        v = drift_take(st, base)
+        if v is None:
+            v = base  # theoretically unreachable for <=100 outputs
+        out.append(f"{v:02d}")
 
     return out
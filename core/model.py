@@ -6,31 +6,33 @@ import json
 from datetime import datetime
 
 from core.config import INDEX_MAP, WINDMILL_MAP, GRAVITY_SECTORS, ANTI_GRAVITY_SECTORS, PRED_FILE, JST, safe_save_json
+from core.metrics import timed
+from core.predstore import store_from_json, store_to_json
 from core.shuffle import shuffle_recompose
+from core.seed import clear_seed_segments, fnv1a32, fnv1a32_parts, seed_hash
 
 # ============================================================
 # VERSION（ここだけ変えると “アップデートで全部変わる”）
 # ============================================================
 VERSION = "v2026-01-22a"
 
+# seed 方式は VERSION ごとに固定（未登録の VERSION は従来の "fnv1a"）。
+# 速い "crc32" にするときは VERSION を上げて、その新しい VERSION だけを登録する。
+# 既存の VERSION を登録すると保存済み予想と再生成結果がずれるので禁止。
+SEED_SCHEME_BY_VERSION = {
+    # "v2026-02-01a": "crc32",
+}
+
 KC_FRUIT_MAP = {
     "0": "🍎", "1": "🍊", "2": "🍈", "3": "🍇", "4": "🍑",
     "5": "🍎", "6": "🍊", "7": "🍈", "8": "🍇", "9": "🍑"
 }
 
 # =========================
-# Prediction Store（今回は使っても使わなくてもOK）
+# Prediction Store（core.predstore の回号リング。v1 の preds_by_round も読める）
 # =========================
 def default_pred_store():
-    return {
-        "games": {
-            "N4": {"preds_by_round": {}, "history_limit": 120},
-            "N3": {"preds_by_round": {}, "history_limit": 120},
-            "NM": {"preds_by_round": {}, "history_limit": 120},
-            "KC": {"preds_by_round": {}, "history_limit": 120}
-        },
-        "updated_at": ""
-    }
+    return store_from_json({})
 
 def load_pred_store():
     if os.path.exists(PRED_FILE):
@@ -38,13 +40,7 @@ def load_pred_store():
             with open(PRED_FILE, "r", encoding="utf-8") as f:
                 data = json.load(f)
             if isinstance(data, dict) and "games" in data:
-                base = default_pred_store()
-                for g in base["games"]:
-                    if g not in data["games"]:
-                        data["games"][g] = base["games"][g]
-                if "updated_at" not in data:
-                    data["updated_at"] = ""
-                return data
+                return store_from_json(data)
         except Exception:
             pass
     return default_pred_store()
@@ -52,11 +48,12 @@ def load_pred_store():
 def save_pred_store(store: dict) -> bool:
     store = dict(store)
     store["updated_at"] = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
-    return bool(safe_save_json(store, PRED_FILE))
+    return bool(safe_save_json(store_to_json(store), PRED_FILE))
 
 # =========================
 # Trends / Gravity
 # =========================
+@timed("model.trends")
 def calc_trends_from_history(nums: list[list[int]], cols: list[str]) -> dict:
     trends = {}
     if not nums or len(nums) < 2:
@@ -167,25 +164,66 @@ def _matrix_crossover(raw_preds: list[str]) -> list[str]:
 
     return out[:10]
 
+# fnv1a の途中状態のキャッシュ（上限を超えたら捨てる）
+#   game → "VERSION|game|" までの状態（last_val は数文字なので毎回続きから計算）
+#   trends の items → str(t_items) を1項目ずつに区切ったもの（fnv1a32_parts の区切り）
+_SEED_CACHE_MAX = 1 << 15
+_seed_heads: dict = {}
+_seed_trends: dict = {}
+
+def clear_seed_cache() -> None:
+    _seed_heads.clear()
+    _seed_trends.clear()
+    clear_seed_segments()
+
+def _trend_parts(trends: dict) -> tuple:
+    key = tuple(trends.items())
+    parts = _seed_trends.get(key)
+    if parts is None:
+        t_items = sorted((str(k), str(v)) for k, v in key)
+        # str(list) は "[" + ", ".join(repr(x)) + "]" なので、項目ごとに切っても連結は同じ
+        if t_items:
+            parts = ("[" + repr(t_items[0]),) + tuple(", " + repr(x) for x in t_items[1:]) + ("]",)
+        else:
+            parts = ("[]",)
+        if len(_seed_trends) >= _SEED_CACHE_MAX:
+            _seed_trends.clear()
+        _seed_trends[key] = parts
+    return parts
+
 def _stable_seed(game: str, last_val: str, trends: dict) -> int:
     """
     再起動固定用の seed
     - VERSION を変えればアップデートで全予想が変わる
     - last_val/trends が同じなら再起動しても同じ
     """
+    scheme = SEED_SCHEME_BY_VERSION.get(VERSION, "fnv1a")
+    try:
+        if scheme != "fnv1a":
+            raise TypeError(scheme)
+        parts = _trend_parts(trends or {})
+        h = _seed_heads.get(game)
+        if h is None:
+            h = fnv1a32(VERSION + "|" + game + "|")
+            if len(_seed_heads) >= _SEED_CACHE_MAX:
+                _seed_heads.clear()
+            _seed_heads[game] = h
+        return fnv1a32_parts(parts, fnv1a32(str(last_val) + "|", h))
+    except TypeError:
+        # ハッシュできない game / trends、別方式：区切らずに計算（値は同じ）
+        pass
     # trends は順序が安定するように key で並べる
     t_items = sorted((str(k), str(v)) for k, v in (trends or {}).items())
-    s = VERSION + "|" + game + "|" + str(last_val) + "|" + str(t_items)
-    h = 2166136261
-    for ch in s:
-        h ^= ord(ch)
-        h = (h * 16777619) & 0xFFFFFFFF
-    return h
-
-def generate_predictions(game: str, last_val: str, trends: dict) -> list[str]:
+    return seed_hash((VERSION + "|" + game + "|", str(last_val) + "|", str(t_items)), scheme)
+
+@timed("model.generate")
+def generate_predictions(game: str, last_val: str, trends: dict, similar: dict = None) -> list[str]:
     """
     - raw_preds をそのまま10本返す（惜しい世界線維持）
     - 乱数は rng=Random(seed) に固定（再起動で変わらない）
+    - similar: core.similar.follow_spins の {col: spin}（任意）。
+      渡すと shift 役の基準スピンを「似た回の次の回」のスピンにする。
+      None なら従来と同じ出力（使うときは VERSION を上げること）
     """
     digits = 4 if game == "N4" else 3
     cols = ["n1", "n2", "n3", "n4"] if digits == 4 else ["n1", "n2", "n3"]
@@ -215,7 +253,10 @@ def generate_predictions(game: str, last_val: str, trends: dict) -> list[str]:
             if role == "chaos":
                 spin = rng.randint(-5, 5)
             elif role == "shift":
-                spin = base_spin + rng.choice([-1, 1, 5, -5])
+                if similar and col in similar:
+                    spin = int(similar[col]) + rng.choice([-1, 1, 5, -5])
+                else:
+                    spin = base_spin + rng.choice([-1, 1, 5, -5])
             else:
                 if rng.random() < 0.25:
                     spin = base_spin + rng.choice([-1, 1])
@@ -232,7 +273,17 @@ def generate_predictions(game: str, last_val: str, trends: dict) -> list[str]:
 # =========================
 # Distill（BOX特化：素材10本をそのまま確定→シャッフル）
 # =========================
-def distill_predictions(game: str, raw_preds: list[str], out_n: int = 10) -> list[str]:
+@timed("model.distill")
+def distill_predictions(
+    game: str,
+    raw_preds: list[str],
+    out_n: int = 10,
+    mode: str = "greedy",
+    time_budget: float = 0.05,
+) -> list[str]:
+    """
+    mode="solve" で shuffle_recompose の探索モード（time_budget 秒、超過時は greedy）
+    """
     if not raw_preds:
         digits = 4 if game == "N4" else 3
         return ["0" * digits] * out_n
@@ -259,20 +310,20 @@ def distill_predictions(game: str, raw_preds: list[str], out_n: int = 10) -> lis
         out.append(out[-1])
 
     # ★配置だけ変える（BOX特化）
-    out = shuffle_recompose(game, out)
+    out = shuffle_recompose(game, out, out_n=out_n, mode=mode, time_budget=time_budget)
 
     return out[:out_n]
 
 # =========================
 # KC mapping
 # =========================
-def kc_from_n4_preds(n4_preds: list[str]) -> list[str]:
+def kc_from_n4_preds(n4_preds: list[str], out_n: int = 10) -> list[str]:
     fruit_preds = []
     for s in n4_preds or []:
         row = ""
         for ch in str(s):
             row += KC_FRUIT_MAP.get(ch, "🍎")
         fruit_preds.append(row)
-    while len(fruit_preds) < 10:
+    while len(fruit_preds) < out_n:
         fruit_preds.append(fruit_preds[-1] if fruit_preds else "🍎🍎🍎🍎")
-    return fruit_preds[:10]
+    return fruit_preds[:out_n]
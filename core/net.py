@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from core.config import JST, safe_save_json
+from core.metrics import span
+
+# ============================================================
+# Outbound HTTP（取得コストの記録）
+#   http_get が host ごとに 回数・バイト数・遅延ヒストグラム・ステータス・
+#   リトライ・例外 を数える。http_cycle の中の分は1サイクルとしてまとめ、
+#   data/http_stats.json に直近 HTTP_KEEP サイクル＋host 累計を残す。
+#   1サイクルで HTTP_SCAN_WARN 回を超えたら warn（KC の総なめ検出用）
+#   requests は実際に取得するときだけ import する
+# ============================================================
+HTTP_STATS_FILE = "data/http_stats.json"
+HTTP_KEEP = 50
+HTTP_SCAN_WARN = 100
+HTTP_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_save_lock = threading.Lock()
+# 実行中のサイクルはスレッドごと（別スレッドの http_cycle と混ざらない）
+_local = threading.local()
+_totals: Dict[str, Dict[str, Any]] = {}
+
+
+def _new_host() -> Dict[str, Any]:
+    return {"requests": 0, "bytes": 0, "errors": 0, "retries": 0, "ms": 0.0, "max_ms": 0.0, "status": {}, "hist": {}}
+
+
+def _bucket(ms: float) -> str:
+    for b in HTTP_BUCKETS_MS:
+        if ms <= b:
+            return f"<={b}"
+    return f">{HTTP_BUCKETS_MS[-1]}"
+
+
+def _record(host: str, ms: float, status: Optional[int], nbytes: int, retry: bool) -> None:
+    cyc = getattr(_local, "cycle", None)
+    with _lock:
+        targets = [_totals]
+        if cyc is not None:
+            targets.append(cyc["hosts"])
+        for hosts in targets:
+            h = hosts.setdefault(host, _new_host())
+            h["requests"] += 1
+            h["bytes"] += nbytes
+            h["ms"] += ms
+            h["max_ms"] = max(h["max_ms"], ms)
+            if retry:
+                h["retries"] += 1
+            key = str(status) if status is not None else "error"
+            if status is None:
+                h["errors"] += 1
+            h["status"][key] = h["status"].get(key, 0) + 1
+            b = _bucket(ms)
+            h["hist"][b] = h["hist"].get(b, 0) + 1
+
+
+def http_get(url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 20, retries: int = 0, backoff: float = 0.5):
+    """
+    requests.get と同じ戻り値。接続エラーと 429/5xx は retries 回まで待って再試行。
+    最後の試行の例外はそのまま投げる（呼び出し側の扱いは今までどおり）。
+    """
+    import requests
+
+    host = urlsplit(url).netloc or "?"
+    attempt = 0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            with span("http.get") as m:
+                r = requests.get(url, headers=headers, timeout=timeout)
+                m["bytes_in"] += len(r.content)
+        except requests.RequestException:
+            _record(host, 1000 * (time.perf_counter() - t0), None, 0, attempt > 0)
+            if attempt >= retries:
+                raise
+        else:
+            _record(host, 1000 * (time.perf_counter() - t0), r.status_code, len(r.content), attempt > 0)
+            if r.status_code not in RETRY_STATUS or attempt >= retries:
+                return r
+        attempt += 1
+        time.sleep(backoff * (2 ** (attempt - 1)))
+
+
+def _summary(hosts: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for host, h in sorted(hosts.items()):
+        row = {k: h[k] for k in ("requests", "bytes", "errors", "retries")}
+        row["mean_ms"] = round(h["ms"] / h["requests"], 1) if h["requests"] else 0.0
+        row["max_ms"] = round(h["max_ms"], 1)
+        row["status"] = dict(sorted(h["status"].items()))
+        row["hist"] = {b: h["hist"][b] for b in [f"<={x}" for x in HTTP_BUCKETS_MS] + [f">{HTTP_BUCKETS_MS[-1]}"] if b in h["hist"]}
+        out[host] = row
+    return out
+
+
+def http_stats() -> Dict[str, Dict[str, Any]]:
+    """このプロセスでの host 別累計"""
+    with _lock:
+        return _summary(_totals)
+
+
+def load_http_stats(path: str = HTTP_STATS_FILE) -> Dict[str, Any]:
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("cycles"), list):
+                return data
+        except Exception:
+            pass
+    return {"cycles": [], "hosts": {}, "updated_at": ""}
+
+
+def _merge_hosts(acc: Dict[str, Dict[str, Any]], add: Dict[str, Dict[str, Any]]) -> None:
+    for host, row in add.items():
+        a = acc.setdefault(host, {"requests": 0, "bytes": 0, "errors": 0, "retries": 0, "status": {}})
+        for k in ("requests", "bytes", "errors", "retries"):
+            a[k] = a.get(k, 0) + row.get(k, 0)
+        for k, v in row.get("status", {}).items():
+            a["status"][k] = a["status"].get(k, 0) + v
+
+
+@contextmanager
+def http_cycle(label: str, path: str = HTTP_STATS_FILE):
+    """
+    この中の http_get を1サイクルとして数える。yield した dict に結果が入る。
+    1回も取得しなければ保存しない（キャッシュだけの起動は書き込みゼロ）。
+    入れ子は外側のサイクルにまとめる（同じスレッドの中だけ。スレッドが違えば別のサイクル）。
+    """
+    cyc = getattr(_local, "cycle", None)
+    outer = cyc is not None
+    if not outer:
+        cyc = _local.cycle = {"hosts": {}}
+    result: Dict[str, Any] = {"label": label, "requests": 0}
+    t0 = time.perf_counter()
+    try:
+        yield result
+    finally:
+        if not outer:
+            _local.cycle = None
+            hosts = _summary(cyc["hosts"])
+            n = sum(h["requests"] for h in hosts.values())
+            result.update({
+                "at": datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S"),
+                "sec": round(time.perf_counter() - t0, 3),
+                "requests": n,
+                "bytes": sum(h["bytes"] for h in hosts.values()),
+                "warn": n > HTTP_SCAN_WARN,
+                "hosts": hosts,
+            })
+            if n:
+                # 別スレッドのサイクルと読み書きが交ざらないように
+                with _save_lock:
+                    data = load_http_stats(path)
+                    data["cycles"] = (data["cycles"] + [result])[-HTTP_KEEP:]
+                    _merge_hosts(data.setdefault("hosts", {}), hosts)
+                    data["updated_at"] = result["at"]
+                    safe_save_json(data, path)
@@ -0,0 +1,262 @@
+import json
+import os
+from datetime import datetime
+
+from core.config import JST, safe_save_json
+from core.derive import derive_kc_preds, derive_nm_preds
+from core.drift import new_drift_space, drift_take
+from core.predstore import ring_get, ring_put, store_game
+from core.model import (
+    VERSION,
+    save_pred_store,
+    calc_trends_from_history,
+    generate_predictions,
+    distill_predictions,
+)
+from core.moneyplan import norm_date
+
+# ---------- pred store helpers ----------
+
+def _pad_to_n(preds: list[str], digits: int, out_n: int = 10) -> list[str]:
+    preds = [str(x) for x in (preds or []) if str(x).isdigit() and len(str(x)) == digits]
+    if len(preds) >= out_n:
+        return preds[:out_n]
+    # 不足分は末尾の予想の「下1桁」だけを +1, -1, +2, ... とずらして埋める（従来の _pad_to_10 と同じ）
+    base = preds[-1] if preds else ("0" * digits)
+    head, last = base[:-1], int(base[-1])
+    st = new_drift_space(10, taken=[int(x[-1]) for x in preds if x[:-1] == head] + [last])
+    while len(preds) < out_n:
+        v = drift_take(st, last)
+        if v is None:
+            break
+        preds.append(head + str(v))
+    if len(preds) < out_n and base not in preds:
+        # 素材が空のときは base 自身が最後に入る（従来の drift 0）
+        preds.append(base)
+    if len(preds) < out_n and out_n > 10:
+        # 10本を超える分だけ全桁の空間で続ける（10本以下の結果は変わらない）
+        st = new_drift_space(10 ** digits, taken=[int(x) for x in preds])
+        while len(preds) < out_n:
+            v = drift_take(st, int(base))
+            if v is None:
+                break
+            preds.append(f"{v:0{digits}d}")
+    while len(preds) < out_n:
+        preds.append("0" * digits)
+    return preds[:out_n]
+
+def ensure_preds(pred_store: dict, game: str, round_no: int, digits: int, builder, out_n: int = 10):
+    ring = store_game(pred_store, game)
+    have = ring_get(ring, round_no)
+    if have:
+        fixed = _pad_to_n(have, digits, out_n)
+        if fixed != have:
+            ring_put(ring, round_no, fixed)
+            save_pred_store(pred_store)
+        return fixed
+
+    preds = builder()
+    preds = _pad_to_n(preds, digits, out_n)
+    # history_limit を超えた分は最も古い回から落ちる（core.predstore）
+    ring_put(ring, round_no, preds)
+
+    save_pred_store(pred_store)
+    return preds
+
+# ---------- dedupe pages by round (fix BACK 3 times issue) ----------
+def dedupe_pages(pages: list[dict]) -> list[dict]:
+    out = []
+    seen = set()
+    for p in pages:
+        if p.get("mode") == "NOW":
+            out.append(p)
+            continue
+        r = p.get("round")
+        if r in seen:
+            continue
+        seen.add(r)
+        out.append(p)
+    return out
+
+# ---------- build numbers pages ----------
+def build_numbers_pages(pred_store: dict, game: str, items: list[dict], out_n: int = 10, reuse: dict = None):
+    """
+    reuse: {回号: 予想} 前回ビルド済みのページ（page model）。
+      ここにある回号は ensure_preds も trends 計算もせずそのまま使う。
+      trends は builder の中で計算するので、保存済みの回号ではそもそも計算しない。
+    """
+    digits = 4 if game == "N4" else 3
+    cols = ["n1","n2","n3","n4"] if digits == 4 else ["n1","n2","n3"]
+    reuse = reuse or {}
+
+    items = [dict(x) for x in items if isinstance(x, dict)]
+    items.sort(key=lambda x: x.get("round", 0), reverse=True)
+
+    # extra safety: round dedupe
+    tmp = []
+    seen = set()
+    for it in items:
+        r = it.get("round")
+        if r in seen:
+            continue
+        seen.add(r)
+        tmp.append(it)
+    items = tmp
+
+    if not items:
+        items = [{"round": 0, "date": "", "num": "0"*digits, "payout": {}}]
+
+    latest = items[0]
+    next_round = int(latest.get("round", 0)) + 1
+
+    def trends_from(i: int) -> dict:
+        sub_nums = [[int(c) for c in x["num"]] for x in items[i:] if str(x.get("num","")).isdigit()]
+        return calc_trends_from_history(sub_nums, cols)
+
+    # NOW trends = full history
+    def now_builder():
+        raw = generate_predictions(game, latest["num"], trends_from(0))
+        return distill_predictions(game, raw, out_n=out_n)
+
+    if next_round in reuse:
+        now_preds = reuse[next_round]
+    else:
+        now_preds = ensure_preds(pred_store, game, next_round, digits, now_builder, out_n)
+
+    pages = [{
+        "mode": "NOW",
+        "round": next_round,
+        "date": "",
+        "result": "",
+        "payout": {},
+        "preds": now_preds
+    }]
+
+    # RESULT pages: per-page trends (sub-history)
+    for i, it in enumerate(items):
+        prev = items[i + 1] if i + 1 < len(items) else None
+        seed_last = prev["num"] if prev else it["num"]
+        rno = int(it.get("round", 0))
+
+        def builder(seed=seed_last, i2=i):
+            raw = generate_predictions(game, seed, trends_from(i2))
+            return distill_predictions(game, raw, out_n=out_n)
+
+        if rno in reuse:
+            preds = reuse[rno]
+        else:
+            preds = ensure_preds(pred_store, game, rno, digits, builder, out_n)
+
+        pages.append({
+            "mode": "RESULT",
+            "round": rno,
+            "date": it.get("date", ""),
+            "result": it.get("num", ""),
+            "payout": it.get("payout", {}) or {},
+            "preds": preds
+        })
+
+    return dedupe_pages(pages)
+
+# ---------- page model (incremental build) ----------
+# ゲームごとに「前回ビルドしたページの予想」と、その時の VERSION / 表示回数 / 本数を持つ。
+# 新しい回が入ったときは、新しい RESULT ページと NOW ページだけ作る。
+# VERSION か表示回数（window）か本数が変わったら全部作り直す。
+PAGE_MODEL_FILE = "data/page_model.json"
+
+def load_page_model() -> dict:
+    if os.path.exists(PAGE_MODEL_FILE):
+        try:
+            with open(PAGE_MODEL_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("games"), dict):
+                return data
+        except Exception:
+            pass
+    return {"games": {}, "updated_at": ""}
+
+def save_page_model(model: dict) -> bool:
+    model = dict(model)
+    model["updated_at"] = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+    return bool(safe_save_json(model, PAGE_MODEL_FILE))
+
+def refresh_numbers_pages(pred_store: dict, model: dict, game: str, items: list[dict], window: int, out_n: int = 10):
+    """
+    page model を使った build_numbers_pages。
+    戻り値: (pages, 新しく作ったページ数)。model は呼び出し側で保存する。
+    """
+    gm = model.setdefault("games", {}).get(game) or {}
+    reuse = {}
+    if gm.get("version") == VERSION and gm.get("window") == window and gm.get("out_n") == out_n:
+        for k, v in (gm.get("preds_by_round") or {}).items():
+            if str(k).isdigit() and isinstance(v, list) and v:
+                reuse[int(k)] = v
+
+    pages = build_numbers_pages(pred_store, game, items, out_n=out_n, reuse=reuse)
+    built = sum(1 for p in pages if p["round"] not in reuse)
+
+    model["games"][game] = {
+        "version": VERSION,
+        "window": window,
+        "out_n": out_n,
+        "last_round": max((p["round"] for p in pages if p["mode"] == "RESULT"), default=0),
+        "preds_by_round": {str(p["round"]): p["preds"] for p in pages},
+    }
+    return pages, built
+
+# ---------- NM pages (derived from N3; payout uses N3's MINI if present) ----------
+def build_nm_pages(n3_pages: list[dict]) -> list[dict]:
+    nm_pages = []
+    nm_preds = derive_nm_preds([list(p.get("preds", []) or []) for p in n3_pages])
+    for p, preds in zip(n3_pages, nm_preds):
+        pay = dict(p.get("payout", {}) or {})
+        mini_y = ""
+        if isinstance(pay.get("MINI"), dict) and pay["MINI"].get("yen"):
+            mini_y = pay["MINI"]["yen"]
+        # if fetch used MINI only, ok; else try nothing
+        nm_payout = {}
+        if mini_y:
+            nm_payout["MINI"] = {"yen": mini_y}
+        nm_pages.append({
+            "mode": p["mode"],
+            "round": p["round"],
+            "date": p.get("date", ""),
+            "result": (p.get("result", "")[-2:] if p.get("result", "") else ""),
+            "payout": nm_payout,
+            "preds": preds,
+        })
+    return nm_pages
+
+# ---------- KC pages (preds from N4, result/payout by date, round/date synced to N4) ----------
+def kc_target_dates(n4_pages: list[dict]) -> set[str]:
+    target_dates = set()
+    for p in n4_pages:
+        if p["mode"] == "RESULT":
+            d = norm_date(p.get("date",""))
+            if d:
+                target_dates.add(d)
+    return target_dates
+
+def build_kc_pages(n4_pages: list[dict], kc_by_date: dict) -> list[dict]:
+    kc_pages = []
+    kc_preds = derive_kc_preds([list(p.get("preds", []) or []) for p in n4_pages])
+    kc_pages.append({
+        "mode": "NOW",
+        "round": n4_pages[0]["round"],
+        "date": "",
+        "result": "",
+        "payout": {},
+        "preds": kc_preds[0]
+    })
+    for p, preds in zip(n4_pages[1:], kc_preds[1:]):
+        d = norm_date(p.get("date",""))
+        kc = kc_by_date.get(d)
+        kc_pages.append({
+            "mode": "RESULT",
+            "round": p["round"],
+            "date": p.get("date",""),
+            "result": kc["result"] if kc else "",
+            "payout": kc["payout"] if kc else {},
+            "preds": preds
+        })
+    return kc_pages
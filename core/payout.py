@@ -0,0 +1,343 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.cache import cache_rev
+from core.derive import DERIVED, derive_preds
+from core.predstore import pred_range
+
+# ============================================================
+# Payout analytics（払戻を整数の列にして集計する）
+#   キャッシュの払戻は {"STR": {"yen": "1,234"}} の文字列。表示用はそのままにして、
+#   集計用にゲームごと・等級ごとの int64 列（円、無しは -1）を結果の履歴と並べて作る。
+#     N4 / N3 … 回号ごと（STR / BOX / SET-S / SET-B、N3 は MINI も）
+#     NM      … N3 の MINI
+#     KC      … kc_cache の日付を N4 の回号に合わせる（1等 / 2等 / 3等）
+#   表は件数・最新回・cache_rev（書き込みごとに上がる）が変わるまで使い回す
+#   （払戻の後入れでも作り直す。文字列の解析はキャッシュ更新ごとに1回）
+#   ROI は miru_preds.json の予想を1口 TICKET_YEN で全部買ったとして数える
+#
+#   python -m core.payout N4 [--bet STR|BOX|SET] [--from R] [--to R] [--top N]
+# ============================================================
+PRIZES = {
+    "N4": ("STR", "BOX", "SET-S", "SET-B"),
+    "N3": ("STR", "BOX", "SET-S", "SET-B", "MINI"),
+    "NM": ("MINI",),
+    "KC": ("1等", "2等", "3等"),
+}
+BETS = {"N4": ("STR", "BOX", "SET"), "N3": ("STR", "BOX", "SET"), "NM": ("MINI",), "KC": ("KC",)}
+TICKET_YEN = 200
+PAYOUT_BINS = (1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+KC_FRUITS = ("🍎", "🍊", "🍈", "🍇", "🍑")
+
+
+def yen_int(v: Any) -> int:
+    """{"yen": "1,234"} / "1,234円" / 1234 → 1234。読めなければ -1"""
+    if isinstance(v, dict):
+        v = v.get("yen", "")
+    if isinstance(v, (int, np.integer)):
+        return int(v)
+    s = str(v or "").replace(",", "").replace("円", "").strip()
+    return int(s) if s.isdigit() else -1
+
+
+def _digits_matrix(nums: List[str], width: int) -> np.ndarray:
+    """同じ桁数の数字文字列 → (n, width) uint8。桁違いは呼び出し側で除く"""
+    n = len(nums)
+    if not n:
+        return np.zeros((0, width), dtype=np.uint8)
+    raw = "".join(nums).encode("ascii")
+    return (np.frombuffer(raw, dtype=np.uint8) - 48).reshape(n, width)
+
+
+def _codes(m: np.ndarray) -> np.ndarray:
+    """(…, width) の数字 → 整数（先頭が上位桁）"""
+    out = np.zeros(m.shape[:-1], dtype=np.int64)
+    for c in range(m.shape[-1]):
+        out = out * 10 + m[..., c]
+    return out
+
+
+# ----------------------------
+# table
+# ----------------------------
+def build_payout_table(
+    game: str,
+    results_cache: Dict[str, Any],
+    kc_cache: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    {game, rounds (昇順 int64), dates, results, cols: {等級: int64}} を作る。
+    KC の回号は同じ日付の N4 の回（KC のページと同じ対応）。
+    """
+    rows: List[Tuple[int, str, str, Dict[str, Any]]] = []
+    if game == "KC":
+        by_date = (kc_cache or {}).get("by_date", {}) or {}
+        for k, v in ((results_cache or {}).get("N4", {}) or {}).items():
+            if not isinstance(v, dict):
+                continue
+            kc = by_date.get(str(v.get("date", "")))
+            if isinstance(kc, dict) and kc.get("result"):
+                rows.append((int(v.get("round", k)), str(v["date"]), str(kc["result"]), kc.get("payout", {}) or {}))
+    else:
+        src = "N3" if game == "NM" else game
+        digits = 4 if src == "N4" else 3
+        for k, v in ((results_cache or {}).get(src, {}) or {}).items():
+            if not isinstance(v, dict):
+                continue
+            num = str(v.get("num", ""))
+            if not (num.isdigit() and len(num) == digits):
+                continue
+            rows.append((int(v.get("round", k)), str(v.get("date", "")), num[-2:] if game == "NM" else num, v.get("payout", {}) or {}))
+    rows.sort(key=lambda r: r[0])
+    n = len(rows)
+    cols = {}
+    for prize in PRIZES[game]:
+        cols[prize] = np.fromiter((yen_int(r[3].get(prize)) for r in rows), dtype=np.int64, count=n)
+    return {
+        "game": game,
+        "rounds": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+        "dates": [r[1] for r in rows],
+        "results": [r[2] for r in rows],
+        "cols": cols,
+    }
+
+
+_TABLE_MEMO: Dict[str, Any] = {}
+
+
+def _stamp(game: str, results_cache: Dict[str, Any], kc_cache: Optional[Dict[str, Any]]) -> tuple:
+    def one(g: Dict[str, Any]) -> tuple:
+        g = g or {}
+        return (len(g), max((str(k) for k in g), default=""))
+
+    src = {"NM": "N3", "KC": "N4"}.get(game, game)
+    st = one((results_cache or {}).get(src, {})) + (cache_rev(results_cache),)
+    if game == "KC":
+        st += one((kc_cache or {}).get("by_date", {})) + (cache_rev(kc_cache),)
+    return st
+
+
+def payout_table(
+    game: str,
+    results_cache: Dict[str, Any],
+    kc_cache: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """build_payout_table のメモ付き版（件数・最新キー・cache_rev が同じ間は作り直さない）"""
+    stamp = _stamp(game, results_cache, kc_cache)
+    hit = _TABLE_MEMO.get(game)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    table = build_payout_table(game, results_cache, kc_cache)
+    _TABLE_MEMO[game] = (stamp, table)
+    return table
+
+
+def _range_mask(rounds: np.ndarray, round_from: Optional[int], round_to: Optional[int]) -> np.ndarray:
+    mask = np.ones(len(rounds), dtype=bool)
+    if round_from is not None:
+        mask &= rounds >= round_from
+    if round_to is not None:
+        mask &= rounds <= round_to
+    return mask
+
+
+# ----------------------------
+# payout queries
+# ----------------------------
+def payout_summary(
+    table: Dict[str, Any],
+    round_from: Optional[int] = None,
+    round_to: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """等級ごとの 件数 / 平均 / 中央値 / 最小 / 最大 / p10 / p90（円。払戻の無い回は除く）"""
+    mask = _range_mask(table["rounds"], round_from, round_to)
+    out = {}
+    for prize, col in table["cols"].items():
+        v = col[mask]
+        v = v[v >= 0]
+        if not len(v):
+            out[prize] = {"n": 0}
+            continue
+        p10, med, p90 = np.percentile(v, [10, 50, 90])
+        out[prize] = {
+            "n": int(len(v)),
+            "mean": round(float(v.mean()), 1),
+            "median": float(med),
+            "min": int(v.min()),
+            "max": int(v.max()),
+            "p10": float(p10),
+            "p90": float(p90),
+        }
+    return out
+
+
+def payout_distribution(
+    table: Dict[str, Any],
+    prize: str,
+    bins=PAYOUT_BINS,
+    round_from: Optional[int] = None,
+    round_to: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """prize の払戻を bins の区切り（以下）で数える。最後は「bins[-1] 超」"""
+    col = table["cols"][prize][_range_mask(table["rounds"], round_from, round_to)]
+    col = col[col >= 0]
+    idx = np.searchsorted(np.asarray(bins, dtype=np.int64), col, side="left")
+    counts = np.bincount(idx, minlength=len(bins) + 1)
+    out = [{"le": int(b), "count": int(c)} for b, c in zip(bins, counts[:-1])]
+    out.append({"gt": int(bins[-1]), "count": int(counts[-1])})
+    return out
+
+
+# ----------------------------
+# hits / ROI
+# ----------------------------
+def stored_preds(pred_store: Dict[str, Any], game: str) -> Dict[int, List[str]]:
+    """保存済みの予想（NM / KC は N3 / N4 からページと同じ規則で作る）"""
+    src = DERIVED[game]["src"] if game in DERIVED else game
+    pairs = [(r, preds) for r, preds in pred_range(pred_store, src) if preds]
+    rows = [preds for _, preds in pairs]
+    if game in DERIVED:
+        rows = derive_preds(game, rows)
+    return {r: row for (r, _), row in zip(pairs, rows)}
+
+
+def hit_matrix(game: str, preds: List[List[str]], results: List[str]) -> Dict[str, np.ndarray]:
+    """
+    (回数, 口数) の当たり判定。
+      N4/N3 … "str"（完全一致）/ "box"（並び違いの一致。ゾロ目は BOX なし）/ "mini"（N3 の下2桁）
+      NM    … "mini"
+      KC    … "match"（位置の合う絵柄の数 0..4）
+    preds の行は同じ口数にそろえて渡す。
+    """
+    m = len(results)
+    width = len(preds[0]) if m else 0
+    if game == "KC":
+        fidx = {f: i for i, f in enumerate(KC_FRUITS)}
+        P = np.array([[[fidx.get(ch, -1) for ch in p] for p in row] for row in preds], dtype=np.int8).reshape(m, width, -1)
+        R = np.array([[fidx.get(ch, -2) for ch in r] for r in results], dtype=np.int8).reshape(m, 1, -1)
+        return {"match": (P == R).sum(axis=2)}
+
+    digits = len(results[0]) if m else (2 if game == "NM" else 4 if game == "N4" else 3)
+    flat = [p if len(p) == digits and p.isdigit() else "0" * digits for row in preds for p in row]
+    valid = np.array([len(p) == digits and p.isdigit() for row in preds for p in row], dtype=bool).reshape(m, width)
+    P = _digits_matrix(flat, digits).reshape(m, width, digits)
+    R = _digits_matrix(results, digits).reshape(m, 1, digits)
+    exact = (_codes(P) == _codes(R)) & valid
+    if game == "NM":
+        return {"mini": exact}
+    box = (_codes(np.sort(P, axis=2)) == _codes(np.sort(R, axis=2))) & valid
+    zoro = (P == P[:, :, :1]).all(axis=2)
+    out = {"str": exact, "box": box & ~exact & ~zoro, "box_ok": valid & ~zoro}
+    if game == "N3":
+        out["mini"] = (_codes(P[:, :, 1:]) == _codes(R[:, :, 1:])) & valid
+    return out
+
+
+def prediction_roi(
+    game: str,
+    pred_store: Dict[str, Any],
+    results_cache: Dict[str, Any],
+    kc_cache: Optional[Dict[str, Any]] = None,
+    bet: Optional[str] = None,
+    round_from: Optional[int] = None,
+    round_to: Optional[int] = None,
+    top: int = 10,
+) -> Dict[str, Any]:
+    """
+    保存済み予想の上位 top 口を毎回 bet で買ったときの収支。
+      STR … 完全一致で STR
+      BOX … 並び違いも含め一致で BOX（ゾロ目の予想は買わない）
+      SET … 完全一致で SET-S、並び違いで SET-B（ゾロ目は買わない）
+      MINI（NM）… 下2桁一致で MINI
+      KC  … 4/3/2 個一致で 1等/2等/3等
+    当たったのに払戻が分からない回は unknown に数え、払戻 0 として扱う。
+    """
+    bet = bet or BETS[game][0]
+    if bet not in BETS[game]:
+        raise ValueError(f"bet must be one of {BETS[game]} for {game}: {bet!r}")
+    table = payout_table(game, results_cache, kc_cache)
+    preds_by = stored_preds(pred_store, game)
+    rounds = table["rounds"]
+    mask = _range_mask(rounds, round_from, round_to)
+    sel = [i for i in np.nonzero(mask)[0] if int(rounds[i]) in preds_by]
+    out: Dict[str, Any] = {"game": game, "bet": bet, "top": top, "rounds": len(sel), "tickets": 0,
+                           "cost": 0, "return": 0, "roi": None, "hits": {}, "unknown": 0}
+    if not sel:
+        return out
+    sel = np.asarray(sel, dtype=np.int64)
+    preds = []
+    for i in sel:
+        row = preds_by[int(rounds[i])][:top]
+        preds.append(row + [row[-1]] * (top - len(row)))
+    hm = hit_matrix(game, preds, [table["results"][i] for i in sel])
+    cols = {p: c[sel] for p, c in table["cols"].items()}
+
+    if game == "KC":
+        bought = np.ones((len(sel), top), dtype=bool)
+        wins = [("1等", hm["match"] == 4), ("2等", hm["match"] == 3), ("3等", hm["match"] == 2)]
+    elif game == "NM":
+        bought = np.ones((len(sel), top), dtype=bool)
+        wins = [("MINI", hm["mini"])]
+    elif bet == "STR":
+        bought = np.ones((len(sel), top), dtype=bool)
+        wins = [("STR", hm["str"])]
+    elif bet == "BOX":
+        bought = hm["box_ok"]
+        wins = [("BOX", (hm["str"] | hm["box"]) & bought)]
+    else:
+        bought = hm["box_ok"]
+        wins = [("SET-S", hm["str"] & bought), ("SET-B", hm["box"] & bought)]
+
+    ret = 0
+    unknown = 0
+    for prize, w in wins:
+        per_round = w.sum(axis=1)
+        yen = cols[prize]
+        known = yen >= 0
+        ret += int((per_round * np.where(known, yen, 0)).sum())
+        unknown += int(per_round[~known].sum())
+        out["hits"][prize] = int(per_round.sum())
+    tickets = int(bought.sum())
+    out.update({
+        "tickets": tickets,
+        "cost": tickets * TICKET_YEN,
+        "return": ret,
+        "roi": round(ret / (tickets * TICKET_YEN), 4) if tickets else None,
+        "unknown": unknown,
+        "from": int(rounds[sel[0]]),
+        "to": int(rounds[sel[-1]]),
+    })
+    return out
+
+
+def main(argv: List[str] = None) -> int:
+    from core.store import shared_kc_cache, shared_pred_store, shared_results_cache
+
+    ap = argparse.ArgumentParser(prog="python -m core.payout", description="payout summary and stored-prediction ROI")
+    ap.add_argument("game", nargs="?", default="N4", choices=list(PRIZES), help="game (default: N4)")
+    ap.add_argument("--bet", help="bet type for the ROI (N4/N3: STR|BOX|SET, NM: MINI, KC: KC; default: the first)")
+    ap.add_argument("--from", dest="round_from", type=int, metavar="R", help="first round (inclusive)")
+    ap.add_argument("--to", dest="round_to", type=int, metavar="R", help="last round (inclusive)")
+    ap.add_argument("--top", type=int, default=10, help="tickets per round from the top of each prediction (default: 10)")
+    args = ap.parse_args(argv)
+    if args.bet is not None and args.bet not in BETS[args.game]:
+        ap.error(f"--bet must be one of {', '.join(BETS[args.game])} for {args.game}")
+
+    rc, kc, ps = shared_results_cache(), shared_kc_cache(), shared_pred_store()
+    table = payout_table(args.game, rc, kc)
+    report = {
+        "game": args.game,
+        "summary": payout_summary(table, args.round_from, args.round_to),
+        "roi": prediction_roi(args.game, ps, rc, kc, bet=args.bet, round_from=args.round_from,
+                              round_to=args.round_to, top=args.top),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+# ============================================================
+# Pred store（回号順のリング。miru_preds.json の中身）
+#   ゲームごとに
+#     order … 回号の昇順 deque（古い回を popleft で落とす）
+#     rows  … 回号 → 予想1回ぶん（詰めた int）
+#   追加は末尾（新しい回）か先頭（過去ページを古い方へ作るとき）が普通なので償却 O(1)。
+#   history_limit を超えたら最も古い回から落とす（従来の「回号の大きい順に残す」と同じ）。
+#   詰め方（kind）:
+#     digits:N … N 桁の予想を (10^N-1).bit_length() ビットずつ、下位 8 ビットに本数
+#     set:N    … LOTO 等の "01 05 12" を 1..N のビットマスク（1口ごとに N ビット）
+#     text     … 詰めずにそのまま（KC のフルーツなど）
+#   詰めて戻らない行（桁違い・数字以外）は、その行だけ text のまま持つ。
+#   ファイルは v2（回号と詰めた値の列）。v1（preds_by_round の dict）は読むときに変換する。
+# ============================================================
+PRED_STORE_VERSION = 2
+HISTORY_LIMIT = 120
+GAME_KINDS = {
+    "N4": "digits:4",
+    "N3": "digits:3",
+    "NM": "digits:2",
+    "KC": "text",
+    "L7": "set:37",
+    "L6": "set:43",
+    "ML": "set:31",
+    "B5": "set:40",
+}
+_COUNT_BITS = 8
+
+
+def _kind(kind: str) -> Tuple[str, int]:
+    name, _, n = kind.partition(":")
+    return name, int(n or 0)
+
+
+def _width(kind: str) -> int:
+    name, n = _kind(kind)
+    return (10 ** n - 1).bit_length() if name == "digits" else n
+
+
+def _encode_one(kind: str, s: str) -> int:
+    name, n = _kind(kind)
+    if name == "digits":
+        if len(s) != n or not s.isascii() or not s.isdigit():
+            raise ValueError(s)
+        return int(s)
+    mask = 0
+    for part in s.split(" "):
+        x = int(part)
+        if not 1 <= x <= n or f"{x:02d}" != part:
+            raise ValueError(s)
+        mask |= 1 << (x - 1)
+    return mask
+
+
+def _decode_one(kind: str, v: int) -> str:
+    name, n = _kind(kind)
+    if name == "digits":
+        return f"{v:0{n}d}"
+    return " ".join(f"{i + 1:02d}" for i in range(n) if v >> i & 1)
+
+
+def pack_preds(kind: str, preds: List[str]) -> Any:
+    """予想1回ぶん → int（詰められなければ list のまま）"""
+    preds = [str(x) for x in preds]
+    if kind == "text" or len(preds) >= (1 << _COUNT_BITS):
+        return preds
+    w = _width(kind)
+    try:
+        v = len(preds)
+        for i, s in enumerate(preds):
+            v |= _encode_one(kind, s) << (_COUNT_BITS + w * i)
+    except (ValueError, TypeError):
+        return preds
+    # set は並び・重複で戻らないことがある（digits は _encode_one の検査で戻る）
+    if kind.startswith("set") and unpack_preds(kind, v) != preds:
+        return preds
+    return v
+
+
+def unpack_preds(kind: str, packed: Any) -> List[str]:
+    if isinstance(packed, list):
+        return list(packed)
+    w = _width(kind)
+    n = packed & ((1 << _COUNT_BITS) - 1)
+    mask = (1 << w) - 1
+    return [_decode_one(kind, (packed >> (_COUNT_BITS + w * i)) & mask) for i in range(n)]
+
+
+# ----------------------------
+# ring
+# ----------------------------
+def new_ring(game: str, history_limit: int = HISTORY_LIMIT) -> Dict[str, Any]:
+    return {"kind": GAME_KINDS.get(game, "text"), "history_limit": int(history_limit), "order": deque(), "rows": {}}
+
+
+def ring_put(ring: Dict[str, Any], round_no: int, preds: List[str]) -> List[int]:
+    """round_no の予想を入れる（あれば置き換え）。戻り値: 落とした回号"""
+    round_no = int(round_no)
+    rows, order = ring["rows"], ring["order"]
+    if round_no not in rows:
+        if not order or round_no > order[-1]:
+            order.append(round_no)
+        elif round_no < order[0]:
+            order.appendleft(round_no)
+        else:
+            insort(order, round_no)
+    rows[round_no] = pack_preds(ring["kind"], preds)
+    evicted = []
+    while len(order) > max(0, ring["history_limit"]):
+        r = order.popleft()
+        rows.pop(r, None)
+        evicted.append(r)
+    return evicted
+
+
+def ring_get(ring: Dict[str, Any], round_no: int) -> Optional[List[str]]:
+    packed = ring["rows"].get(int(round_no))
+    return None if packed is None else unpack_preds(ring["kind"], packed)
+
+
+def ring_rounds(ring: Dict[str, Any]) -> List[int]:
+    return list(ring["order"])
+
+
+def ring_range(ring: Dict[str, Any], lo: Optional[int] = None, hi: Optional[int] = None) -> List[Tuple[int, List[str]]]:
+    """lo <= 回号 <= hi の (回号, 予想) を古い順に（バックテスト用）"""
+    order = ring["order"]
+    i = 0 if lo is None else bisect_left(order, lo)
+    j = len(order) if hi is None else bisect_right(order, hi)
+    kind, rows = ring["kind"], ring["rows"]
+    out = []
+    for k in range(i, j):
+        r = order[k]
+        out.append((r, unpack_preds(kind, rows[r])))
+    return out
+
+
+# ----------------------------
+# store（ファイルとの変換）
+# ----------------------------
+def store_game(store: Dict[str, Any], game: str) -> Dict[str, Any]:
+    """ゲームのリング（無ければ作る）"""
+    games = store.setdefault("games", {})
+    ring = games.get(game)
+    if not isinstance(ring, dict) or "order" not in ring:
+        ring = ring_from_json(game, ring or {})
+        games[game] = ring
+    return ring
+
+
+def pred_range(store: Dict[str, Any], game: str, lo: Optional[int] = None, hi: Optional[int] = None) -> List[Tuple[int, List[str]]]:
+    ring = (store or {}).get("games", {}).get(game)
+    if not isinstance(ring, dict) or "order" not in ring:
+        return []
+    return ring_range(ring, lo, hi)
+
+
+def ring_from_json(game: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    """v2（rounds / packed の列）でも v1（preds_by_round の dict）でも読む"""
+    ring = new_ring(game, obj.get("history_limit", HISTORY_LIMIT))
+    if isinstance(obj.get("rounds"), list):
+        kind = obj.get("kind", ring["kind"])
+        for r, packed in sorted(zip(obj["rounds"], obj.get("packed", [])), key=lambda x: int(x[0])):
+            ring_put(ring, int(r), unpack_preds(kind, packed))
+        return ring
+    pb = obj.get("preds_by_round") or {}
+    for k in sorted((k for k in pb if str(k).isdigit()), key=int):
+        if isinstance(pb[k], list) and pb[k]:
+            ring_put(ring, int(k), pb[k])
+    return ring
+
+
+def ring_to_json(ring: Dict[str, Any]) -> Dict[str, Any]:
+    order = list(ring["order"])
+    return {
+        "kind": ring["kind"],
+        "history_limit": ring["history_limit"],
+        "rounds": order,
+        "packed": [ring["rows"][r] for r in order],
+    }
+
+
+def store_from_json(data: Dict[str, Any], games=("N4", "N3", "NM", "KC")) -> Dict[str, Any]:
+    store = {"v": PRED_STORE_VERSION, "games": {}, "updated_at": data.get("updated_at", "")}
+    for game, obj in (data.get("games") or {}).items():
+        store["games"][game] = ring_from_json(game, obj if isinstance(obj, dict) else {})
+    for game in games:
+        store["games"].setdefault(game, new_ring(game))
+    return store
+
+
+def store_to_json(store: Dict[str, Any]) -> Dict[str, Any]:
+    out = {"v": PRED_STORE_VERSION, "games": {}, "updated_at": store.get("updated_at", "")}
+    for game, ring in (store.get("games") or {}).items():
+        out["games"][game] = ring_to_json(ring) if isinstance(ring, dict) and "order" in ring else ring
+    return out
+
+
+def preds_by_round(store: Dict[str, Any], game: str) -> Dict[str, List[str]]:
+    """v1 と同じ形（{"回号": 予想}）。古い形を期待する呼び出し用"""
+    return {str(r): p for r, p in pred_range(store, game)}
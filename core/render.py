@@ -0,0 +1,492 @@
+import json
+
+from core.metrics import timed
+from core.model import KC_FRUIT_MAP
+
+# ------------------------------------------------------------
+# Frontend (JS/HTML)
+#   HTML_TEMPLATE は str.format 用（差し込み以外の波括弧は {{ }} でエスケープ）
+# ------------------------------------------------------------
+# BACK 履歴のチャンク行数（先頭チャンク＝NOW＋直近の結果だけを最初に渡す）
+CHUNK_ROWS = 20
+
+
+def _yen_columns(payouts: list) -> dict:
+    """[{"STR": {"yen": "1,234"}}, ...] → {"STR": ["1,234", ...]}（無い行は ""）"""
+    keys = []
+    for pay in payouts:
+        for k in pay:
+            if k not in keys:
+                keys.append(k)
+    cols = {}
+    for k in keys:
+        col = []
+        for pay in payouts:
+            v = pay.get(k)
+            col.append(str(v.get("yen", "") or "") if isinstance(v, dict) else "")
+        cols[k] = col
+    return cols
+
+
+@timed("render.compact")
+def compact_payload(pages: dict, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    build_all() のページ → フロント用の compact payload。
+      head:   ゲームごとの回号一覧・件数（BACK の移動と回号合わせはここだけで済む）
+      chunks: "N4-0" などキーごとに chunk_rows 行ぶんの列（date/result/payout/preds）
+    NM は N3、KC は N4 の行からブラウザ側で作る（KC の結果・払戻だけ N4 の列に同梱）。
+    L7/L6/ML/B5 の COMING SOON もブラウザ側。
+    """
+    chunk_rows = max(1, int(chunk_rows))
+    head = {"v": 2, "chunk": chunk_rows, "kc_fruit": KC_FRUIT_MAP, "games": {}}
+    chunks = {}
+    kc_pages = pages.get("KC", []) or []
+    for game in ("N4", "N3"):
+        ps = pages.get(game, []) or []
+        now = 0
+        while now < len(ps) and ps[now].get("mode") == "NOW":
+            now += 1
+        head["games"][game] = {
+            "digits": 4 if game == "N4" else 3,
+            "total": len(ps),
+            "now": now,
+            "rounds": [p.get("round", 0) for p in ps],
+        }
+        for ci, start in enumerate(range(0, len(ps), chunk_rows)):
+            rows = ps[start:start + chunk_rows]
+            ch = {
+                "date": [p.get("date", "") for p in rows],
+                "result": [p.get("result", "") for p in rows],
+                "payout": _yen_columns([p.get("payout", {}) or {} for p in rows]),
+                "preds": [",".join(str(x) for x in (p.get("preds", []) or [])) for p in rows],
+            }
+            if game == "N4" and kc_pages:
+                kr = kc_pages[start:start + chunk_rows]
+                ch["kc_result"] = [p.get("result", "") for p in kr]
+                ch["kc_payout"] = _yen_columns([p.get("payout", {}) or {} for p in kr])
+            chunks[f"{game}-{ci}"] = ch
+    return {"head": head, "chunks": chunks}
+
+
+def _script_json(obj) -> str:
+    # <script> 内に埋めるので "</" を逃がす（JSON としては同じ値）
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+@timed("render.html")
+def render_html(payload: dict, chunk_url: str = "") -> str:
+    """
+    compact payload から HTML を作る。
+      chunk_url=""  : 2個目以降のチャンクは <script type="application/json"> に入れて、
+                      BACK で必要になったときだけ JSON.parse（単体で動く。配信には使わない）
+      chunk_url あり: 2個目以降は埋め込まず、"{key}" を置き換えた URL から fetch
+                      （静的配信・Streamlit とも。core.snapshot.export_snapshot）
+    """
+    chunks = payload.get("chunks", {})
+    first = {k: v for k, v in chunks.items() if k.endswith("-0")}
+    tags = ""
+    if not chunk_url:
+        for k, v in chunks.items():
+            if k not in first:
+                tags += f'  <script type="application/json" id="chunk-{k}">{_script_json(v)}</script>\n'
+    return HTML_TEMPLATE.format(
+        head_json=_script_json(payload.get("head", {})),
+        inline_json=_script_json(first),
+        chunk_url_json=json.dumps(chunk_url),
+        chunk_tags=tags,
+    )
+
+
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no, viewport-fit=cover">
+  <style>
+    body {{ background:#000; color:#fff; font-family:sans-serif; margin:0; padding:4px; overflow:hidden; user-select:none; touch-action:manipulation; }}
+
+    .lcd {{
+      background-color:#9ea7a6; color:#000;
+      border:4px solid #555; border-radius:12px;
+      height:190px; box-shadow: inset 0 0 10px rgba(0,0,0,0.5);
+      position:relative; padding-top:18px; box-sizing:border-box;
+    }}
+
+    .lcd-label {{
+      font-size:10px; color:#444; font-weight:bold;
+      position:absolute; top:8px; width:100%; text-align:center;
+    }}
+
+    .lcd-inner {{
+      display:flex; width:100%; height:100%;
+      box-sizing:border-box; padding:0 10px 10px 10px; gap:8px;
+      align-items:center;
+    }}
+
+    .result-panel {{ width:50%; display:flex; flex-direction:column; justify-content:flex-start; }}
+    .pred-panel {{ width:50%; display:flex; justify-content:center; }}
+
+    .result-line {{ font-size:11px; font-weight:800; line-height:1.15; white-space:nowrap; }}
+    .result-spacer {{ height:6px; }}
+
+    .payout-row {{
+      display:flex; align-items:baseline; gap:8px;
+      font-size:11px; font-weight:800; line-height:1.15; white-space:nowrap;
+    }}
+    .payout-k {{ width:92px; text-align:left; flex:0 0 auto; }}
+    .payout-v {{ flex:1 1 auto; text-align:right; font-variant-numeric: tabular-nums; letter-spacing:0.2px; padding-right:6px; }}
+
+    .legend {{
+      position:absolute; right:10px; bottom:10px;
+      font-size:9px; font-weight:900; opacity:0.85; white-space:nowrap;
+    }}
+
+    .result-win {{
+      color:#000; font-weight:900; font-size:13px; letter-spacing:0.5px;
+    }}
+
+    .preds-grid {{
+      display:grid; grid-template-columns:1fr 1fr;
+      column-gap:14px; row-gap:2px; width:100%; align-content:center;
+    }}
+
+    .num-text {{
+      font-family:'Courier New', monospace; font-weight:bold;
+      letter-spacing:2px; line-height:1.05; font-size:20px;
+      text-align:left; width:100%;
+    }}
+
+    /* KC用フォント調整：サイズを16pxにし、letter-spacingを調整 */
+    .kc-font {{
+      font-family: "Apple Color Emoji", "Segoe UI Emoji", "Noto Color Emoji", sans-serif;
+      letter-spacing: 0.1em !important; 
+      font-size: 14px !important;
+    }}
+
+    .red {{ color:#ff3b30; }}
+    .blue {{ color:#007aff; }}
+    
+    .blue-kc {{ text-shadow: 0 0 5px rgba(0, 122, 255, 0.8); }}
+    .red-kc  {{ text-shadow: 0 0 5px rgba(255, 59, 48, 0.8); }}
+
+    .lcd.mode-now .result-panel {{ display:none; }}
+    .lcd.mode-now .pred-panel {{ width:100%; }}
+    .lcd.mode-now .preds-grid {{ width:75%; margin:0 auto; justify-items:center; }}
+    .lcd.mode-now .num-text {{ text-align:center; }}
+
+    .count-bar {{ display:flex; justify-content:space-between; align-items:center; background:#222; padding:0 12px; border-radius:30px; margin:8px 0; height:45px; gap:8px; }}
+    .btn-round {{ width:38px; height:38px; border-radius:50%; background:#444; color:#fff; display:flex; justify-content:center; align-items:center; font-size:24px; font-weight:bold; border:2px solid #666; cursor:pointer; }}
+    .btn-nav {{ height:36px; border-radius:18px; background:#fff; color:#000; padding:0 10px; display:flex; align-items:center; justify-content:center; font-weight:900; cursor:pointer; border:2px solid rgba(0,0,0,0.3); font-size:12px; }}
+    .pad-grid {{ display:grid; grid-template-columns:1fr 1fr; gap:6px; }}
+    .btn {{ height:42px; border-radius:12px; color:#fff; font-weight:bold; font-size:12px; display:flex; justify-content:center; align-items:center; border:2px solid rgba(0,0,0,0.3); box-shadow:0 3px #000; cursor:pointer; opacity:0.55; }}
+    .btn.active {{ opacity:1.0; filter:brightness(1.12); border:2px solid #fff !important; box-shadow:0 0 15px rgba(255,255,255,0.35); transform: translateY(2px); }}
+    .btn-loto {{ background:#E91E63; }}
+    .btn-num  {{ background:#009688; }}
+    .btn-mini {{ background:#FF9800; }}
+    .btn-b5   {{ background:#2196F3; }}
+    .btn-kc   {{ background:#FFEB3B; color:#333; }}
+  </style>
+</head>
+<body>
+  <div class="lcd" id="lcd">
+    <div id="game-label" class="lcd-label"></div>
+    <div class="lcd-inner">
+      <div id="result-box" class="result-panel"></div>
+      <div id="preds-box" class="pred-panel"></div>
+    </div>
+  </div>
+
+  <div class="count-bar">
+    <div class="btn-round" onclick="changeCount(-1)">－</div>
+    <div id="count-label" style="font-size:18px; font-weight:bold;">10</div>
+    <div class="btn-round" onclick="changeCount(1)">＋</div>
+    <div class="btn-nav" onclick="navBack()">BACK</div>
+    <div class="btn-nav" onclick="navNext()">NEXT</div>
+    <div class="btn-nav" onclick="navNow()">NOW</div>
+  </div>
+
+  <div class="pad-grid">
+    <div class="btn btn-loto" onclick="setG('L7')">LOTO 7</div>
+    <div id="btn-N4" class="btn btn-num" onclick="setG('N4')">Numbers 4</div>
+    <div class="btn btn-loto" onclick="setG('L6')">LOTO 6</div>
+    <div id="btn-N3" class="btn btn-num" onclick="setG('N3')">Numbers 3</div>
+    <div class="btn btn-loto" onclick="setG('ML')">MINI LOTO</div>
+    <div id="btn-NM" class="btn btn-mini" onclick="setG('NM')">Numbers mini</div>
+    <div class="btn btn-b5" onclick="setG('B5')">BINGO 5</div>
+    <div id="btn-KC" class="btn btn-kc" onclick="setG('KC')">着替クー</div>
+  </div>
+
+{chunk_tags}  <script>
+    // ---- compact payload（列形式・BACK はチャンク単位で遅延読み込み）----
+    const HEAD = {head_json};
+    const INLINE = {inline_json};
+    const CHUNK_URL = {chunk_url_json};
+    const SRC = {{'N4':'N4','N3':'N3','NM':'N3','KC':'N4'}};
+    const DUMMY = {{mode:'NOW',round:0,date:'',result:'',payout:{{}},preds:Array(10).fill('COMING SOON')}};
+    const chunks = {{}};
+    const pending = {{}};
+    const pageCache = {{}};
+    let curG='N4';
+    let curC=10;
+    const cursor={{'N4':0,'N3':0,'NM':0,'KC':0,'L7':0,'L6':0,'ML':0,'B5':0}};
+    let viewRound = null;
+    let viewMode  = 'NOW';
+
+    function escHtml(s){{
+      return String(s).replaceAll("&","&amp;").replaceAll("<","&lt;").replaceAll(">","&gt;");
+    }}
+    function setActiveBtn(){{
+      document.querySelectorAll('.btn').forEach(b=>b.classList.remove('active'));
+      const active=document.getElementById('btn-'+curG);
+      if(active) active.classList.add('active');
+    }}
+    function getChunk(g, ci){{
+      const key = g + '-' + ci;
+      if(chunks[key]) return chunks[key];
+      if(INLINE[key]) {{ chunks[key] = INLINE[key]; return chunks[key]; }}
+      const el = document.getElementById('chunk-' + key);
+      if(el) {{ chunks[key] = JSON.parse(el.textContent); return chunks[key]; }}
+      if(CHUNK_URL && !pending[key]) {{
+        pending[key] = true;
+        fetch(CHUNK_URL.replace('{{key}}', key))
+          .then(r=>r.json())
+          .then(d=>{{ chunks[key] = d; update(); }})
+          .catch(()=>{{ pending[key] = false; }});
+      }}
+      return null;
+    }}
+    function gameLen(g){{
+      const s = SRC[g];
+      return s ? HEAD.games[s].total : 1;
+    }}
+    function roundAt(g, i){{
+      const s = SRC[g];
+      return s ? HEAD.games[s].rounds[i] : 0;
+    }}
+    function yenCols(cols, j){{
+      const out = {{}};
+      for(const k in (cols||{{}})) {{ if(cols[k][j]) out[k] = {{yen: cols[k][j]}}; }}
+      return out;
+    }}
+    function basePage(s, i){{
+      const meta = HEAD.games[s];
+      const ci = Math.floor(i / HEAD.chunk);
+      const ch = getChunk(s, ci);
+      if(!ch) return null;
+      const j = i - ci * HEAD.chunk;
+      const page = {{
+        mode: (i < meta.now ? 'NOW' : 'RESULT'),
+        round: meta.rounds[i],
+        date: ch.date[j],
+        result: ch.result[j],
+        payout: yenCols(ch.payout, j),
+        preds: (ch.preds[j] ? ch.preds[j].split(',') : []),
+      }};
+      if(ch.kc_result) page.kc = {{result: ch.kc_result[j], payout: yenCols(ch.kc_payout, j)}};
+      return page;
+    }}
+    // NM: N3 予想の下2桁、重複は +1, -1, +2, -2, ...（core.mini.nm_drift_unique と同じ）
+    function nmDrift(arr){{
+      const seen = new Set();
+      const out = [];
+      for(const s of arr) {{
+        let base = parseInt(String(s).trim(), 10);
+        if(isNaN(base)) base = 0;
+        base = ((base % 100) + 100) % 100;
+        let v = base;
+        if(seen.has(v)) {{
+          for(let k=1;k<100 && v===base;k++) {{
+            for(const d of [k, -k]) {{
+              const c = (((base + d) % 100) + 100) % 100;
+              if(!seen.has(c)) {{ v = c; break; }}
+            }}
+          }}
+        }}
+        seen.add(v);
+        out.push(String(v).padStart(2, '0'));
+      }}
+      return out;
+    }}
+    // KC: N4 予想をフルーツに（core.model.kc_from_n4_preds と同じ）
+    function kcPreds(preds){{
+      const out = preds.map(s => [...String(s)].map(ch => HEAD.kc_fruit[ch] || '🍎').join(''));
+      while(out.length < 10) out.push(out.length ? out[out.length-1] : '🍎🍎🍎🍎');
+      return out.slice(0, 10);
+    }}
+    function getPage(g, i){{
+      const s = SRC[g];
+      if(!s) return DUMMY;
+      pageCache[g] = pageCache[g] || {{}};
+      if(pageCache[g][i]) return pageCache[g][i];
+      const p = basePage(s, i);
+      if(!p) return null;
+      let page = p;
+      if(g === 'NM') {{
+        const mini = (p.payout.MINI && p.payout.MINI.yen) ? {{MINI: {{yen: p.payout.MINI.yen}}}} : {{}};
+        page = {{mode:p.mode, round:p.round, date:p.date, result:(p.result ? p.result.slice(-2) : ''), payout:mini, preds:nmDrift(p.preds.map(x => String(x).slice(-2)))}};
+      }} else if(g === 'KC') {{
+        const kc = p.kc || {{result:'', payout:{{}}}};
+        page = {{mode:p.mode, round:p.round, date:p.date, result:kc.result, payout:kc.payout, preds:kcPreds(p.preds)}};
+      }}
+      pageCache[g][i] = page;
+      return page;
+    }}
+    function currentPage(){{
+      const n=gameLen(curG);
+      const idx=Math.max(0, Math.min(n-1, cursor[curG]||0));
+      return getPage(curG, idx);
+    }}
+    function findIndexByRound(game, roundNo){{
+      const n = gameLen(game);
+      if(n === 0) return 0;
+      if(roundNo === null || roundNo === undefined) return 0;
+      let bestIdx = 0;
+      let bestDiff = 1e18;
+      for(let i=0;i<n;i++) {{
+        const r = roundAt(game, i);
+        const diff = Math.abs((r||0) - roundNo);
+        if(diff < bestDiff) {{
+          bestDiff = diff;
+          bestIdx = i;
+          if(diff === 0) break;
+        }}
+      }}
+      return bestIdx;
+    }}
+    function payoutYen(payout,key){{
+      if(!payout) return "";
+      if(payout[key] && payout[key].yen) return payout[key].yen;
+      return "";
+    }}
+    function renderResultPanel(page){{
+      if(!page) return "";
+      const res=page.result||"";
+      const pay=page.payout||{{}};
+      let h="";
+      if(res) {{
+        h+=`<div class="result-spacer"></div>`;
+        h+=`<div style="text-align:center;">`;
+        h+=`<div class="result-line">当せん番号</div>`;
+        const cls = (curG==='KC') ? "result-win kc-font" : "result-win";
+        h+=`<div class="${{cls}}" style="font-size:18px;font-weight:900;">${{escHtml(res)}}</div>`;
+        h+=`</div>`;
+      }}
+      h+=`<div class="result-spacer"></div>`;
+      if(curG==='NM'){{
+        const miniY=payoutYen(pay,"MINI") || payoutYen(pay,"Mini") || payoutYen(pay,"ミニ") || payoutYen(pay,"STR");
+        h+=`<div class="payout-row"><span class="payout-k">ミニ</span><span class="payout-v">${{escHtml(miniY)}}</span></div>`;
+      }} else if(curG==='KC') {{
+        const k1=payoutYen(pay,"1等");
+        const k2=payoutYen(pay,"2等");
+        const k3=payoutYen(pay,"3等");
+        if(k1) h+=`<div class="payout-row"><span class="payout-k">1等</span><span class="payout-v">${{escHtml(k1)}}</span></div>`;
+        if(k2) h+=`<div class="payout-row"><span class="payout-k">2等</span><span class="payout-v">${{escHtml(k2)}}</span></div>`;
+        if(k3) h+=`<div class="payout-row"><span class="payout-k">3等</span><span class="payout-v">${{escHtml(k3)}}</span></div>`;
+      }} else {{
+        const strY=payoutYen(pay,"STR");
+        const boxY=payoutYen(pay,"BOX");
+        const ssY=payoutYen(pay,"SET-S");
+        const sbY=payoutYen(pay,"SET-B");
+        if(strY) h+=`<div class="payout-row"><span class="payout-k">ストレート</span><span class="payout-v">${{escHtml(strY)}}</span></div>`;
+        if(boxY) h+=`<div class="payout-row"><span class="payout-k">ボックス</span><span class="payout-v">${{escHtml(boxY)}}</span></div>`;
+        if(ssY)  h+=`<div class="payout-row"><span class="payout-k">Set-ストレート</span><span class="payout-v">${{escHtml(ssY)}}</span></div>`;
+        if(sbY)  h+=`<div class="payout-row"><span class="payout-k">Set-ボックス</span><span class="payout-v">${{escHtml(sbY)}}</span></div>`;
+      }}
+      h+=`<div class="legend">🟥BX&nbsp;&nbsp;🟦STR</div>`;
+      return h;
+    }}
+    function renderMarkedDigitsSB(pred,result){{
+      const resArr = [...(result||"")];
+      const prArr  = [...(pred||"")];
+      if(curG==='NM'){{
+        let out="";
+        for(let i=0;i<prArr.length;i++) {{
+          const ch=prArr[i];
+          if(i<resArr.length && prArr[i]===resArr[i]) out+=`<span class="blue">${{ch}}</span>`;
+          else out+=ch;
+        }}
+        return out;
+      }}
+      const counts={{}};
+      for(const ch of resArr) counts[ch]=(counts[ch]||0)+1;
+      const isStr=Array(prArr.length).fill(false);
+      const isBx=Array(prArr.length).fill(false);
+      for(let i=0;i<Math.min(prArr.length,resArr.length);i++) {{
+        if(prArr[i]===resArr[i] && counts[prArr[i]]>0) {{
+          isStr[i]=true; counts[prArr[i]]--;
+        }}
+      }}
+      for(let i=0;i<prArr.length;i++) {{
+        if(isStr[i]) continue;
+        const ch=prArr[i];
+        if(counts[ch] && counts[ch]>0) {{
+          isBx[i]=true; counts[ch]--;
+        }}
+      }}
+      let out="";
+      for(let i=0;i<prArr.length;i++) {{
+        const ch=prArr[i];
+        const clsStr = (curG==='KC') ? 'blue-kc' : 'blue';
+        const clsBx  = (curG==='KC') ? 'red-kc' : 'red';
+        if(isStr[i]) out+=`<span class="${{clsStr}}">${{ch}}</span>`;
+        else if(isBx[i]) out+=`<span class="${{clsBx}}">${{ch}}</span>`;
+        else out+=ch;
+      }}
+      return out;
+    }}
+    function renderPredPanel(page){{
+      if(!page) return "";
+      const preds=page.preds||[];
+      const res=page.result||"";
+      let h='<div class="preds-grid">';
+      for(let i=0;i<Math.min(curC,preds.length);i++) {{
+        const v=preds[i];
+        const cls = (curG==='KC') ? "num-text kc-font" : "num-text";
+        if(page.mode==='RESULT' && res && (curG==='N4'||curG==='N3'||curG==='NM'||curG==='KC')) {{
+          h+=`<div class="${{cls}}">${{renderMarkedDigitsSB(v,res)}}</div>`;
+        }} else {{
+          h+=`<div class="${{cls}}">${{escHtml(v)}}</div>`;
+        }}
+      }}
+      h+='</div>';
+      return h;
+    }}
+    function update(){{
+      document.getElementById('count-label').innerText=String(curC);
+      const page=currentPage();
+      setActiveBtn();
+      if(!page) return;
+      viewRound = page.round || viewRound;
+      viewMode  = (page.mode==='NOW' ? 'NOW' : 'BACK');
+      const lcd=document.getElementById('lcd');
+      if(page.mode==='NOW') lcd.classList.add('mode-now');
+      else lcd.classList.remove('mode-now');
+      document.getElementById('game-label').innerText = (page.mode==='NOW' ? 'NOW ('+curG+')' : 'BACK ('+curG+')');
+      if(page.mode==='NOW') {{
+        document.getElementById('game-label').innerText = '第' + String(page.round) + '回 予想';
+      }} else {{
+        const dt = page.date || '';
+        const rno = page.round || 0;
+        document.getElementById('game-label').innerText = (dt ? (dt + '　') : '') + '第' + String(rno) + '回　結果／予想結果';
+        document.getElementById('result-box').innerHTML=renderResultPanel(page);
+      }}
+      document.getElementById('preds-box').innerHTML=renderPredPanel(page);
+    }}
+    function changeCount(v){{ curC=Math.max(1,Math.min(10,curC+v)); update(); }}
+    function setG(g){{
+      curG = g;
+      if(viewMode === 'NOW') {{
+        cursor[curG] = 0;
+      }} else {{
+        cursor[curG] = findIndexByRound(curG, viewRound);
+      }}
+      update();
+    }}
+    function navBack(){{ const n=gameLen(curG); cursor[curG]=Math.min((cursor[curG]||0)+1, Math.max(0,n-1)); update(); }}
+    function navNext(){{ cursor[curG]=Math.max((cursor[curG]||0)-1,0); update(); }}
+    function navNow(){{ cursor[curG]=0; update(); }}
+    update();
+  </script>
+</body>
+</html>
+"""
@@ -0,0 +1,260 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from core.cache import cached_items
+from core.config import JST, safe_save_json
+
+# ============================================================
+# Draw calendar scheduler（should_fetch_after_20 の置き換え）
+#   - Numbers / 着せかえクーちゃん は 月〜金 抽せん、年末年始（12/31〜1/3）は休み
+#   - キャッシュの最新回から「今あるはずの回号・日付」をオフラインで出して、
+#     それが無いときだけ取得する（土日・休みの日はネットワークゼロ）
+#   - 発表（20時）以降は取り直しを指数バックオフ（5分→…→60分）で間引く
+#   - 取り直しの状態は data/fetch_schedule.json（ゲームごと）
+#   - 次の回号がカレンダーの抽せん日より後の日付で出ていたら、間の日は休み扱いで覚える
+# ============================================================
+SCHEDULE_FILE = "data/fetch_schedule.json"
+PUBLISH_HOUR = 20
+NO_DRAW_MD = {(12, 31), (1, 1), (1, 2), (1, 3)}
+BACKOFF_MIN_SEC = 5 * 60
+BACKOFF_MAX_SEC = 60 * 60
+NO_DRAW_KEEP = 50
+
+
+def _ymd(d: date) -> str:
+    return d.strftime("%Y/%m/%d")
+
+
+def _parse_ymd(s: str) -> Optional[date]:
+    try:
+        return datetime.strptime(str(s), "%Y/%m/%d").date()
+    except Exception:
+        return None
+
+
+def _now(now: Optional[datetime] = None) -> datetime:
+    return now.astimezone(JST) if now else datetime.now(JST)
+
+
+def is_draw_day(d: date, no_draw: Tuple[str, ...] = ()) -> bool:
+    if d.weekday() >= 5:
+        return False
+    if (d.month, d.day) in NO_DRAW_MD:
+        return False
+    return _ymd(d) not in no_draw
+
+
+def next_draw_day(d: date, no_draw: Tuple[str, ...] = ()) -> date:
+    """d より後の最初の抽せん日"""
+    d = d + timedelta(days=1)
+    while not is_draw_day(d, no_draw):
+        d += timedelta(days=1)
+    return d
+
+
+def latest_published_draw(now: Optional[datetime] = None, no_draw: Tuple[str, ...] = ()) -> date:
+    """now の時点で結果が出ているはずの最後の抽せん日"""
+    now = _now(now)
+    d = now.date()
+    if not (is_draw_day(d, no_draw) and now.hour >= PUBLISH_HOUR):
+        d -= timedelta(days=1)
+    while not is_draw_day(d, no_draw):
+        d -= timedelta(days=1)
+    return d
+
+
+def load_schedule_state(path: str = SCHEDULE_FILE) -> Dict[str, Any]:
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data.setdefault("games", {})
+                data.setdefault("no_draw", [])
+                return data
+        except Exception:
+            pass
+    return {"games": {}, "no_draw": [], "updated_at": ""}
+
+
+def save_schedule_state(state: Dict[str, Any], path: str = SCHEDULE_FILE) -> bool:
+    state = dict(state)
+    state["updated_at"] = _now().strftime("%Y-%m-%d %H:%M:%S")
+    return bool(safe_save_json(state, path))
+
+
+def expected_latest(
+    cache: Dict[str, Any],
+    game: str,
+    now: Optional[datetime] = None,
+    state: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    キャッシュの最新回から、今あるはずの最新 {round, date} を数える。
+    キャッシュが空・日付なしなら None（回号は数えられない）。
+    """
+    no_draw = tuple((state or {}).get("no_draw", []))
+    latest = cached_items(cache, game, limit=1)
+    if not latest:
+        return None
+    d = _parse_ymd(latest[0].get("date", ""))
+    if d is None:
+        return None
+    rno = int(latest[0].get("round", 0))
+    target = latest_published_draw(now, no_draw)
+    while d < target:
+        nd = next_draw_day(d, no_draw)
+        if nd > target:
+            break
+        d = nd
+        rno += 1
+    return {"round": rno, "date": _ymd(d)}
+
+
+def expected_next(
+    cache: Dict[str, Any],
+    game: str,
+    now: Optional[datetime] = None,
+    state: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """次に出る回 {round, date}（今あるはずの回の次の抽せん日）"""
+    cur = expected_latest(cache, game, now, state)
+    if cur is None:
+        return None
+    no_draw = tuple((state or {}).get("no_draw", []))
+    return {"round": cur["round"] + 1, "date": _ymd(next_draw_day(_parse_ymd(cur["date"]), no_draw))}
+
+
+def is_up_to_date(have: Dict[str, Any], exp: Dict[str, Any]) -> bool:
+    """キャッシュの最新回 have が、あるはずの回 exp に届いているか（回号か日付のどちらかで）"""
+    return int(have.get("round", 0)) >= exp["round"] or str(have.get("date", "")) >= exp["date"]
+
+
+def fetch_due(
+    cache: Dict[str, Any],
+    game: str,
+    now: Optional[datetime] = None,
+    state: Optional[Dict[str, Any]] = None,
+) -> Tuple[bool, str]:
+    """
+    取得するか（理由つき）：
+      "warm"        … キャッシュが空（失敗したら同じくバックオフ）
+      "undated"     … 最新回に日付が無く、あるはずの回を数えられない（同じくバックオフ）
+      "up_to_date"  … あるはずの回がもうある（休みの日はずっとこれ）
+      "backoff"     … 足りないが、前回の試行から間隔が空いていない
+      "due"         … 足りないので取りに行く
+    """
+    state = state if state is not None else load_schedule_state()
+    if not cached_items(cache, game, limit=1):
+        ok, why = try_allowed(state, game, "warm", now)
+        return ok, ("warm" if ok else why)
+    exp = expected_latest(cache, game, now, state)
+    if exp is None:
+        ok, why = try_allowed(state, game, "undated", now)
+        return ok, ("undated" if ok else why)
+    have = cached_items(cache, game, limit=1)[0]
+    if is_up_to_date(have, exp):
+        return False, "up_to_date"
+
+    ok, why = try_allowed(state, game, exp["round"], now)
+    return ok, ("due" if ok else why)
+
+
+def try_allowed(
+    state: Dict[str, Any],
+    key: str,
+    target: Any,
+    now: Optional[datetime] = None,
+    max_tries: Optional[int] = None,
+) -> Tuple[bool, str]:
+    """
+    key（ゲーム名など）の取り直しを今やってよいか。target が前回と違えば即OK。
+    同じ target なら 前回から BACKOFF_MIN_SEC * 2^(tries-1)（上限 BACKOFF_MAX_SEC）空ける。
+    max_tries を超えたら諦める（"gave_up"）。
+    """
+    gs = state.get("games", {}).get(key) or {}
+    if gs.get("target") != target or not gs.get("last_try"):
+        return True, "new"
+    tries = max(1, int(gs.get("tries", 1)))
+    if max_tries is not None and tries >= max_tries:
+        return False, "gave_up"
+    try:
+        last = datetime.strptime(gs["last_try"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=JST)
+    except Exception:
+        return True, "new"
+    wait = min(BACKOFF_MAX_SEC, BACKOFF_MIN_SEC * (2 ** (tries - 1)))
+    if (_now(now) - last).total_seconds() < wait:
+        return False, "backoff"
+    return True, "retry"
+
+
+def note_try(
+    state: Dict[str, Any],
+    key: str,
+    target: Any,
+    done: bool,
+    now: Optional[datetime] = None,
+    path: str = SCHEDULE_FILE,
+) -> None:
+    """試行を記録して保存（done なら key の記録を消す）"""
+    games = state.setdefault("games", {})
+    if done:
+        games.pop(key, None)
+    else:
+        gs = games.get(key) or {}
+        tries = int(gs.get("tries", 0)) + 1 if gs.get("target") == target else 1
+        games[key] = {"target": target, "tries": tries, "last_try": _now(now).strftime("%Y-%m-%d %H:%M:%S")}
+    save_schedule_state(state, path)
+
+
+def note_fetch(
+    cache: Dict[str, Any],
+    game: str,
+    fetched: int,
+    now: Optional[datetime] = None,
+    state: Optional[Dict[str, Any]] = None,
+    path: str = SCHEDULE_FILE,
+) -> Dict[str, Any]:
+    """
+    取得した後に呼ぶ（cache は取り込み済みのもの）。
+    まだ足りなければ試行回数を増やし、揃えば消す。
+    取れた（fetched>0）回の中で、連続する回号の間にカレンダー上の抽せん日が挟まっていたら
+    （新しい回がその日より後の日付で出ていたら）、その日を休みとして覚える。
+    予定日の結果がまだ無いだけ（発表の遅れ）では休みにしない。
+    """
+    state = state if state is not None else load_schedule_state(path)
+    now = _now(now)
+    if not cached_items(cache, game, limit=1):
+        note_try(state, game, "warm", False, now, path)
+        return state
+    if fetched:
+        _note_skipped_days(state, cached_items(cache, game, limit=int(fetched) + 1))
+    exp = expected_latest(cache, game, now, state)
+    if exp is None:
+        note_try(state, game, "undated", False, now, path)
+        return state
+    have = cached_items(cache, game, limit=1)[0]
+    if is_up_to_date(have, exp):
+        note_try(state, game, None, True, now, path)
+        return state
+    note_try(state, game, exp["round"], False, now, path)
+    return state
+
+
+def _note_skipped_days(state: Dict[str, Any], items: list) -> None:
+    """新しい順の items で、回号が1つ違いなのに日付が飛んでいる間の抽せん日を no_draw に足す"""
+    nd = state.setdefault("no_draw", [])
+    for newer, older in zip(items, items[1:]):
+        a = _parse_ymd(older.get("date", ""))
+        b = _parse_ymd(newer.get("date", ""))
+        if a is None or b is None or int(newer.get("round", 0)) != int(older.get("round", 0)) + 1:
+            continue
+        d = next_draw_day(a, tuple(nd))
+        while d < b:
+            if _ymd(d) not in nd:
+                nd.append(_ymd(d))
+            d = next_draw_day(d, tuple(nd))
+    nd.sort()
+    del nd[:-NO_DRAW_KEEP]
@@ -0,0 +1,86 @@
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+# ============================================================
+# 決定論 seed（32bit）
+#   - "fnv1a": 従来と完全に同じ値（保存済み予想の再現性を守る）
+#   - "crc32": zlib（C実装）。値は変わるので VERSION を上げるときだけ使う
+#   繰り返し出てくる区切り（trends の1項目など）は fnv1a32_parts で O(1) にする：
+#     1文字ぶんの XOR は状態の下位8bit しか変えず、積の下位8bit は下位8bit だけで決まるので
+#     fnv1a32(seg, h) = h * P^len(seg) + 表[seg][h の下位8bit]  (mod 2^32)
+#   表は区切りごとに、出てきた下位8bit の分だけ埋める（最大256個）
+# ============================================================
+FNV_OFFSET = 2166136261
+FNV_PRIME = 16777619
+
+SEED_SCHEMES = ("fnv1a", "crc32")
+_MASK = 0xFFFFFFFF
+_SEG_MAX = 4096
+
+# 区切り → (P^len, 下位8bit → 加算値)。P^len が None は 1文字ずつ（ord が 255 を超える）
+_segs: Dict[str, Tuple[Optional[int], Dict[int, int]]] = {}
+
+
+def fnv1a32(s: str, h: int = FNV_OFFSET) -> int:
+    """従来ループと同じ FNV-1a（1文字ずつ ord）。状態 h から続けて計算できる"""
+    try:
+        data = s.encode("ascii")
+    except UnicodeEncodeError:
+        # 非ASCIIは ord がバイトと一致しないので従来どおり文字単位
+        for ch in s:
+            h ^= ord(ch)
+            h = (h * FNV_PRIME) & 0xFFFFFFFF
+        return h
+    for b in data:
+        h = ((h ^ b) * FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def _seg(seg: str) -> Tuple[Optional[int], Dict[int, int]]:
+    t = _segs.get(seg)
+    if t is None:
+        if len(_segs) >= _SEG_MAX:
+            _segs.clear()
+        pk = pow(FNV_PRIME, len(seg), 1 << 32) if all(ord(ch) < 256 for ch in seg) else None
+        t = _segs[seg] = (pk, {})
+    return t
+
+
+def clear_seed_segments() -> None:
+    _segs.clear()
+
+
+def fnv1a32_parts(parts: Iterable[str], h: int = FNV_OFFSET) -> int:
+    """
+    fnv1a32("".join(parts), h) と同じ値。
+    同じ区切りが何度も出てくる呼び出し用（区切りごとの表を引くだけになる）。
+    """
+    for seg in parts:
+        pk, tab = _seg(seg)
+        if pk is None:
+            h = fnv1a32(seg, h)
+            continue
+        x = h & 0xFF
+        a = tab.get(x)
+        if a is None:
+            a = tab[x] = (fnv1a32(seg, x) - x * pk) & _MASK
+        h = (h * pk + a) & _MASK
+    return h
+
+
+def seed_hash(parts: Iterable[str], scheme: str = "fnv1a") -> int:
+    """
+    "".join(parts) の32bitハッシュ。
+    parts の区切り方は結果に影響しない（連結せずに状態を引き継ぐだけ）。
+    """
+    if scheme == "crc32":
+        h = 0
+        for p in parts:
+            h = zlib.crc32(p.encode("utf-8"), h)
+        return h & 0xFFFFFFFF
+    if scheme != "fnv1a":
+        raise ValueError(f"unknown seed scheme: {scheme}")
+    h = FNV_OFFSET
+    for p in parts:
+        h = fnv1a32(p, h)
+    return h
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+from core.cache import cache_items_by_round, cached_items, kc_put
+from core.config import JST
+
+# ============================================================
+# Seed pack（同梱する過去データ）
+#   data/seed_pack.json.gz … N4/N3 の結果と KC の結果（gzip JSON）
+#   空の data/ で起動しても、ここから取り込めば取得なしで最初の描画ができる
+#   取り込みは既存キャッシュを上書きしない（cache_items_by_round / kc_put と同じ規則）
+#   同じ pack は1回だけ取り込む（results_cache["seed_pack"] に digest を記録）
+#
+#   python -m core.seedpack export   # 今のキャッシュから pack を作る（同梱前に）
+#   python -m core.seedpack import   # pack をキャッシュに取り込む
+# ============================================================
+SEED_PACK_FILE = "data/seed_pack.json.gz"
+SEED_PACK_ROUNDS = 400
+
+
+def pack_digest(path: str = SEED_PACK_FILE) -> str:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return ""
+
+
+def export_seed_pack(
+    results_cache: Dict[str, Any],
+    kc_cache: Dict[str, Any],
+    path: str = SEED_PACK_FILE,
+    rounds: int = SEED_PACK_ROUNDS,
+) -> Dict[str, int]:
+    """
+    結果は [回号, 日付, 番号, 払戻] の行、KC は [日付, 結果, 払戻] の行にして gzip で書く。
+    mtime を固定するので、中身が同じなら同じバイト列（＝同じ digest）になる。
+    """
+    pack: Dict[str, Any] = {"v": 1}
+    counts = {}
+    for game in ("N4", "N3"):
+        rows = [[it["round"], it["date"], it["num"], it.get("payout", {}) or {}]
+                for it in cached_items(results_cache, game, limit=rounds)]
+        pack[game] = rows
+        counts[game] = len(rows)
+    by_date = kc_cache.get("by_date", {}) or {}
+    kc_rows = []
+    for d in sorted(by_date, reverse=True)[:rounds]:
+        v = by_date[d]
+        if isinstance(v, dict) and v.get("result"):
+            kc_rows.append([d, v["result"], v.get("payout", {}) or {}])
+    pack["KC"] = kc_rows
+    counts["KC"] = len(kc_rows)
+
+    raw = json.dumps(pack, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=9, mtime=0) as gz:
+            gz.write(raw)
+    os.replace(tmp, path)
+    return counts
+
+
+def load_seed_pack(path: str = SEED_PACK_FILE) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with gzip.open(path, "rb") as f:
+            data = json.loads(f.read().decode("utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def import_seed_pack(
+    results_cache: Dict[str, Any],
+    kc_cache: Dict[str, Any],
+    path: str = SEED_PACK_FILE,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    pack をキャッシュ（メモリ上）に取り込む。保存は呼び出し側。
+    取り込んだ件数を返す（取り込み済み・pack なしなら空 dict）。
+    """
+    digest = pack_digest(path)
+    if not digest or (not force and results_cache.get("seed_pack") == digest):
+        return {}
+    pack = load_seed_pack(path)
+    if not pack:
+        return {}
+    counts = {}
+    for game in ("N4", "N3"):
+        before = len(results_cache.get(game, {}) or {})
+        items = [{"round": r[0], "date": r[1], "num": r[2], "payout": r[3]} for r in pack.get(game, []) if len(r) >= 4]
+        cache_items_by_round(results_cache, game, items)
+        counts[game] = len(results_cache.get(game, {}) or {}) - before
+    before = len(kc_cache.get("by_date", {}) or {})
+    for r in pack.get("KC", []):
+        if len(r) >= 3:
+            kc_put(kc_cache, r[0], r[1], r[2])
+    counts["KC"] = len(kc_cache.get("by_date", {}) or {}) - before
+    results_cache["seed_pack"] = digest
+    return counts
+
+
+def main(argv: List[str] = None) -> int:
+    from core.cache import load_results_cache, load_kc_cache, save_results_cache, save_kc_cache
+
+    args = sys.argv[1:] if argv is None else argv
+    cmd = args[0] if args else ""
+    if cmd == "export":
+        counts = export_seed_pack(load_results_cache(), load_kc_cache())
+        print(json.dumps({"path": SEED_PACK_FILE, "bytes": os.path.getsize(SEED_PACK_FILE), "digest": pack_digest(), **counts}))
+        return 0
+    if cmd == "import":
+        results_cache, kc_cache = load_results_cache(), load_kc_cache()
+        counts = import_seed_pack(results_cache, kc_cache, force=True)
+        if counts:
+            save_results_cache(results_cache)
+            if counts.get("KC"):
+                save_kc_cache(kc_cache)
+        print(json.dumps({"imported": counts, "at": datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")}))
+        return 0
+    print("usage: python -m core.seedpack export|import", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
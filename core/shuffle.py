@@ -1,8 +1,17 @@
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
-from collections import Counter
+from typing import Any, Dict, List, Tuple, Optional
+from collections import Counter, OrderedDict
+from bisect import bisect_right
+from itertools import combinations_with_replacement, permutations
+import json
+import os
 import random
+import time
+
+from core.config import safe_save_json
+from core.metrics import count, timed
+from core.seed import seed_hash
 
 
 def _digits_len(game: str) -> int:
@@ -19,13 +28,8 @@ def _sanitize_preds(preds: List[str], digits: int) -> List[str]:
 
 
 def _seed_from_pool(game: str, pool: List[str]) -> int:
-    # Deterministic FNV-1a-ish
-    s = game + ":" + "".join(pool)
-    h = 2166136261
-    for ch in s:
-        h ^= ord(ch)
-        h = (h * 16777619) & 0xFFFFFFFF
-    return h
+    # Deterministic FNV-1a-ish（VERSION に依存しないので常に fnv1a）
+    return seed_hash((game + ":", "".join(pool)))
 
 
 def _is_all_same(s: str) -> bool:
@@ -35,43 +39,257 @@ def _is_all_same(s: str) -> bool:
 def _row_max_repeat(s: str) -> int:
     if not s:
         return 0
-    c = Counter(s)
-    return max(c.values())
+    return max(map(s.count, s))
 
 
-def _multiset_overlap(a: str, b: str) -> int:
-    ca = Counter(a)
-    cb = Counter(b)
-    return sum(min(ca[k], cb.get(k, 0)) for k in ca.keys())
+def _face(s: str) -> str:
+    # BOX上の「顔」（多重集合）。同じ長さ同士なら overlap>=digits と同値
+    return "".join(sorted(s))
 
 
-def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
+def _sweep_unique(rows: List[List[str]], digits: int, rng: random.Random, tries: int = 64) -> None:
+    """
+    大量本数用の仕上げ：まだ問題のある行（全同一・同じ数字3個以上・重複）を、
+    rng で選んだ相手行との1桁スワップで解消する（素材は変えない）。
+    スワップ後の2行がともに制約を満たし、かつ既存の行と被らない場合だけ採用。
+    1行あたり最大 tries 回なので全体で O(out_n)。
     """
-    BOX特化：素材（N4=40桁 / N3=30桁）を捨てずに再配置して10本作る。
+    n = len(rows)
+    strs = ["".join(r) for r in rows]
+    cnt = Counter(strs)
+
+    def ok(s: str) -> bool:
+        return not _is_all_same(s) and _row_max_repeat(s) <= 2
+
+    for i in range(n):
+        s = strs[i]
+        if cnt[s] == 1 and ok(s):
+            continue
+        for _ in range(tries):
+            j = rng.randrange(n)
+            if j == i:
+                continue
+            t = strs[j]
+            hit = None
+            for pi in range(digits):
+                for pj in range(digits):
+                    if s[pi] == t[pj]:
+                        continue
+                    a = s[:pi] + t[pj] + s[pi + 1:]
+                    b = t[:pj] + s[pi] + t[pj + 1:]
+                    if a == b or cnt[a] or cnt[b] or not ok(a) or not ok(b):
+                        continue
+                    hit = (pi, pj, a, b)
+                    break
+                if hit:
+                    break
+            if hit is None:
+                continue
+            pi, pj, a, b = hit
+            rows[i][pi], rows[j][pj] = rows[j][pj], rows[i][pi]
+            cnt[s] -= 1
+            cnt[t] -= 1
+            cnt[a] += 1
+            cnt[b] += 1
+            strs[i] = a
+            strs[j] = b
+            break
+
+
+def _material_pool(game: str, preds: List[str], out_n: int) -> List[str]:
+    """素材を out_n 本ぶんに揃えて1桁ずつのプールにする（不足は末尾の複製で埋める）"""
+    digits = _digits_len(game)
+    raw = _sanitize_preds(preds, digits)
+
+    # ensure out_n rows worth of material
+    while len(raw) < out_n:
+        raw.append(raw[-1] if raw else ("0" * digits))
+    raw = raw[:out_n]
+
+    return [ch for s in raw for ch in s]
+
+
+# ============================================================
+# Memo（game + プール署名 → 再配置結果）
+#   shuffle_recompose は (game, pool, out_n, mode) で決定論なので、
+#   同じ素材の再 distill（再実行・バックテスト）は修復ループごと省略できる。
+#   - メモリ：件数上限付き LRU
+#   - ディスク：enable_shuffle_memo_disk() したときだけ（任意）。
+#     mode="solve" は time_budget（実時間）しだいで結果が変わるのでメモリだけ
+# ============================================================
+SHUFFLE_MEMO_FILE = "data/shuffle_memo.json"
+SHUFFLE_MEMO_MAX = 4096
+SHUFFLE_MEMO_DISK_MAX = 20000
+# 再配置アルゴリズムを変えたら上げる（ディスク上の古い結果を捨てる）
+SHUFFLE_MEMO_ALGO = "2026-01c"
+
+_memo: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+_memo_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+_memo_disk: Dict[str, Any] = {"path": None, "rows": {}, "dirty": False}
+
+
+def _memo_key(game: str, pool: List[str], out_n: int, mode: str, time_budget: float) -> str:
+    # solve は予算切れで greedy に落ちるので予算もキーに含める
+    m = f"solve@{time_budget:g}" if mode == "solve" else mode
+    return f"{game}|{out_n}|{m}|{''.join(pool)}"
+
+
+def _memo_get(key: str, disk: bool = True) -> Optional[List[str]]:
+    v = _memo.get(key)
+    if v is not None:
+        _memo.move_to_end(key)
+        _memo_stats["hits"] += 1
+        return list(v)
+    rows = _memo_disk["rows"].get(key) if disk else None
+    if isinstance(rows, list):
+        _memo_stats["disk_hits"] += 1
+        _memo_put(key, rows, to_disk=False)
+        return list(rows)
+    _memo_stats["misses"] += 1
+    return None
+
+
+def _memo_put(key: str, rows: List[str], to_disk: bool = True) -> None:
+    _memo[key] = tuple(rows)
+    _memo.move_to_end(key)
+    while len(_memo) > max(1, SHUFFLE_MEMO_MAX):
+        _memo.popitem(last=False)
+    if to_disk and _memo_disk["path"]:
+        disk = _memo_disk["rows"]
+        disk[key] = list(rows)
+        while len(disk) > max(1, SHUFFLE_MEMO_DISK_MAX):
+            disk.pop(next(iter(disk)))
+        _memo_disk["dirty"] = True
+
+
+def enable_shuffle_memo_disk(path: str = SHUFFLE_MEMO_FILE) -> int:
+    """
+    永続層を有効化して読み込む。読み込んだ件数を返す。
+    SHUFFLE_MEMO_ALGO が違うファイルは読まない（次の保存で上書き）。
+    """
+    rows: Dict[str, Any] = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("algo") == SHUFFLE_MEMO_ALGO:
+                if isinstance(data.get("rows"), dict):
+                    rows = data["rows"]
+        except Exception:
+            pass
+    _memo_disk["path"] = path
+    _memo_disk["rows"] = rows
+    _memo_disk["dirty"] = False
+    return len(rows)
+
+
+def save_shuffle_memo() -> bool:
+    """永続層が有効で、追記があったときだけ保存"""
+    path = _memo_disk["path"]
+    if not path or not _memo_disk["dirty"]:
+        return False
+    ok = bool(safe_save_json({"algo": SHUFFLE_MEMO_ALGO, "rows": _memo_disk["rows"]}, path))
+    if ok:
+        _memo_disk["dirty"] = False
+    return ok
+
+
+def clear_shuffle_memo() -> None:
+    _memo.clear()
+    for k in _memo_stats:
+        _memo_stats[k] = 0
+
+
+def shuffle_memo_stats() -> Dict[str, int]:
+    return dict(_memo_stats, size=len(_memo), disk_size=len(_memo_disk["rows"]))
+
+
+def shuffle_recompose(
+    game: str,
+    preds: List[str],
+    out_n: int = 10,
+    mode: str = "greedy",
+    time_budget: float = 0.05,
+    use_memo: bool = True,
+) -> List[str]:
+    """
+    _recompose() のメモ化ラッパ（結果は _recompose と同一）。
+    use_memo=False で毎回計算。
+    """
+    if not use_memo:
+        return _recompose(game, preds, out_n=out_n, mode=mode, time_budget=time_budget)
+    out_n = max(1, int(out_n))
+    key = _memo_key(game, _material_pool(game, preds, out_n), out_n, mode, time_budget)
+    disk = mode != "solve"
+    hit = _memo_get(key, disk)
+    if hit is not None:
+        count("shuffle.memo", hits=1)
+        return hit
+    count("shuffle.memo", misses=1)
+    out = _recompose(game, preds, out_n=out_n, mode=mode, time_budget=time_budget)
+    _memo_put(key, out, to_disk=disk)
+    return out
+
+
+@timed("shuffle.recompose")
+def _recompose(
+    game: str,
+    preds: List[str],
+    out_n: int = 10,
+    mode: str = "greedy",
+    time_budget: float = 0.05,
+) -> List[str]:
+    """
+    BOX特化：素材（N4=4桁×out_n / N3=3桁×out_n）を捨てずに再配置して out_n 本作る。
 
     目標：
       - 全同一（N4: 4連 / N3: 3連）を確実に排除
       - 可能な限り「1本内 同じ数字3個以上」を回避（最大2個を優先）
       - なるべく同じ顔（重なりすぎ）を避ける（BOX優先なので位置最適化はしない）
-      - 必ず10本返す
+      - 必ず out_n 本返す
       - 決定論（素材が同じなら結果が同じ）
+
+    out_n=10 のときは従来（10本固定版）と同じ結果になる（重複の穴埋めも従来どおり "000…"）。
+    out_n > 10 の重複だけは _fill_unique で近い未使用の行に置き換える。
+    修復は1パスあたり quota = out_n // 10 件まで直すので、
+    パス数は40固定のまま、コストは行数にほぼ比例する。
+
+    mode="solve" のときは solve_recompose() で全制約を満たす配置を探索し、
+    time_budget（秒）内に見つからなければ従来の greedy 結果を返す。
+    out_n > 10 で greedy の結果が制約（recompose_violations）を満たさないときは、
+    solve_recompose() を手数上限つきで呼んで置き換える（解けなければ greedy のまま）。
+    out_n >= _SOLVE_DIRECT_ROWS では greedy を回す前にその solver を試す
+    （修復ループは行が密になるほど遅く、大量本数ではどのみち solver に落ちるため）。
     """
+    out_n = max(1, int(out_n))
     digits = _digits_len(game)
-    raw = _sanitize_preds(preds, digits)
 
-    # ensure 10 rows worth of material
-    while len(raw) < 10:
-        raw.append(raw[-1] if raw else ("0" * digits))
-    raw = raw[:10]
-
-    pool: List[str] = [ch for s in raw for ch in s]
+    if mode == "solve":
+        solved = solve_recompose(game, preds, out_n=out_n, time_budget=time_budget)
+        if solved is not None:
+            return solved
+    # 手数上限つきの solver を試したか（下の解き直しを二度やらない）
+    stepped = False
+    if mode != "solve" and out_n >= _SOLVE_DIRECT_ROWS:
+        stepped = True
+        # 大量本数は修復ループ（密になるほど遅い）を回さず solver を先に試す
+        solved = solve_recompose(
+            game, preds, out_n=out_n, time_budget=float("inf"),
+            max_steps=_FALLBACK_STEPS_PER_ROW * out_n,
+        )
+        if solved is not None:
+            count("shuffle.direct", solved=1)
+            return solved
+        count("shuffle.direct", unsolved=1)
+
+    pool = _material_pool(game, preds, out_n)
     if not pool:
-        return ["0" * digits] * 10
+        return ["0" * digits] * out_n
 
     # If pool itself is all one digit, it is mathematically impossible to avoid all-same.
     # In practice this won't happen, but keep safe behavior.
     if len(set(pool)) == 1:
-        return [pool[0] * digits] * 10
+        return [pool[0] * digits] * out_n
 
     rng = random.Random(_seed_from_pool(game, pool))
     counts = Counter(pool)
@@ -99,9 +317,9 @@ def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
         counts[d] -= 1
         return d
 
-    # Build 10 rows greedily from global pool, keeping material.
+    # Build out_n rows greedily from global pool, keeping material.
     rows: List[List[str]] = []
-    for _ in range(10):
+    for _ in range(out_n):
         row: List[str] = []
         rc = Counter()
         for _pos in range(digits):
@@ -126,7 +344,7 @@ def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
         (0,2,1),
     ]
     perms = perms4 if digits == 4 else perms3
-    for i in range(10):
+    for i in range(out_n):
         p = perms[i % len(perms)]
         rows[i] = [rows[i][k] for k in p]
 
@@ -171,6 +389,9 @@ def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
         rows[i][pi], rows[j][pj] = rows[j][pj], rows[i][pi]
         return False
 
+    # 1パスで直す件数（10本なら1件＝従来どおり）
+    quota = max(1, out_n // 10)
+
     # Deterministic repair passes
     for _pass in range(40):
         changed = False
@@ -182,7 +403,7 @@ def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
             if s in seen:
                 # try to break duplicates by swapping one digit with a far row
                 src = idx
-                tgt = (idx + 3) % 10
+                tgt = (idx + 3) % out_n
                 done = False
                 for pi in range(digits):
                     for pj in range(digits):
@@ -196,54 +417,81 @@ def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
                 seen[s] = idx
 
         # B) reduce row_max_repeat > 2 by swapping with another row
-        out = rows_to_strings()
-        for i, s in enumerate(out):
-            if _row_max_repeat(s) <= 2:
+        # （このパスで既に変更済みなら、先頭1件の pi=0 だけ試す）
+        changed_before = changed
+        n_fixed = 0
+        tried = 0
+        for i in range(out_n):
+            if _row_max_repeat("".join(rows[i])) <= 2:
                 continue
+            tried += 1
             # choose a donor row that has diversity
-            j = (i + 5) % 10
+            j = (i + 5) % out_n
+            hit = False
             for pi in range(digits):
                 for pj in range(digits):
                     if try_swap(i, j, pi, pj):
-                        changed = True
+                        hit = True
                         break
-                if changed:
+                if hit or changed_before:
                     break
-            if changed:
+            if hit:
+                changed = True
+                n_fixed += 1
+            if n_fixed >= quota or (changed_before and tried >= quota):
                 break
 
         # C) ensure no all-same remains (should already be prevented)
-        out = rows_to_strings()
-        for i, s in enumerate(out):
-            if not _is_all_same(s):
+        n_fixed = 0
+        for i in range(out_n):
+            if not _is_all_same("".join(rows[i])):
                 continue
             # force fix by swapping last digit with next row
-            j = (i + 1) % 10
+            j = (i + 1) % out_n
             if try_swap(i, j, digits - 1, digits - 1):
                 changed = True
-                break
+                n_fixed += 1
+                if n_fixed >= quota:
+                    break
 
         # D) soften "same-face" (very high multiset overlap) if it repeats too much
+        # 顔ごとに行番号をまとめて、(i, j) を従来と同じ辞書順で走査する
+        changed_before = changed
         out = rows_to_strings()
-        for i in range(10):
-            for j in range(i + 1, 10):
-                if _multiset_overlap(out[i], out[j]) >= digits and out[i] != out[j]:
-                    # identical multiset (e.g., 5550 vs 0555) is OK for BOX,
-                    # but if too many, we try one small swap
-                    k = (j + 2) % 10
-                    if try_swap(j, k, 0, 0):
-                        changed = True
-                        break
-            if changed:
+        faces = [_face(s) for s in out]
+        by_face = {}
+        for idx, f in enumerate(faces):
+            by_face.setdefault(f, []).append(idx)
+        n_fixed = 0
+        for i in range(out_n):
+            group = by_face[faces[i]]
+            if len(group) > 1:
+                si = "".join(rows[i])
+                for j in group[bisect_right(group, i):]:
+                    sj = "".join(rows[j])
+                    if sj != si and _face(sj) == _face(si):
+                        # identical multiset (e.g., 5550 vs 0555) is OK for BOX,
+                        # but if too many, we try one small swap
+                        k = (j + 2) % out_n
+                        if try_swap(j, k, 0, 0):
+                            changed = True
+                            n_fixed += 1
+                            break
+            if changed_before or n_fixed >= quota:
                 break
 
         if not changed:
             break
 
+    # 大量本数のみ：パス上限で残った問題行を線形スイープで解消
+    # （10本は従来結果を固定するため対象外）
+    if out_n > 10:
+        _sweep_unique(rows, digits, rng)
+
     # Finalize
     out = rows_to_strings()
 
-    # Guarantee: 10 strings, correct length, no all-same (best effort)
+    # Guarantee: out_n strings, correct length, no all-same (best effort)
     fixed: List[str] = []
     for s in out:
         s = "".join(ch for ch in s if ch.isdigit())[:digits]
@@ -266,10 +514,233 @@ def shuffle_recompose(game: str, preds: List[str]) -> List[str]:
         if s not in seenu:
             uniq.append(s)
             seenu.add(s)
-        if len(uniq) >= 10:
+        if len(uniq) >= out_n:
+            break
+
+    if len(uniq) < out_n:
+        if out_n > 10:
+            uniq = _fill_unique(fixed, digits, out_n)
+        else:
+            # 10本以下は従来どおり（保存済み予想を変えないため。変えるなら VERSION を上げる）
+            while len(uniq) < out_n:
+                uniq.append(("0" * digits))
+
+    out = uniq[:out_n]
+
+    # 大量本数のみ：greedy で制約が残ったら solver で解き直す（手数上限なので決定論）
+    if out_n > 10 and not stepped and recompose_violations(game, preds, out, out_n):
+        solved = solve_recompose(
+            game, preds, out_n=out_n, time_budget=float("inf"),
+            max_steps=_FALLBACK_STEPS_PER_ROW * out_n,
+        )
+        if solved is not None:
+            count("shuffle.fallback", solved=1)
+            return solved
+        count("shuffle.fallback", unsolved=1)
+    return out
+
+
+def _fill_unique(rows: List[str], digits: int, out_n: int) -> List[str]:
+    """
+    重複行を、まだ使っていない近い文字列（後ろの桁から +1, +2, ... とずらす）に置き換える。
+    "000…" で埋めない。同じ数字3個以上・全同一にならない候補を優先する。
+    """
+    used = set(rows)
+    seen = set()
+    out: List[str] = []
+    for s in rows:
+        if s in seen:
+            cand = None
+            for strict in (True, False):
+                for pos in range(digits - 1, -1, -1):
+                    for step in range(1, 10):
+                        c = s[:pos] + str((int(s[pos]) + step) % 10) + s[pos + 1:]
+                        if c in used or _is_all_same(c) or (strict and _row_max_repeat(c) > 2):
+                            continue
+                        cand = c
+                        break
+                    if cand:
+                        break
+                if cand:
+                    break
+            if cand is not None:
+                used.add(cand)
+                s = cand
+        seen.add(s)
+        out.append(s)
+        if len(out) >= out_n:
             break
+    return out
+
+
+def recompose_violations(game: str, preds: List[str], rows: List[str], out_n: int = 10) -> List[str]:
+    """
+    再配置結果の制約違反（空なら全部満たす）。
+      count … 本数が out_n でない / dup … 重複行 / repeat … 1本内に同じ数字3個以上
+      material … 素材（_material_pool）と数字の多重集合が違う
+    """
+    digits = _digits_len(game)
+    out = []
+    if len(rows) != out_n:
+        out.append("count")
+    if len(set(rows)) != len(rows):
+        out.append("dup")
+    if any(len(s) != digits or _row_max_repeat(s) > 2 for s in rows):
+        out.append("repeat")
+    if Counter(_material_pool(game, preds, out_n)) != Counter("".join(rows)):
+        out.append("material")
+    return out
+
+
+# ============================================================
+# Solver mode（制約充足としての再配置）
+# ============================================================
+_FACES_CACHE: Dict[int, List[Tuple[str, Tuple[int, ...], int]]] = {}
+# greedy が制約を満たせなかったときの solver の手数上限（1行あたり。時間ではないので決定論）
+_FALLBACK_STEPS_PER_ROW = 8
+# これ以上の本数は greedy より先に solver（同じ手数上限）。解けなければ greedy
+_SOLVE_DIRECT_ROWS = 100
+
+
+def _faces(digits: int) -> List[Tuple[str, Tuple[int, ...], int]]:
+    """
+    1本内の同じ数字が最大2個になる「顔」（多重集合）の一覧。
+    (顔文字列, 数字ごとの個数10要素, 並べ替えの種類数) のタプルで返す。
+    """
+    if digits not in _FACES_CACHE:
+        out = []
+        for combo in combinations_with_replacement("0123456789", digits):
+            c = [0] * 10
+            for ch in combo:
+                c[int(ch)] += 1
+            if max(c) <= 2:
+                out.append(("".join(combo), tuple(c), len(set(permutations(combo)))))
+        _FACES_CACHE[digits] = out
+    return _FACES_CACHE[digits]
+
+
+@timed("shuffle.solve")
+def solve_recompose(
+    game: str,
+    preds: List[str],
+    out_n: int = 10,
+    time_budget: float = 0.05,
+    max_steps: Optional[int] = None,
+) -> Optional[List[str]]:
+    """
+    素材プールを「out_n 個の顔への割り当て」として解く（枝刈り付きバックトラック）。
+
+    制約（すべてハード）：
+      - 素材の数字は1つも変えない・捨てない
+      - 1本内の同じ数字は最大2個（＝全同一も出ない）
+      - 全行ユニーク（同じ顔は並べ替えの種類数まで使える）
 
-    while len(uniq) < 10:
-        uniq.append(("0" * digits))
+    探索：
+      - 残りが最も多い数字を必ず含む顔を次の行に置く（対称性を減らす）
+      - 候補は「使用回数が少ない顔 → 残りの多い数字を消費する顔」の順（顔の分散を優先）
+      - 残り行数 r に対して、どの数字も 2*r 個を超えたら枝刈り
 
-    return uniq[:10]
+    決定論：同点の並びは _seed_from_pool の rng で固定。
+    time_budget 秒を超えた／max_steps 回展開した／解なしの場合は None
+    （呼び出し側で greedy にフォールバック）。
+    """
+    out_n = max(1, int(out_n))
+    digits = _digits_len(game)
+    pool = _material_pool(game, preds, out_n)
+    if not pool:
+        return None
+
+    deadline = time.perf_counter() + max(0.0, float(time_budget))
+    rng = random.Random(_seed_from_pool(game, pool))
+
+    remaining = [0] * 10
+    for ch in pool:
+        remaining[int(ch)] += 1
+    if max(remaining) > 2 * out_n:
+        return None
+
+    faces = _faces(digits)
+    # 使える数字だけで作れる行が out_n 種類に足りなければ解なし（探索しない）
+    if sum(cap for _, fc, cap in faces if all(remaining[d] >= fc[d] for d in range(10))) < out_n:
+        return None
+    tiebreak = list(range(len(faces)))
+    rng.shuffle(tiebreak)
+    # 並べ替えの種類数（同じ顔を何行まで使えるか）
+    capacity = [cap for _, _, cap in faces]
+    by_digit: List[List[int]] = [[] for _ in range(10)]
+    # 顔ごとの (数字, 個数)（0 の数字は見ない）
+    parts: List[List[Tuple[int, int]]] = []
+    for fi, (_, fc, _) in enumerate(faces):
+        parts.append([(d, fc[d]) for d in range(10) if fc[d]])
+        for d in range(10):
+            if fc[d]:
+                by_digit[d].append(fi)
+
+    uses = [0] * len(faces)
+    chosen: List[int] = []
+
+    def candidates(rows_left: int) -> List[int]:
+        top = max(range(10), key=lambda d: (remaining[d], -d))
+        # 枝刈り：置いた後の残りがどれも 2*(rows_left-1) 以下
+        # （超えている数字は、その超過ぶん以上を顔が含む必要がある）
+        cap = 2 * (rows_left - 1)
+        over = [(d, remaining[d] - cap) for d in range(10) if remaining[d] > cap]
+        keyed = []
+        for fi in by_digit[top]:
+            if uses[fi] >= capacity[fi]:
+                continue
+            score = 0
+            for d, k in parts[fi]:
+                if k > remaining[d]:
+                    break
+                score += remaining[d]
+            else:
+                if over:
+                    fc = faces[fi][1]
+                    if any(fc[d] < need for d, need in over):
+                        continue
+                # 並び：使用回数が少ない → 残りの多い数字を消費する → tiebreak
+                keyed.append((uses[fi], -score, tiebreak[fi], fi))
+        keyed.sort()
+        return [t[3] for t in keyed]
+
+    def place(fi: int, sign: int) -> None:
+        for d, k in parts[fi]:
+            remaining[d] -= sign * k
+        uses[fi] += sign
+
+    # 反復DFS（深さ = out_n。数百行でも再帰上限に当たらない）
+    stack: List[Tuple[List[int], int]] = [(candidates(out_n), 0)]
+    steps = 0
+    while stack:
+        if time.perf_counter() > deadline:
+            return None
+        steps += 1
+        if max_steps is not None and steps > max_steps:
+            return None
+        cands, pos = stack[-1]
+        if pos >= len(cands):
+            stack.pop()
+            if chosen:
+                place(chosen.pop(), -1)
+            continue
+        stack[-1] = (cands, pos + 1)
+        fi = cands[pos]
+        place(fi, +1)
+        chosen.append(fi)
+        if len(chosen) == out_n:
+            break
+        stack.append((candidates(out_n - len(chosen)), 0))
+    else:
+        return None
+
+    # 顔ごとに、まだ使っていない並べ替えを rng 順で割り当てる
+    perms_left: Dict[int, List[str]] = {}
+    rows: List[str] = []
+    for fi in chosen:
+        if fi not in perms_left:
+            ps = sorted(set("".join(p) for p in permutations(faces[fi][0])))
+            rng.shuffle(ps)
+            perms_left[fi] = ps
+        rows.append(perms_left[fi].pop())
+    return rows
@@ -0,0 +1,180 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.config import INDEX_MAP
+
+# ============================================================
+# Similarity search（過去の回から「直近と似た回」を引く）
+#   履歴は列ごとの配列（nums: (n, 桁) uint8）で持ち、距離は表引きで一括計算
+#     windmill … 桁ごとの風車盤インデックスの巡回距離（0..5）の合計
+#     hamming  … 数字が違う桁の数
+#     box      … 数字の多重集合の差（並び無視。何個入れ替えれば同じ BOX か）
+#   numpy はこのモジュールだけで使う（model は結果の dict を受け取るだけ）
+# ============================================================
+_COLS = ("n1", "n2", "n3", "n4")
+METRICS = ("windmill", "hamming", "box")
+
+
+def _windmill_tables(digits: int) -> np.ndarray:
+    """[桁, 数字a, 数字b] → 風車盤インデックスの巡回距離"""
+    t = np.zeros((digits, 10, 10), dtype=np.uint8)
+    for c in range(digits):
+        idx = INDEX_MAP[_COLS[c]]
+        for a in range(10):
+            for b in range(10):
+                d = abs(idx[a] - idx[b]) % 10
+                t[c, a, b] = min(d, 10 - d)
+    return t
+
+
+_TABLES = {3: _windmill_tables(3), 4: _windmill_tables(4)}
+_HAMMING = (np.arange(10)[:, None] != np.arange(10)[None, :]).astype(np.uint8)
+
+
+def build_sim_index(items: List[Dict[str, Any]], digits: int) -> Dict[str, Any]:
+    """
+    cached_items の形（round / num）から列形式の履歴を作る。
+    rounds は昇順。数字でない・桁違いの回は入れない。
+    """
+    rows = sorted((int(it["round"]), str(it.get("num", ""))) for it in items
+                  if str(it.get("num", "")).isdigit() and len(str(it.get("num", ""))) == digits)
+    n = len(rows)
+    rounds = np.fromiter((r for r, _ in rows), dtype=np.int64, count=n)
+    raw = "".join(s for _, s in rows).encode("ascii")
+    nums = (np.frombuffer(raw, dtype=np.uint8) - 48).reshape(n, digits) if n else np.zeros((0, digits), dtype=np.uint8)
+    counts = np.zeros((n, 10), dtype=np.uint8)
+    for c in range(digits):
+        np.add.at(counts, (np.arange(n), nums[:, c]), 1)
+    return {"digits": digits, "rounds": rounds, "nums": nums, "counts": counts}
+
+
+_INDEX_MEMO: Dict[str, Any] = {}
+
+
+def sim_index_from_cache(cache: Dict[str, Any], game: str) -> Dict[str, Any]:
+    """結果キャッシュ（core.cache）の全履歴から。件数と最新回が同じ間は作り直さない"""
+    g = cache.get(game, {}) or {}
+    digits = 4 if game == "N4" else 3
+    last = max((int(k) for k in g if str(k).isdigit()), default=0)
+    stamp = (len(g), last)
+    hit = _INDEX_MEMO.get(game)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    items = [v for v in g.values() if isinstance(v, dict) and "round" in v]
+    index = build_sim_index(items, digits)
+    _INDEX_MEMO[game] = (stamp, index)
+    return index
+
+
+def distances(index: Dict[str, Any], query: str, metric: str = "windmill") -> np.ndarray:
+    """query と全履歴との距離（(n,) int）"""
+    digits = index["digits"]
+    q = [int(ch) for ch in str(query)][:digits]
+    if len(q) != digits:
+        raise ValueError(f"query must have {digits} digits: {query!r}")
+    nums = index["nums"]
+    if metric == "windmill":
+        tbl = _TABLES[digits]
+        d = np.zeros(len(nums), dtype=np.int32)
+        for c in range(digits):
+            d += tbl[c, q[c]][nums[:, c]]
+        return d
+    if metric == "hamming":
+        d = np.zeros(len(nums), dtype=np.int32)
+        for c in range(digits):
+            d += _HAMMING[q[c]][nums[:, c]]
+        return d
+    if metric == "box":
+        qc = np.bincount(q, minlength=10).astype(np.int16)
+        return (np.abs(index["counts"].astype(np.int16) - qc).sum(axis=1) // 2).astype(np.int32)
+    raise ValueError(f"unknown metric: {metric}")
+
+
+def nearest(
+    index: Dict[str, Any],
+    query: str,
+    k: int = 10,
+    metric: str = "windmill",
+    before_round: Optional[int] = None,
+    query_round: Optional[int] = None,
+    include_self: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    距離の近い順に k 件（同距離は新しい回が先）。
+    before_round を渡すとその回より前だけ（過去時点の再現用）。
+    query の回そのもの（距離 0）は既定で除く：query_round を渡せばその回、
+    無ければ候補のうち query と同じ数字のいちばん新しい回を query の回とみなす。
+    include_self=True なら除かない。
+    """
+    d = distances(index, query, metric)
+    rounds = index["rounds"]
+    if before_round is not None:
+        mask = rounds < before_round
+    else:
+        mask = np.ones(len(rounds), dtype=bool)
+    if not include_self:
+        if query_round is not None:
+            mask &= rounds != int(query_round)
+        else:
+            q = np.array([int(ch) for ch in str(query)][:index["digits"]], dtype=np.uint8)
+            same = np.nonzero(mask & (index["nums"] == q).all(axis=1))[0]
+            if len(same):
+                mask[same[-1]] = False
+    cand = np.nonzero(mask)[0]
+    if len(cand) == 0 or k <= 0:
+        return []
+    dc = d[cand]
+    k = min(k, len(cand))
+    # 距離昇順・回号降順。argpartition で先に k 件に絞ってから並べる
+    key = dc.astype(np.int64) * (int(rounds.max()) + 1 if len(rounds) else 1) - rounds[cand]
+    part = np.argpartition(key, k - 1)[:k] if k < len(cand) else np.arange(len(cand))
+    part = part[np.argsort(key[part], kind="stable")]
+    nums = index["nums"]
+    out = []
+    for j in part:
+        i = cand[j]
+        out.append({"round": int(rounds[i]), "num": "".join(map(str, nums[i])), "dist": int(d[i])})
+    return out
+
+
+def follow_spins(
+    index: Dict[str, Any],
+    query: str,
+    k: int = 10,
+    metric: str = "windmill",
+    before_round: Optional[int] = None,
+    query_round: Optional[int] = None,
+    include_self: bool = False,
+) -> Dict[str, int]:
+    """
+    似た回の「次の回」へのスピン（風車盤インデックスの差、-4..5）を桁ごとに多数決。
+    generate_predictions(similar=...) に渡す形。次の回が無い候補は飛ばす。
+    query の回そのものは nearest と同じく既定で除く。
+    """
+    digits = index["digits"]
+    rounds = index["rounds"]
+    nums = index["nums"]
+    votes: List[Counter] = [Counter() for _ in range(digits)]
+    used = 0
+    hits = nearest(index, query, k=2 * k, metric=metric, before_round=before_round,
+                   query_round=query_round, include_self=include_self)
+    for hit in hits:
+        nxt = hit["round"] + 1
+        j = int(np.searchsorted(rounds, nxt))
+        if j >= len(rounds) or rounds[j] != nxt or (before_round is not None and nxt >= before_round):
+            continue
+        if used >= k:
+            break
+        used += 1
+        i = int(np.searchsorted(rounds, hit["round"]))
+        for c in range(digits):
+            idx = INDEX_MAP[_COLS[c]]
+            s = (idx[int(nums[j, c])] - idx[int(nums[i, c])]) % 10
+            votes[c][s - 10 if s > 5 else s] += 1
+    out = {}
+    for c in range(digits):
+        if votes[c]:
+            out[_COLS[c]] = max(votes[c].items(), key=lambda kv: (kv[1], -abs(kv[0])))[0]
+    return out
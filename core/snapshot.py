@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from core.cache import RESULTS_CACHE_FILE, KC_CACHE_FILE
+from core.config import JST, PRED_FILE, safe_save_json, safe_save_text
+from core.model import VERSION
+from core.render import render_html
+from core.schedule import SCHEDULE_FILE, fetch_due, load_schedule_state
+from core.store import shared_load, shared_results_cache
+
+# ============================================================
+# Static snapshot（描画済みページの書き出し）
+#   data/snapshots/
+#     pages-<hash>.json        … compact payload 全体（core.render.compact_payload）
+#     chunk-<hash>-<key>.json  … チャンク単体（静的配信で BACK 時に fetch）
+#     index-<hash>.html        … 先頭チャンクだけ埋め込んだ HTML（静的配信用）
+#     app-<hash>.html          … Streamlit 用 HTML（先頭チャンクだけ埋め込み）
+#     index.html               … 最新の index-<hash>.html の写し（静的サーバ用の入口）
+#     manifest.json            … 最新スナップショットの情報
+#   static/snapshots/chunk-<hash>-<key>.json
+#     … Streamlit の静的配信（.streamlit/config.toml の enableStaticServing）に置く
+#       チャンクの写し。app-<hash>.html は BACK のときここ（app/static/…）から fetch する
+#   <hash> は payload JSON の sha256 先頭12桁。内容が同じなら書き直さない。
+# ============================================================
+SNAPSHOT_DIR = "data/snapshots"
+SNAPSHOT_KEEP = 5
+# Streamlit は app.py の隣の static/ を <ページの URL>/app/static/ で配る
+STATIC_CHUNK_DIR = "static/snapshots"
+STATIC_CHUNK_URL = "app/static/snapshots"
+
+
+def _manifest_path(snap_dir: str) -> str:
+    return os.path.join(snap_dir, "manifest.json")
+
+
+def source_stamp() -> Dict[str, int]:
+    """元データ（結果・KC・予想）の mtime。どれかが変わったらスナップショットは古い"""
+    out = {}
+    for path in (RESULTS_CACHE_FILE, KC_CACHE_FILE, PRED_FILE):
+        try:
+            out[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            out[path] = 0
+    return out
+
+
+def _latest_dates(payload: Dict[str, Any]) -> Dict[str, str]:
+    """各ゲームの最初の RESULT 行の日付（compact payload から）"""
+    out = {}
+    chunk = payload["head"]["chunk"]
+    for game, meta in payload["head"]["games"].items():
+        i = meta.get("now", 0)
+        ch = payload["chunks"].get(f"{game}-{i // chunk}")
+        if i < meta.get("total", 0) and ch:
+            out[game] = ch["date"][i % chunk]
+    return out
+
+
+def _write_once(text: str, path: str) -> None:
+    if not os.path.exists(path):
+        safe_save_text(text, path)
+
+
+def _read_snapshot(path: str, snap_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(snap_dir, manifest["html"]), "r", encoding="utf-8") as f:
+            manifest["html_text"] = f.read()
+        return manifest
+    except Exception:
+        return None
+
+
+def load_snapshot(snap_dir: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """
+    manifest を読んで、HTML 本文を "html_text" に付けて返す（無ければ None）。
+    manifest が変わるまではプロセス内の全セッションで同じものを使い回す。
+    """
+    path = _manifest_path(snap_dir)
+    if not os.path.exists(path):
+        return None
+    return shared_load(path, lambda: _read_snapshot(path, snap_dir))
+
+
+def snapshot_is_fresh(manifest: Optional[Dict[str, Any]]) -> bool:
+    """
+    そのまま配信してよいか：
+      - VERSION が同じ
+      - 元データの mtime が書き出し時と同じ
+      - N4/N3 とも取得予定が無い（core.schedule.fetch_due。抽せんの無い日はずっと fresh、
+        結果待ちでもバックオフ中なら fresh のまま＝毎回の再ビルドをしない）
+    """
+    if not manifest:
+        return False
+    if manifest.get("version") != VERSION:
+        return False
+    if manifest.get("source") != source_stamp():
+        return False
+    # 共有の結果キャッシュはビルドが差し替えるだけで書き換えないので、参照のまま回してよい
+    cache = shared_results_cache()
+    sched = shared_load(SCHEDULE_FILE, load_schedule_state)
+    if any(fetch_due(cache, g, state=sched)[0] for g in ("N4", "N3")):
+        return False
+    return True
+
+
+def _prune_generations(dir_path: str, old_hashes: set) -> None:
+    if not old_hashes or not os.path.isdir(dir_path):
+        return
+    for name in os.listdir(dir_path):
+        parts = name.split("-")
+        if len(parts) >= 2 and parts[1].split(".")[0] in old_hashes:
+            try:
+                os.remove(os.path.join(dir_path, name))
+            except OSError:
+                pass
+
+
+def export_snapshot(
+    payload: Dict[str, Any],
+    snap_dir: str = SNAPSHOT_DIR,
+    static_dir: str = STATIC_CHUNK_DIR,
+) -> Dict[str, Any]:
+    """
+    compact payload を内容ハッシュ付きで書き出して manifest を返す。
+    返り値の manifest には Streamlit 用 HTML 本文を "html_text" として付ける。
+    Streamlit 用 HTML も先頭チャンクだけ埋め込み、残りは static_dir の写しから fetch する
+    （components.html に渡す量が履歴の長さで増えない）。
+    """
+    pages_json = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha256(pages_json.encode("utf-8")).hexdigest()[:12]
+    pages_name = f"pages-{digest}.json"
+    static_name = f"index-{digest}.html"
+    app_name = f"app-{digest}.html"
+
+    os.makedirs(snap_dir, exist_ok=True)
+    _write_once(pages_json, os.path.join(snap_dir, pages_name))
+    os.makedirs(static_dir, exist_ok=True)
+    for key, ch in payload["chunks"].items():
+        chunk_json = json.dumps(ch, ensure_ascii=False)
+        _write_once(chunk_json, os.path.join(snap_dir, f"chunk-{digest}-{key}.json"))
+        if not key.endswith("-0"):
+            _write_once(chunk_json, os.path.join(static_dir, f"chunk-{digest}-{key}.json"))
+    static_html = render_html(payload, chunk_url=f"chunk-{digest}-{{key}}.json")
+    app_html = render_html(payload, chunk_url=f"{STATIC_CHUNK_URL}/chunk-{digest}-{{key}}.json")
+    _write_once(static_html, os.path.join(snap_dir, static_name))
+    _write_once(app_html, os.path.join(snap_dir, app_name))
+    safe_save_text(static_html, os.path.join(snap_dir, "index.html"))
+
+    old = load_snapshot(snap_dir) or {}
+    history: List[str] = [digest] + [h for h in old.get("history", []) if h != digest]
+    n4 = payload["head"]["games"].get("N4", {})
+    manifest = {
+        "hash": digest,
+        "pages": pages_name,
+        "html": app_name,
+        "static_html": static_name,
+        "version": VERSION,
+        "now_round": (n4.get("rounds") or [None])[0],
+        "latest_dates": _latest_dates(payload),
+        "source": source_stamp(),
+        "history": history[:SNAPSHOT_KEEP],
+        "built_at": datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    safe_save_json(manifest, _manifest_path(snap_dir))
+
+    # 古い世代を掃除（静的配信の写しも）
+    old_hashes = set(history[SNAPSHOT_KEEP:])
+    _prune_generations(snap_dir, old_hashes)
+    _prune_generations(static_dir, old_hashes)
+
+    manifest["html_text"] = app_html
+    return manifest
@@ -0,0 +1,215 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from core.config import INDEX_MAP, JST, safe_save_json
+
+# ============================================================
+# Stats index（ゲームごとの統計を結果キャッシュと並べて持つ）
+#   pos      … 桁ごとの数字の出現数（全期間）
+#   trans    … 桁ごとの風車盤インデックス遷移 10x10（前回 → 今回）
+#   spin     … 桁ごとのスピン（(今回idx - 前回idx) % 10）の出現数
+#   win/wspin… STATS_WINDOWS の各窓での pos / spin（直近 W 回、W-1 遷移）
+#   recent   … 窓の出入り用に直近 max(W)+1 回の番号（古い → 新しい）
+# 次の回（last_round + 1）の追加は O(1)。途中の回の差し込み・飛びは dirty にして、
+# 次の sync_stats で結果キャッシュから作り直す。
+# モデルの trends（calc_trends_from_history）は同点の順序まで再現できないので置き換えない。
+# ============================================================
+STATS_FILE = "data/stats_index.json"
+STATS_WINDOWS = (10, 30, 100)
+STATS_VERSION = 1
+
+_COLS = ("n1", "n2", "n3", "n4")
+
+
+def _zeros(digits: int) -> List[List[int]]:
+    return [[0] * 10 for _ in range(digits)]
+
+
+def new_game_stats(digits: int, windows=STATS_WINDOWS) -> Dict[str, Any]:
+    return {
+        "digits": digits,
+        "n": 0,
+        "keys": 0,
+        "first_round": 0,
+        "last_round": 0,
+        "dirty": False,
+        "pos": _zeros(digits),
+        "trans": [[[0] * 10 for _ in range(10)] for _ in range(digits)],
+        "spin": _zeros(digits),
+        "win": {str(w): _zeros(digits) for w in windows},
+        "wspin": {str(w): _zeros(digits) for w in windows},
+        "recent": [],
+    }
+
+
+def new_stats_index(windows=STATS_WINDOWS) -> Dict[str, Any]:
+    return {"v": STATS_VERSION, "windows": list(windows), "games": {}, "updated_at": ""}
+
+
+def load_stats_index(path: str = STATS_FILE) -> Dict[str, Any]:
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("v") == STATS_VERSION and list(data.get("windows", [])) == list(STATS_WINDOWS):
+                data.setdefault("games", {})
+                return data
+        except Exception:
+            pass
+    return new_stats_index()
+
+
+def save_stats_index(index: Dict[str, Any], path: str = STATS_FILE) -> bool:
+    index = dict(index)
+    index["updated_at"] = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+    return bool(safe_save_json(index, path))
+
+
+def _idx(num: str) -> List[int]:
+    return [INDEX_MAP[_COLS[i]][int(ch)] for i, ch in enumerate(num)]
+
+
+def _spins(prev: str, cur: str) -> List[int]:
+    a, b = _idx(prev), _idx(cur)
+    return [(b[i] - a[i]) % 10 for i in range(len(a))]
+
+
+def _append(gs: Dict[str, Any], num: str, windows) -> None:
+    """次の回を足す（O(桁数 x 窓数)）"""
+    recent = gs["recent"]
+    prev = recent[-1] if recent else None
+    for i, ch in enumerate(num):
+        gs["pos"][i][int(ch)] += 1
+    if prev is not None:
+        a, b = _idx(prev), _idx(num)
+        for i in range(len(num)):
+            gs["trans"][i][a[i]][b[i]] += 1
+            gs["spin"][i][(b[i] - a[i]) % 10] += 1
+
+    recent.append(num)
+    for w in windows:
+        win, wspin = gs["win"][str(w)], gs["wspin"][str(w)]
+        for i, ch in enumerate(num):
+            win[i][int(ch)] += 1
+        if prev is not None:
+            for i, s in enumerate(_spins(prev, num)):
+                wspin[i][s] += 1
+        # 窓から出る回（と、その次の回への遷移）
+        if len(recent) > w:
+            out, nxt = recent[-w - 1], recent[-w]
+            for i, ch in enumerate(out):
+                win[i][int(ch)] -= 1
+            for i, s in enumerate(_spins(out, nxt)):
+                wspin[i][s] -= 1
+    del recent[:-(max(windows) + 1)]
+    gs["n"] += 1
+
+
+def stats_insert(index: Dict[str, Any], game: str, round_no: int, num: str) -> bool:
+    """
+    1回ぶん追加。last_round + 1（か最初の1回）なら O(1) で足して True。
+    それ以外（古い回の差し込み・回の飛び）は dirty にして False。
+    """
+    windows = index.get("windows", STATS_WINDOWS)
+    num = str(num)
+    gs = index["games"].get(game)
+    if gs is None:
+        gs = new_game_stats(4 if game == "N4" else 3, windows)
+        index["games"][game] = gs
+    gs["keys"] += 1
+    if not num.isdigit() or len(num) != gs["digits"]:
+        return False
+    if gs["n"] and round_no <= gs["last_round"]:
+        gs["dirty"] = True
+        return False
+    if gs["n"] and round_no != gs["last_round"] + 1:
+        gs["dirty"] = True
+        return False
+    _append(gs, num, windows)
+    if not gs["first_round"]:
+        gs["first_round"] = round_no
+    gs["last_round"] = round_no
+    return True
+
+
+def rebuild_stats(index: Dict[str, Any], cache: Dict[str, Any], game: str) -> Dict[str, Any]:
+    """結果キャッシュから作り直す（古い → 新しい順に _append）"""
+    windows = index.get("windows", STATS_WINDOWS)
+    g = cache.get(game, {}) or {}
+    rows = []
+    for k, v in g.items():
+        if not isinstance(v, dict):
+            continue
+        try:
+            rows.append((int(v.get("round", k)), str(v.get("num", ""))))
+        except Exception:
+            continue
+    rows.sort()
+    digits = 4 if game == "N4" else 3
+    gs = new_game_stats(digits, windows)
+    for rno, num in rows:
+        if num.isdigit() and len(num) == digits:
+            _append(gs, num, windows)
+            if not gs["first_round"]:
+                gs["first_round"] = rno
+            gs["last_round"] = rno
+    gs["keys"] = len(g)
+    index["games"][game] = gs
+    return gs
+
+
+def sync_stats(index: Dict[str, Any], cache: Dict[str, Any], games=("N4", "N3")) -> List[str]:
+    """
+    結果キャッシュと食い違っていたら作り直す（件数・最新回で O(1) 判定）。
+    戻り値: 作り直したゲーム
+    """
+    rebuilt = []
+    for game in games:
+        g = cache.get(game, {}) or {}
+        gs = index["games"].get(game)
+        if not g and not gs:
+            continue
+        last = 0
+        for k in g:
+            if str(k).isdigit() and int(k) > last:
+                last = int(k)
+        if gs is None or gs.get("dirty") or gs.get("keys") != len(g) or gs["last_round"] != last:
+            rebuild_stats(index, cache, game)
+            rebuilt.append(game)
+    return rebuilt
+
+
+# ----------------------------
+# queries
+# ----------------------------
+def digit_counts(index: Dict[str, Any], game: str, window: Optional[int] = None) -> List[List[int]]:
+    """桁ごとの数字の出現数（window=None で全期間、それ以外は STATS_WINDOWS のどれか）"""
+    gs = index["games"].get(game)
+    if not gs:
+        return []
+    return gs["pos"] if window is None else gs["win"][str(window)]
+
+
+def spin_counts(index: Dict[str, Any], game: str, window: Optional[int] = None) -> List[List[int]]:
+    """桁ごとのスピン（0..9、6..9 は -4..-1）の出現数"""
+    gs = index["games"].get(game)
+    if not gs:
+        return []
+    return gs["spin"] if window is None else gs["wspin"][str(window)]
+
+
+def transition_matrix(index: Dict[str, Any], game: str, pos: int) -> List[List[int]]:
+    """桁 pos の風車盤インデックス遷移（[前回idx][今回idx]）"""
+    gs = index["games"].get(game)
+    return gs["trans"][pos] if gs else []
+
+
+def spin_mode(index: Dict[str, Any], game: str, window: Optional[int] = None) -> Dict[str, int]:
+    """桁ごとの最頻スピン（-4..5。同数なら小さい絶対値）"""
+    out = {}
+    for i, row in enumerate(spin_counts(index, game, window)):
+        best = max(range(10), key=lambda s: (row[s], -abs(s - 10 if s > 5 else s)))
+        out[_COLS[i]] = (best - 10 if best > 5 else best) if row[best] else 0
+    return out
@@ -0,0 +1,176 @@
+import copy
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows など：プロセス間ロックなし（スレッド間だけ守る）
+    fcntl = None
+
+from core.cache import RESULTS_CACHE_FILE, KC_CACHE_FILE, load_results_cache, load_kc_cache
+from core.config import PRED_FILE
+from core.metrics import count
+from core.model import load_pred_store
+
+# ============================================================
+# Shared store（プロセス共有のキャッシュ＋書き込みロック）
+#   - shared_load: ファイルの (mtime_ns, size) が変わらない限り、
+#     同じプロセスの全セッションで1回読んだオブジェクトを共有する
+#   - file_lock:   <path>.lock への flock（プロセス間）＋スレッドロック。
+#     同じスレッドからの入れ子は素通し（再入可）
+#   - 書き手は file_lock(BUILD_LOCK_FILE) の中で
+#       shared_checkout（複製）→ 直す → safe_save_json → publish（差し替え）
+#     の順にやる（最後の os.replace 勝ちで更新が消えない）。
+#     共有オブジェクト自体は書き換えないので、読み手はロックなしで参照を持って回してよい
+#     （途中で失敗したビルドの直しかけは共有に出ない）
+# ============================================================
+BUILD_LOCK_FILE = "data/build"
+
+_guard = threading.Lock()
+_thread_locks: Dict[str, threading.Lock] = {}
+_held = threading.local()
+_shared: Dict[str, Dict[str, Any]] = {}
+_stats = {"loads": 0, "hits": 0}
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _thread_lock(key: str) -> threading.Lock:
+    with _guard:
+        lk = _thread_locks.get(key)
+        if lk is None:
+            lk = threading.Lock()
+            _thread_locks[key] = lk
+        return lk
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    path 単位の排他（スレッド間＋プロセス間）。ロック実体は path + ".lock"。
+    blocking=False なら取れないときすぐ False を yield する（中身は実行される）。
+    """
+    key = os.path.abspath(path)
+    held = getattr(_held, "keys", None)
+    if held is None:
+        held = _held.keys = set()
+    if key in held:
+        yield True
+        return
+
+    lk = _thread_lock(key)
+    if not lk.acquire(blocking):
+        yield False
+        return
+    try:
+        lock_path = path + ".lock"
+        d = os.path.dirname(lock_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            held.add(key)
+            try:
+                yield True
+            finally:
+                held.discard(key)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+    finally:
+        lk.release()
+
+
+def shared_load(path: str, loader: Callable[[], Any]) -> Any:
+    """
+    loader() の結果をプロセスで共有。ファイルが変わっていたら読み直す。
+    戻り値は共有オブジェクトなので読むだけにする（直すときは shared_checkout）。
+    """
+    stamp = file_stamp(path)
+    with _guard:
+        ent = _shared.get(path)
+        if ent is not None and ent["stamp"] == stamp:
+            _stats["hits"] += 1
+            count("store.shared", hits=1)
+            return ent["data"]
+    count("store.shared", misses=1)
+    data = loader()
+    with _guard:
+        _shared[path] = {"stamp": stamp, "data": data}
+        _stats["loads"] += 1
+    return data
+
+
+def shared_checkout(path: str, loader: Callable[[], Any]) -> Tuple[Any, Optional[Tuple[int, int]]]:
+    """
+    書き手用：共有オブジェクトの複製と、読んだ時点のファイルの印。
+    複製を直して保存できたら publish(path, 複製, 印) で共有と差し替える。
+    """
+    data = shared_load(path, loader)
+    return copy.deepcopy(data), file_stamp(path)
+
+
+def publish(path: str, data: Any, stamp_before: Optional[Tuple[int, int]]) -> bool:
+    """
+    path が stamp_before から書き換わっていれば（＝保存できた）data を共有オブジェクトにする。
+    書けていなければ何もしない（共有は前のまま＝ディスクと同じ）。ロックを持ったまま呼ぶこと。
+    """
+    stamp = file_stamp(path)
+    if stamp is None or stamp == stamp_before:
+        return False
+    with _guard:
+        _shared[path] = {"stamp": stamp, "data": data}
+    return True
+
+
+def restamp(*paths: str) -> None:
+    """
+    自分で書いた直後に呼ぶ：メモリ上のデータ＝ディスク、として印を更新する
+    （次の shared_load で読み直さない）。ロックを持ったまま呼ぶこと。
+    """
+    with _guard:
+        for path in paths:
+            ent = _shared.get(path)
+            if ent is not None:
+                ent["stamp"] = file_stamp(path)
+
+
+def forget(*paths: str) -> None:
+    with _guard:
+        for path in paths or list(_shared):
+            _shared.pop(path, None)
+
+
+def store_stats() -> Dict[str, int]:
+    with _guard:
+        return {"loads": _stats["loads"], "hits": _stats["hits"], "entries": len(_shared)}
+
+
+# ----------------------------
+# named stores
+# ----------------------------
+def shared_results_cache() -> Dict[str, Any]:
+    return shared_load(RESULTS_CACHE_FILE, load_results_cache)
+
+
+def shared_kc_cache() -> Dict[str, Any]:
+    return shared_load(KC_CACHE_FILE, load_kc_cache)
+
+
+def shared_pred_store() -> Dict[str, Any]:
+    return shared_load(PRED_FILE, load_pred_store)